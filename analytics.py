@@ -0,0 +1,289 @@
+"""Embedded DuckDB analytics for the dashboard KPIs"""
+
+import os
+
+import duckdb
+import pandas as pd
+import streamlit as st
+
+from parquet_store import collection_path, is_materialized
+
+WEEKDAYS_GERMAN = [
+    "Montag",
+    "Dienstag",
+    "Mittwoch",
+    "Donnerstag",
+    "Freitag",
+    "Samstag",
+    "Sonntag",
+]
+WEEKDAY_GROUP_ORDER = ["Mo-Do", "Fr", "Sa", "So", "Wochenfeiertag"]
+
+
+def status_timestamp_sql(status):
+    """Combined timestamp of a Details status from its date and time (ISO or German date)"""
+    combined = f"content_date{status} || ' ' || content_time{status}"
+    return f"""
+    coalesce(
+        try_cast({combined} AS TIMESTAMP),
+        try_strptime({combined}, '%d.%m.%Y %H:%M:%S')
+    )
+"""
+
+
+# View name -> (materialized dataset, extra computed columns)
+VIEWS = {
+    "details": (
+        "protocols_details",
+        f"{status_timestamp_sql('StatusAlarm')} AS StatusAlarm, "
+        f"{status_timestamp_sql('StatusEnd')} AS StatusEnd",
+    ),
+    "etu": ("etu_leitstelle", None),
+    "nida_index": ("nida_index", None),
+    "ktwsh_transports": ("ktwsh_transports", None),
+    "ktwsh_status_history": ("ktwsh_status_history", None),
+}
+
+
+def create_views(con, temporary=False):
+    """
+    Create one view per materialized Parquet dataset on a DuckDB connection.
+    Temporary views are only visible to that connection, not to its cursors.
+    """
+    kind = "TEMP VIEW" if temporary else "VIEW"
+    for view, (dataset, computed) in VIEWS.items():
+        if not is_materialized(dataset):
+            continue
+        files = os.path.join(collection_path(dataset), "**", "*.parquet")
+        extra = f", {computed}" if computed else ""
+        try:
+            con.execute(
+                f"CREATE OR REPLACE {kind} {view} AS SELECT *{extra} FROM read_parquet("
+                f"'{files}', hive_partitioning = true, union_by_name = true)"
+            )
+        except duckdb.Error as e:
+            print(f"Error creating DuckDB view {view}: {e}")
+
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def get_duckdb_connection():
+    """In-memory DuckDB with the views over the materialized Parquet data"""
+    con = duckdb.connect(database=":memory:")
+    create_views(con)
+    return con
+
+
+def has_view(view):
+    """Check if a materialized dataset is available as DuckDB view"""
+    return is_materialized(VIEWS[view][0])
+
+
+def run_query(sql, params=None, frame=None):
+    """
+    Run a query on its own cursor of the shared connection.
+
+    If a DataFrame is given it is available as relation `frame`; DuckDB only
+    scans the columns the query references.
+    """
+    cursor = get_duckdb_connection().cursor()
+    try:
+        if frame is not None:
+            cursor.register("frame", frame)
+        return cursor.execute(sql, params or []).df()
+    finally:
+        cursor.close()
+
+
+def relation(frame, view):
+    """Query the page frame if given, otherwise the materialized view"""
+    return "frame" if frame is not None else view
+
+
+def missions_per_vehicle_per_day(frame=None, call_signs=None, ts_col="StatusAlarm"):
+    """Daily mission counts per content_callSign (Datum, Fahrzeug, Anzahl)"""
+    vehicle_filter = ""
+    params = []
+    if call_signs is not None:
+        vehicle_filter = "AND list_contains(?, content_callSign)"
+        params.append(list(call_signs))
+
+    df = run_query(
+        f"""
+        SELECT CAST("{ts_col}" AS DATE) AS Datum,
+               content_callSign AS Fahrzeug,
+               count(*) AS Anzahl
+        FROM {relation(frame, "details")}
+        WHERE "{ts_col}" IS NOT NULL {vehicle_filter}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        params,
+        frame,
+    )
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    return df
+
+
+def vehicle_group_daily_counts(frame=None, groups=None, ts_col="StatusAlarm"):
+    """
+    Daily mission counts per vehicle group (Datum, Typ, Anzahl).
+
+    groups maps the label of a group to a tuple (call sign pattern, included
+    call signs, excluded call signs); the pattern is a SQL LIKE pattern.
+    """
+    selects = []
+    params = []
+    for label, (pattern, included, excluded) in groups.items():
+        # Placeholders in order of appearance: label, then the conditions
+        params.append(label)
+        conditions = [f'"{ts_col}" IS NOT NULL']
+        if pattern:
+            conditions.append("content_callSign LIKE ?")
+            params.append(pattern)
+        if included is not None:
+            conditions.append("list_contains(?, content_callSign)")
+            params.append(list(included))
+        if excluded:
+            conditions.append("NOT list_contains(?, content_callSign)")
+            params.append(list(excluded))
+        selects.append(f"""
+            SELECT CAST("{ts_col}" AS DATE) AS Datum, ? AS Typ, count(*) AS Anzahl
+            FROM {relation(frame, "details")}
+            WHERE {" AND ".join(conditions)}
+            GROUP BY 1
+            """)
+
+    df = run_query(" UNION ALL ".join(selects) + " ORDER BY 1", params, frame)
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    return df
+
+
+def weekday_hour_heatmap(frame=None, ts_col="StatusAlarm", view="details", where=None):
+    """
+    Counts per weekday and hour as 7x24 matrix with German weekday names,
+    ready for px.imshow. `where` is an optional extra SQL condition.
+    """
+    extra = f"AND ({where})" if where else ""
+    counts = run_query(
+        f"""
+        SELECT isodow("{ts_col}") - 1 AS weekday,
+               hour("{ts_col}") AS hour,
+               count(*) AS counts
+        FROM {relation(frame, view)}
+        WHERE "{ts_col}" IS NOT NULL {extra}
+        GROUP BY 1, 2
+        """,
+        frame=frame,
+    )
+    return heatmap_matrix(counts)
+
+
+def heatmap_matrix(counts):
+    """Pivot weekday (0=Monday)/hour/counts rows into the 7x24 heatmap matrix"""
+    if counts.empty:
+        return pd.DataFrame()
+
+    heatmap = (
+        counts.pivot(index="weekday", columns="hour", values="counts")
+        .reindex(index=range(7), columns=range(24))
+        .fillna(0)
+    )
+    heatmap.index = WEEKDAYS_GERMAN
+    heatmap.index.name = "weekday"
+    return heatmap
+
+
+def weekday_group_sql(ts_col):
+    """SQL expression for the Mo-Do/Fr/Sa/So/Wochenfeiertag grouping"""
+    return f"""
+        CASE
+            WHEN list_contains(?::DATE[], CAST("{ts_col}" AS DATE)) THEN 'Wochenfeiertag'
+            WHEN isodow("{ts_col}") <= 4 THEN 'Mo-Do'
+            WHEN isodow("{ts_col}") = 5 THEN 'Fr'
+            WHEN isodow("{ts_col}") = 6 THEN 'Sa'
+            ELSE 'So'
+        END
+    """
+
+
+def weekday_group_crosstab(
+    frame=None,
+    category_col=None,
+    ts_col="StatusAlarm",
+    holiday_dates=(),
+    view="details",
+):
+    """Counts of category_col per weekday group as crosstab (categories x groups)"""
+    counts = run_query(
+        f"""
+        SELECT "{category_col}" AS category,
+               {weekday_group_sql(ts_col)} AS weekday_group,
+               count(*) AS counts
+        FROM {relation(frame, view)}
+        WHERE "{ts_col}" IS NOT NULL AND "{category_col}" IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        [list(holiday_dates)],
+        frame,
+    )
+    crosstab = counts.pivot(index="category", columns="weekday_group", values="counts")
+    crosstab = crosstab.reindex(columns=WEEKDAY_GROUP_ORDER).fillna(0).astype(int)
+    crosstab.index.name = category_col
+    crosstab.columns.name = "weekday_group"
+    return crosstab
+
+
+def daily_trend_sql(daily_sql):
+    """
+    Fill the days of a daily count query (columns day, n) from its first day up
+    to the end date parameter and add centered 7 and 30 day averages (NaN at
+    the edges, like pandas rolling(center=True)).
+    """
+    return f"""
+        WITH daily AS ({daily_sql}),
+        days AS (
+            SELECT CAST(range AS DATE) AS day
+            FROM range(
+                (SELECT min(day) FROM daily)::TIMESTAMP,
+                ?::TIMESTAMP + INTERVAL 1 DAY,
+                INTERVAL 1 DAY
+            )
+        ),
+        filled AS (
+            SELECT days.day, coalesce(daily.n, 0) AS n
+            FROM days LEFT JOIN daily USING (day)
+        )
+        SELECT day AS "Datum",
+               n AS "Anzahl Transporte",
+               CASE WHEN count(*) OVER w7 = 7 THEN avg(n) OVER w7 END
+                   AS "7-Tage Durchschnitt",
+               CASE WHEN count(*) OVER w30 = 30 THEN avg(n) OVER w30 END
+                   AS "30-Tage Durchschnitt"
+        FROM filled
+        WINDOW w7 AS (ORDER BY day ROWS BETWEEN 3 PRECEDING AND 3 FOLLOWING),
+               w30 AS (ORDER BY day ROWS BETWEEN 15 PRECEDING AND 14 FOLLOWING)
+        ORDER BY day
+    """
+
+
+def daily_counts_with_trend(
+    frame=None, ts_col="created_at", view="ktwsh_transports", end_date=None
+):
+    """
+    Daily counts from the first day up to end_date (default today) with all
+    days filled, plus centered 7 and 30 day averages.
+    """
+    end_date = pd.Timestamp(end_date or pd.Timestamp.today()).normalize()
+    df = run_query(
+        daily_trend_sql(f"""
+            SELECT CAST("{ts_col}" AS DATE) AS day, count(*) AS n
+            FROM {relation(frame, view)}
+            WHERE "{ts_col}" IS NOT NULL
+            GROUP BY 1
+            """),
+        [end_date.to_pydatetime()],
+        frame,
+    )
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    df["Anzahl Transporte"] = df["Anzahl Transporte"].astype(float)
+    return df
@@ -7,6 +7,8 @@ from typing import Optional, Dict, Any
 import logging
 from dotenv import load_dotenv
 
+from instrumentation import loader_call, add_command
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
@@ -50,7 +52,17 @@ class KTWAPIClient:
         try:
             response = self.session.get(url, params=params)
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            # Timed like a database command of the current loader call
+            add_command({
+                "command": "GET",
+                "collection": endpoint,
+                "shape": {},
+                "ms": response.elapsed.total_seconds() * 1000,
+                "docs": len(data.get("results", [])) if isinstance(data, dict) else len(data),
+                "bytes": len(response.content),
+            })
+            return data
         except requests.exceptions.RequestException as e:
             logger.error(f"API request failed: {e}")
             st.error(f"API request failed: {e}")
@@ -169,8 +181,9 @@ class KTWAPIClient:
 @st.cache_data(ttl=300, show_spinner="Loading data from KTW.sh API...")
 def cached_get_transports() -> pd.DataFrame:
     """Cached function to get transport data"""
-    client = KTWAPIClient()
-    return client.get_transports()
+    with loader_call("KTW.sh Transporte"):
+        client = KTWAPIClient()
+        return client.get_transports()
 
 
 @st.cache_data(
@@ -179,8 +192,9 @@ def cached_get_transports() -> pd.DataFrame:
 )
 def cached_get_transport_status_history() -> pd.DataFrame:
     """Cached function to get transport status history data"""
-    client = KTWAPIClient()
-    return client.get_transport_status_history()
+    with loader_call("KTW.sh Statushistorie"):
+        client = KTWAPIClient()
+        return client.get_transport_status_history()
 
 
 def test_api_connection() -> bool:
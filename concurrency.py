@@ -0,0 +1,172 @@
+"""
+Concurrency profile of busy vehicles per vehicle type.
+
+Missions (StatusAlarm to StatusEnd, rounded to full minutes) become +1/-1
+events; one sort by vehicle type and time and a cumulative sum give the
+number of simultaneously committed vehicles. Only the change points are
+kept, which is exact at minute resolution but a fraction of a per-minute
+series.
+"""
+
+import pandas as pd
+
+# Call sign segment of the vehicle type, e.g. 10-85-11
+VEHICLE_TYPES = ("-83-", "-85-")
+
+
+def busy_intervals(details_df, vehicle_types=VEHICLE_TYPES):
+    """
+    Busy intervals (call_sign, vehicle_type, start, end) of the Details
+    missions. Overlapping missions of one vehicle are merged, so a vehicle
+    is never counted twice.
+    """
+    columns = ["call_sign", "vehicle_type", "start", "end"]
+    required = {"content_callSign", "StatusAlarm", "StatusEnd"}
+    if details_df.empty or not required <= set(details_df.columns):
+        return pd.DataFrame(columns=columns)
+
+    df = pd.DataFrame(
+        {
+            "call_sign": details_df["content_callSign"],
+            "vehicle_type": details_df["content_callSign"].str.extract(
+                r"(-\d{2}-)", expand=False
+            ),
+            "start": pd.to_datetime(details_df["StatusAlarm"], errors="coerce"),
+            "end": pd.to_datetime(details_df["StatusEnd"], errors="coerce"),
+        }
+    ).dropna()
+    df = df[df["vehicle_type"].isin(vehicle_types)]
+    df["start"] = df["start"].dt.floor("min")
+    df["end"] = df["end"].dt.ceil("min")
+    df = df[df["end"] > df["start"]]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # A new block starts when a mission begins after all earlier ones ended
+    df = df.sort_values(["call_sign", "start"], kind="mergesort")
+    running_end = df.groupby("call_sign")["end"].cummax()
+    previous_end = running_end.groupby(df["call_sign"]).shift()
+    block = (previous_end.isna() | (df["start"] > previous_end)).cumsum()
+    merged = df.groupby(block).agg(
+        call_sign=("call_sign", "first"),
+        vehicle_type=("vehicle_type", "first"),
+        start=("start", "min"),
+        end=("end", "max"),
+    )
+    return merged[columns].reset_index(drop=True)
+
+
+def concurrency_series(intervals):
+    """
+    Number of busy vehicles per type as change points (vehicle_type, time,
+    level); the level holds until the next time of the same type.
+    """
+    if intervals.empty:
+        return pd.DataFrame(
+            {
+                "vehicle_type": pd.Series(dtype=object),
+                "time": pd.Series(dtype="datetime64[ns]"),
+                "level": pd.Series(dtype="int64"),
+            }
+        )
+    events = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "vehicle_type": intervals["vehicle_type"],
+                    "time": intervals["start"],
+                    "step": 1,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "vehicle_type": intervals["vehicle_type"],
+                    "time": intervals["end"],
+                    "step": -1,
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    # Net change per minute; the groupby sorts by type and time once
+    steps = events.groupby(["vehicle_type", "time"])["step"].sum()
+    steps = steps[steps != 0]
+    level = steps.groupby(level="vehicle_type").cumsum()
+    return level.rename("level").reset_index()
+
+
+def hourly_load(series):
+    """
+    Peak and time-weighted mean of busy vehicles per type and hour
+    (vehicle_type, hour_start, peak, mean_level).
+
+    The level at each full hour is carried in from the last change point, so
+    an hour without changes still reports the missions running through it.
+    """
+    columns = ["vehicle_type", "hour_start", "peak", "mean_level"]
+    if series.empty:
+        return pd.DataFrame(columns=columns)
+
+    grid = []
+    for vehicle_type, times in series.groupby("vehicle_type")["time"]:
+        hours = pd.date_range(
+            times.min().floor("h"),
+            times.max().floor("h") + pd.Timedelta(hours=1),
+            freq="h",
+        )
+        grid.append(pd.DataFrame({"vehicle_type": vehicle_type, "time": hours}))
+    grid = pd.concat(grid, ignore_index=True).sort_values("time")
+    grid = pd.merge_asof(grid, series.sort_values("time"), on="time", by="vehicle_type")
+    grid["level"] = grid["level"].fillna(0).astype("int64")
+
+    points = pd.concat([series, grid], ignore_index=True)
+    points = points.sort_values(["vehicle_type", "time"], kind="mergesort")
+    points = points.drop_duplicates(["vehicle_type", "time"], keep="first")
+    points["hour_start"] = points["time"].dt.floor("h")
+    # Minutes until the next point; full hours are points, so nothing spills over
+    next_time = points.groupby("vehicle_type")["time"].shift(-1)
+    points["minutes"] = (next_time - points["time"]).dt.total_seconds() / 60
+    points = points.dropna(subset=["minutes"])
+    points["busy_minutes"] = points["level"] * points["minutes"]
+
+    hourly = points.groupby(["vehicle_type", "hour_start"]).agg(
+        peak=("level", "max"), busy_minutes=("busy_minutes", "sum")
+    )
+    hourly["mean_level"] = hourly["busy_minutes"] / 60
+    return hourly.reset_index()[columns]
+
+
+def peak_profile(hourly):
+    """
+    Load per vehicle type, weekday (0=Monday) and hour of day: mean, 90th
+    percentile and maximum of the hourly peaks and the mean busy vehicles.
+    """
+    df = hourly.assign(
+        weekday=hourly["hour_start"].dt.dayofweek, hour=hourly["hour_start"].dt.hour
+    )
+    profile = df.groupby(["vehicle_type", "weekday", "hour"]).agg(
+        **{
+            "Ø Spitze": ("peak", "mean"),
+            "P90 Spitze": ("peak", lambda peaks: peaks.quantile(0.9)),
+            "Max Spitze": ("peak", "max"),
+            "Ø gleichzeitig": ("mean_level", "mean"),
+        }
+    )
+    return profile.reset_index()
+
+
+def series_window(series, vehicle_type, start, end):
+    """Change points of one type between start and end, starting with the level at start"""
+    series = series[series["vehicle_type"] == vehicle_type]
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    before = series[series["time"] <= start]
+    level = int(before["level"].iloc[-1]) if not before.empty else 0
+    inside = series[(series["time"] > start) & (series["time"] < end)]
+    edges = pd.DataFrame(
+        {
+            "vehicle_type": vehicle_type,
+            "time": [start, end],
+            "level": [level, inside["level"].iloc[-1] if not inside.empty else level],
+        }
+    )
+    return pd.concat([edges.iloc[:1], inside, edges.iloc[1:]], ignore_index=True)
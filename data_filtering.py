@@ -2,7 +2,7 @@ import pandas as pd
 from typing import Tuple, List, Any, Optional
 
 from db_connection import get_mongodb_connection, close_mongodb_connection
-from loaders import LOADERS
+from loaders import LOADERS, get_loader
 
 
 def filter_data_by_year(year_start, year_end, limit=10000):
@@ -10,7 +10,7 @@ def filter_data_by_year(year_start, year_end, limit=10000):
     db, client = get_mongodb_connection()
     try:
         filters = {"year_range": (year_start, year_end)}
-        index_df = LOADERS["Index"](db, filters=filters, limit=limit)
+        index_df = get_loader("Index")(db, filters=filters, limit=limit)
 
         if index_df.empty:
             return index_df, []
@@ -21,7 +21,9 @@ def filter_data_by_year(year_start, year_end, limit=10000):
         close_mongodb_connection(client)
 
 
-def get_data_for_protocols(metric, protocol_ids, limit=10000, med_name=None):
+def get_data_for_protocols(
+    metric, protocol_ids, limit=10000, med_name=None, columns=None
+):
     """Get data for specific protocols"""
     db, client = get_mongodb_connection()
     try:
@@ -31,11 +33,11 @@ def get_data_for_protocols(metric, protocol_ids, limit=10000, med_name=None):
         # For Index and Details, use the protocol_ids filter
         if metric in ["Index", "Details"]:
             filters = {"protocol_ids": protocol_ids}
-            return LOADERS[metric](db, filters=filters, limit=limit)
+            return get_loader(metric, columns)(db, filters=filters, limit=limit)
 
         # For other metrics, load the data and filter by protocol_ids afterward
         if metric in ["GCS", "Schmerzen"]:
-            df = LOADERS[metric](db, metric=metric, limit=limit)
+            df = get_loader(metric, columns)(db, metric=metric, limit=limit)
         elif metric in [
             "af",
             "bd",
@@ -49,12 +51,12 @@ def get_data_for_protocols(metric, protocol_ids, limit=10000, med_name=None):
             "temp",
         ]:
             # For vitals, pass the shortcode directly
-            df = LOADERS[metric](db, vital=metric, limit=limit)
+            df = get_loader(metric, columns)(db, vital=metric, limit=limit)
         elif metric == "Medikamente" and med_name:
             # For medications with specific name filter
-            df = LOADERS[metric](db, med_name=med_name, limit=limit)
+            df = get_loader(metric, columns)(db, med_name=med_name, limit=limit)
         else:
-            df = LOADERS[metric](db, limit=limit)
+            df = get_loader(metric, columns)(db, limit=limit)
 
         # Filter by protocol_ids
         if not df.empty and "protocolId" in df.columns:
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from bson import ObjectId
 import datetime
@@ -72,6 +73,37 @@ def combine_date_time_fields(df):
     return df
 
 
+# Weekday group per dayofweek code (0=Monday)
+WEEKDAY_GROUPS = np.array(
+    ["Mo-Do", "Mo-Do", "Mo-Do", "Mo-Do", "Fr", "Sa", "So"], dtype=object
+)
+
+
+def classify_weekday_groups(datetimes, holiday_dates=()):
+    """
+    Map a datetime Series to Mo-Do/Fr/Sa/So, or Wochenfeiertag for holiday dates.
+
+    Vectorized over dayofweek codes; holidays are looked up with searchsorted
+    on a sorted datetime64 array. Missing datetimes give None.
+    """
+    datetimes = pd.to_datetime(pd.Series(datetimes), errors="coerce")
+    if datetimes.dt.tz is not None:
+        datetimes = datetimes.dt.tz_localize(None)
+
+    valid = datetimes.notna().to_numpy()
+    codes = datetimes.dt.dayofweek.fillna(0).astype(int).to_numpy()
+    groups = np.where(valid, WEEKDAY_GROUPS[codes], None)
+
+    holidays = pd.to_datetime(pd.Series(list(holiday_dates)), errors="coerce").dropna()
+    if not holidays.empty:
+        holidays = np.unique(holidays.to_numpy(dtype="datetime64[D]"))
+        days = datetimes.to_numpy(dtype="datetime64[D]")
+        positions = np.searchsorted(holidays, days).clip(max=len(holidays) - 1)
+        groups[valid & (holidays[positions] == days)] = "Wochenfeiertag"
+
+    return pd.Series(groups, index=datetimes.index, dtype=object)
+
+
 def check_requirements(anamnesis_text):
     """
     Analyze anamnesis text to check for medical care requirements during transport.
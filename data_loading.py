@@ -3,14 +3,16 @@ import pandas as pd
 from typing import Optional, Tuple, List, Any
 
 from db_connection import get_mongodb_connection, close_mongodb_connection
-from loaders import LOADERS
+from instrumentation import loader_call
+from loaders import LOADERS, get_loader
 from data_filtering import filter_data_by_year, get_data_for_protocols
 
 
 @st.cache_data(ttl=604800, show_spinner="Filtering data by year...")
 def cached_year_filter(start_year: int, end_year: int, limit: int = 10000):
     """Cached function to filter data by year range"""
-    return filter_data_by_year(start_year, end_year, limit)
+    with loader_call("Index", limit=limit, year_range=(start_year, end_year)):
+        return filter_data_by_year(start_year, end_year, limit)
 
 
 @st.cache_data(ttl=604800, show_spinner="Loading data...")
@@ -19,44 +21,61 @@ def cached_db_query(
     limit: int = 10000,
     med_name: Optional[str] = None,
     protocol_ids: Optional[List[str]] = None,
+    vehicles: Optional[Tuple[str, ...]] = None,
+    columns: Optional[Tuple[str, ...]] = None,
 ):
     """Cached database query function that handles the actual data retrieval"""
-    db, client = get_mongodb_connection()
-    try:
-        if metric not in LOADERS:
-            raise ValueError(f"Unknown metric: {metric}")
-
-        # Handle different metric types
-        if metric in ["GCS", "Schmerzen"]:
-            df = LOADERS[metric](db, metric=metric, limit=limit)
-        elif metric in [
-            "af",
-            "bd",
-            "bz",
-            "co2",
-            "co",
-            "hb",
-            "hf",
-            "puls",
-            "spo2",
-            "temp",
-        ]:
-            # For vitals, pass the shortcode directly
-            df = LOADERS[metric](db, vital=metric, limit=limit)
-        elif metric == "Medikamente" and med_name:
-            # For medications with specific name filter
-            df = LOADERS[metric](db, med_name=med_name, limit=limit)
-        elif protocol_ids:
-            # When we have specific protocol IDs to filter by
-            df = get_data_for_protocols(metric, protocol_ids, limit, med_name)
-        else:
-            df = LOADERS[metric](db, limit=limit)
-
-        # Remove duplicate columns
-        df = df.loc[:, ~df.columns.duplicated()]
-        return df
-    finally:
-        close_mongodb_connection(client)
+    params = {
+        "limit": limit,
+        "med_name": med_name,
+        "protocol_ids": len(protocol_ids) if protocol_ids else 0,
+        "vehicles": len(vehicles) if vehicles else 0,
+        "columns": columns,
+    }
+    with loader_call(metric, **params):
+        db, client = get_mongodb_connection()
+        try:
+            if metric not in LOADERS:
+                raise ValueError(f"Unknown metric: {metric}")
+
+            # Handle different metric types
+            if metric in ["GCS", "Schmerzen"]:
+                df = get_loader(metric, columns)(db, metric=metric, limit=limit)
+            elif metric in [
+                "af",
+                "bd",
+                "bz",
+                "co2",
+                "co",
+                "hb",
+                "hf",
+                "puls",
+                "spo2",
+                "temp",
+            ]:
+                # For vitals, pass the shortcode directly
+                df = get_loader(metric, columns)(db, vital=metric, limit=limit)
+            elif metric == "Medikamente" and med_name:
+                # For medications with specific name filter
+                df = get_loader(metric, columns)(db, med_name=med_name, limit=limit)
+            elif metric == "CEDUS_Diagnose":
+                # ETÜ missions of the given vehicles, filtered in the database
+                df = get_loader(metric, columns)(db, vehicles=vehicles, limit=limit)
+            elif protocol_ids:
+                # When we have specific protocol IDs to filter by
+                df = get_data_for_protocols(
+                    metric, protocol_ids, limit, med_name, columns
+                )
+            else:
+                df = get_loader(metric, columns)(db, limit=limit)
+
+            # Remove duplicate columns
+            df = df.loc[:, ~df.columns.duplicated()]
+            if columns:
+                df = df[[col for col in columns if col in df.columns]]
+            return df
+        finally:
+            close_mongodb_connection(client)
 
 
 def data_loading(
@@ -64,6 +83,8 @@ def data_loading(
     limit: int = 50000,
     med_name: Optional[str] = None,
     year_filter: Optional[Tuple[int, int]] = None,
+    vehicles: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
 ):
     """
     Generic function to load a metric into a dataframe
@@ -73,7 +94,15 @@ def data_loading(
     - limit: Maximum number of records to return
     - med_name: Optional name of medication to filter by (only used with 'Medikamente' metric)
     - year_filter: Optional tuple (start_year, end_year) to filter by mission date
+    - vehicles: Optional vehicle ids (only used with 'CEDUS_Diagnose' metric)
+    - columns: Optional output columns to return; MongoDB only fetches the
+      fields they are built from (see LOADER_FIELDS)
     """
+    if vehicles is not None:
+        vehicles = tuple(sorted(vehicles))
+    if columns is not None:
+        columns = tuple(dict.fromkeys(columns))
+
     # If year filter is provided, get the protocol IDs for that year range
     if year_filter:
         start_year, end_year = year_filter
@@ -84,7 +113,53 @@ def data_loading(
             return pd.DataFrame()
 
         # Get data for the filtered protocol IDs
-        return cached_db_query(metric, limit, med_name, protocol_ids)
+        return cached_db_query(metric, limit, med_name, protocol_ids, columns=columns)
 
     # If no year filter, proceed with normal data loading
-    return cached_db_query(metric, limit, med_name)
+    return cached_db_query(metric, limit, med_name, vehicles=vehicles, columns=columns)
+
+
+def run_loader(metric: str, **kwargs):
+    """Run the loader of a metric on its own database connection"""
+    with loader_call(metric, **kwargs):
+        db, client = get_mongodb_connection()
+        try:
+            return get_loader(metric)(db, **kwargs)
+        finally:
+            close_mongodb_connection(client)
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def etu_vehicles() -> List[str]:
+    """All ETÜ vehicles (EINSATZMITTEL) from a distinct query"""
+    return run_loader("ETÜ_Fahrzeuge")
+
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def etu_mission_days(vehicle: str) -> List[Any]:
+    """Days with ETÜ missions of a vehicle, newest first"""
+    return run_loader("ETÜ_Einsatztage", vehicle=vehicle)
+
+
+@st.cache_data(ttl=3600, show_spinner="Loading missions...")
+def etu_missions(vehicles: Tuple[str, ...], start_date, end_date) -> pd.DataFrame:
+    """ETÜ phase fields of the vehicles' missions alarmed from start_date to end_date"""
+    return run_loader(
+        "ETÜ_Einsätze",
+        vehicles=tuple(vehicles),
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def etu_daily_summary(
+    start_date, end_date, vehicles: Optional[Tuple[str, ...]] = None
+) -> pd.DataFrame:
+    """Per-vehicle per-day Sonderrechte summaries from start_date to end_date"""
+    return run_loader(
+        "ETÜ_Tagesübersicht",
+        start_date=start_date,
+        end_date=end_date,
+        vehicles=vehicles,
+    )
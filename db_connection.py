@@ -2,12 +2,14 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from instrumentation import QUERY_MONITOR
+
 load_dotenv()
 
 
 def get_mongodb_connection():
     """Establish connection to MongoDB and return the database object"""
-    client = MongoClient(os.getenv("MONGO_URL"))
+    client = MongoClient(os.getenv("MONGO_URL"), event_listeners=[QUERY_MONITOR])
     db = client[os.getenv("DATABASE_NAME")]
     return db, client
 
@@ -0,0 +1,376 @@
+"""
+Index bootstrap and explain-plan report for the MongoDB loader queries.
+
+INDEXES declares the indexes per collection, loader_queries() the query shape
+of every LOADERS metric as a find/distinct/aggregate command, built with the
+loaders' own query builders and field projections. The indexes are created
+idempotently; explain_report() runs each command through explain and lists
+collection scans, in-memory sorts and docs examined versus returned.
+projection_report() compares the BSON size of the documents a find returns
+with and without the loader's declared field projection (LOADER_FIELDS).
+"""
+
+import sys
+import datetime
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from loaders import loader_fields
+from loaders.decoding import elem_match, projection
+from loaders.index_loaders import (
+    CEDUS_INDEX_FIELDS,
+    DAILY_SUMMARY_PROJECTION,
+    cedus_query,
+    daily_summary_query,
+    diagnosis_query,
+    etu_mission_days_pipeline,
+    etu_query,
+    etu_range_query,
+    index_query,
+)
+
+load_dotenv()
+
+# Collection -> indexes (key lists) the loader queries rely on. The multikey
+# indexes on data.* serve the $elemMatch queries on the protocol arrays.
+INDEXES = {
+    "nida_index": [
+        [("missionDate", -1)],
+        [("protocolId", 1)],
+        [("missionNumber", 1)],
+    ],
+    "protocols_details": [[("content.dateStatusAlarm", -1)]],
+    "protocols_findings": [[("data.description", 1)]],
+    "protocols_measures": [
+        [("data.value_1", 1), ("data.value_2", 1)],
+        [("data.value_11", 1)],
+    ],
+    "protocols_results": [[("data.value_1", 1), ("data.value_2", 1)]],
+    "etu_leitstelle": [
+        [("EO_LANDKREIS", 1), ("EINSATZBEGINN", -1)],
+        [("EO_LANDKREIS", 1), ("EINSATZMITTEL", 1), ("EINSATZBEGINN", 1)],
+    ],
+    "etu_sonderrechte_daily": [[("day", -1), ("vehicle", 1)]],
+}
+
+
+def find(collection, query, fields=None, sort=None, limit=0):
+    """find command of a loader query, with the projection of its fields"""
+    command = {"find": collection, "filter": query}
+    if fields is not None:
+        command["projection"] = projection(fields)
+    if sort:
+        command["sort"] = dict(sort)
+    if limit:
+        command["limit"] = limit
+    return command
+
+
+def loader_queries(vehicle="Ret SL 20-83-01", days=30, limit=10000, missions=("0",)):
+    """
+    LOADERS metric -> commands of its MongoDB queries, built with the
+    loaders' own query builders and LOADER_FIELDS projections, for sample
+    values: the vehicle, the last `days` days and mission numbers of the
+    CEDUS join. Metrics without a database query (Feiertage) or with plain
+    scans of small collections are left out.
+    """
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=days)
+    vehicle_id = vehicle.split()[-1]
+    etu_sort = [("EINSATZBEGINN", -1)]
+
+    def protocols(collection, metric, *queries):
+        fields = loader_fields(metric)
+        return [find(collection, query, fields, limit=limit) for query in queries]
+
+    findings = "protocols_findings"
+    measures = "protocols_measures"
+    results = "protocols_results"
+    queries = {
+        "Index": [
+            find(
+                "nida_index",
+                index_query({"year_range": (start.year, end.year)}),
+                loader_fields("Index"),
+                sort=[("missionDate", -1)],
+                limit=limit,
+            )
+        ],
+        "Details": [
+            find(
+                "protocols_details",
+                {},
+                loader_fields("Details"),
+                sort=[("content.dateStatusAlarm", -1)],
+                limit=limit,
+            )
+        ],
+        "GCS": protocols(findings, "GCS", elem_match(description="GCS")),
+        "Schmerzen": protocols(
+            findings, "Schmerzen", elem_match(description="Schmerzen")
+        ),
+        "Neurologische_Auffälligkeiten": protocols(
+            findings,
+            "Neurologische_Auffälligkeiten",
+            elem_match(description="Auffäligkeiten"),
+        ),
+        "Pupillenstatus": protocols(
+            findings,
+            "Pupillenstatus",
+            elem_match(description="Lichtreaktion links"),
+            elem_match(description="Lichtreaktion rechts"),
+        ),
+        "Medikamente": protocols(
+            measures, "Medikamente", elem_match(value_1="Medikamente")
+        ),
+        "Intubation": protocols(measures, "Intubation", elem_match(value_1="Atemweg")),
+        "12-Kanal-EKG": protocols(
+            measures,
+            "12-Kanal-EKG",
+            elem_match(value_1="Monitoring", value_2="12-Kanal-EKG"),
+        ),
+        "EVM": protocols(measures, "EVM", elem_match(value_11="EVM")),
+        "NACA": protocols(results, "NACA", elem_match(value_1="NACA")),
+        "Symptombeginn": protocols(
+            results,
+            "Symptombeginn",
+            elem_match(value_1="Symptombeginn"),
+            elem_match(value_1="Spezifikation Symptombeginn"),
+        ),
+        "Reanimation": protocols(
+            results,
+            "Reanimation",
+            elem_match(value_1="NACA", value_2="6"),
+            elem_match(value_1="Rea durchgeführt"),
+        ),
+        "ETÜ": [
+            find(
+                "etu_leitstelle",
+                etu_query(),
+                loader_fields("ETÜ"),
+                sort=etu_sort,
+                limit=limit,
+            )
+        ],
+        "ETÜ_Fahrzeuge": [
+            {
+                "distinct": "etu_leitstelle",
+                "key": "EINSATZMITTEL",
+                "query": etu_query(),
+            }
+        ],
+        "ETÜ_Einsatztage": [
+            {
+                "aggregate": "etu_leitstelle",
+                "pipeline": etu_mission_days_pipeline(vehicle),
+                "cursor": {},
+            }
+        ],
+        "ETÜ_Einsätze": [
+            find(
+                "etu_leitstelle",
+                etu_range_query([vehicle], start, end),
+                loader_fields("ETÜ_Einsätze"),
+                sort=[("EINSATZBEGINN", 1)],
+            )
+        ],
+        "ETÜ_Tagesübersicht": [
+            {
+                "find": "etu_sonderrechte_daily",
+                "filter": daily_summary_query(start, end),
+                "projection": DAILY_SUMMARY_PROJECTION,
+            }
+        ],
+        "CEDUS_Diagnose": [
+            find(
+                "etu_leitstelle",
+                cedus_query([vehicle_id]),
+                loader_fields("CEDUS_Diagnose"),
+                sort=etu_sort,
+                limit=50000,
+            ),
+            find("nida_index", diagnosis_query(missions), CEDUS_INDEX_FIELDS),
+        ],
+    }
+    queries["Reanimation_mit_targetDestination"] = queries["Reanimation"]
+    return queries
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Create the declared indexes that are missing. Indexes whose key already
+    exists (under any name) are left alone, so this can run on every deploy.
+    Returns the names of the created indexes per collection.
+    """
+    existing_collections = set(db.list_collection_names())
+    created = {}
+    for collection, indexes in INDEXES.items():
+        if collections and collection not in collections:
+            continue
+        if collection not in existing_collections:
+            continue
+        existing = {
+            tuple(
+                (field, direction if isinstance(direction, str) else int(direction))
+                for field, direction in info["key"]
+            )
+            for info in db[collection].index_information().values()
+        }
+        for keys in indexes:
+            if tuple(keys) in existing:
+                continue
+            name = db[collection].create_index(keys)
+            created.setdefault(collection, []).append(name)
+    return created
+
+
+def find_values(doc, key):
+    """All values of `key` anywhere in a nested explain document"""
+    if isinstance(doc, dict):
+        for k, v in doc.items():
+            if k == key:
+                yield v
+            yield from find_values(v, key)
+    elif isinstance(doc, list):
+        for item in doc:
+            yield from find_values(item, key)
+
+
+def plan_stages(plan):
+    """Stage names of a winning plan, from the root down"""
+    return [stage for stage in find_values(plan, "stage") if isinstance(stage, str)]
+
+
+def explain_command(db, command):
+    """
+    One report row of a command's explain output: plan stages, used
+    indexes, collection scan, in-memory sort and execution counts.
+    """
+    explain = db.command("explain", command, verbosity="executionStats")
+    plans = [
+        planner.get("winningPlan", {})
+        for planner in find_values(explain, "queryPlanner")
+    ]
+    stages = [stage for plan in plans for stage in plan_stages(plan)]
+    indexes = sorted(
+        {name for plan in plans for name in find_values(plan, "indexName")}
+    )
+    stats = next(find_values(explain, "executionStats"), {})
+    docs_examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    return {
+        "plan": " <- ".join(stages),
+        "indexes": ", ".join(indexes),
+        "COLLSCAN": "COLLSCAN" in stages,
+        "in-memory sort": "SORT" in stages,
+        "keys examined": stats.get("totalKeysExamined", 0),
+        "docs examined": docs_examined,
+        "returned": returned,
+        "examined per returned": round(docs_examined / max(returned, 1), 1),
+        "ms": stats.get("executionTimeMillis", 0),
+    }
+
+
+def explain_report(db, metrics=None):
+    """Explain every loader query (of the given metrics), one row per query"""
+    existing = set(db.list_collection_names())
+    rows = []
+    for metric, commands in loader_queries().items():
+        if metrics and metric not in metrics:
+            continue
+        for command in commands:
+            collection = next(iter(command.values()))
+            row = {"metric": metric, "collection": collection}
+            if collection not in existing:
+                row["plan"] = "collection missing"
+            else:
+                try:
+                    row.update(explain_command(db, command))
+                except Exception as e:
+                    row["plan"] = f"ERROR: {e}"
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def returned_bytes(db, command, project=None):
+    """
+    Documents a find command returns and their summed $bsonSize, after the
+    projection if one is given (the payload of the replies on the wire).
+    """
+    pipeline = [{"$match": command["filter"]}]
+    if "sort" in command:
+        pipeline.append({"$sort": command["sort"]})
+    if command.get("limit"):
+        pipeline.append({"$limit": command["limit"]})
+    if project:
+        pipeline.append({"$project": project})
+    pipeline.append(
+        {
+            "$group": {
+                "_id": None,
+                "docs": {"$sum": 1},
+                "bytes": {"$sum": {"$bsonSize": "$$ROOT"}},
+            }
+        }
+    )
+    result = next(db[command["find"]].aggregate(pipeline), {})
+    return result.get("docs", 0), result.get("bytes", 0)
+
+
+def projection_report(db, metrics=None):
+    """
+    Bytes returned per loader find command without and with its projection
+    (the declared LOADER_FIELDS of the metric).
+    """
+    existing = set(db.list_collection_names())
+    rows = []
+    for metric, commands in loader_queries().items():
+        if metrics and metric not in metrics:
+            continue
+        for command in commands:
+            collection = command.get("find")
+            project = command.get("projection")
+            if project is None or collection not in existing:
+                continue
+            row = {"metric": metric, "collection": collection}
+            try:
+                docs, full = returned_bytes(db, command)
+                _, projected = returned_bytes(db, command, project)
+            except Exception as e:
+                row["error"] = str(e)
+                rows.append(row)
+                continue
+            row.update(
+                {
+                    "docs": docs,
+                    "fields": len(project),
+                    "full KB": round(full / 1024, 1),
+                    "projected KB": round(projected / 1024, 1),
+                    "saved %": round(100 * (1 - projected / full), 1) if full else 0,
+                }
+            )
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # python db_indexes.py [--create] [--bytes] [metric ...]
+    from db_connection import get_mongodb_connection, close_mongodb_connection
+
+    args = sys.argv[1:]
+    metrics = [a for a in args if not a.startswith("--")]
+    db, client = get_mongodb_connection()
+    try:
+        if "--create" in args:
+            for collection, names in ensure_indexes(db).items():
+                print(f"{collection}: created {', '.join(names)}")
+        if "--bytes" in args:
+            report = projection_report(db, metrics)
+        else:
+            report = explain_report(db, metrics)
+    finally:
+        close_mongodb_connection(client)
+
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(report.to_string(index=False))
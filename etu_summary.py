@@ -0,0 +1,261 @@
+"""
+Materialized per-vehicle per-day Sonderrechte summaries in MongoDB.
+
+An aggregation over etu_leitstelle writes one document per (EINSATZMITTEL,
+day of EINSATZBEGINN) into etu_sonderrechte_daily with $merge. Each refresh
+only re-aggregates the days from the last processed EINSATZBEGINN on, so the
+dashboard overview reads a few hundred summaries instead of all missions.
+
+Days are local days (TIMEZONE): BSON dates are UTC, ISO strings without an
+offset are local times.
+"""
+
+import sys
+import datetime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SUMMARY_COLLECTION = "etu_sonderrechte_daily"
+STATE_COLLECTION = "summary_state"
+# Same district filter as get_etu
+ETU_DISTRICT = {"EO_LANDKREIS": "Schleswig-Flensburg"}
+TIMEZONE = "Europe/Berlin"
+
+
+def to_date(field):
+    """
+    Aggregation expression: field as date, strings parsed as local time
+    (TIMEZONE), else null
+    """
+    return {
+        "$cond": [
+            {"$eq": [{"$type": f"${field}"}, "string"]},
+            {
+                "$dateFromString": {
+                    "dateString": f"${field}",
+                    "timezone": TIMEZONE,
+                    "onError": None,
+                    "onNull": None,
+                }
+            },
+            {
+                "$convert": {
+                    "input": f"${field}",
+                    "to": "date",
+                    "onError": None,
+                    "onNull": None,
+                }
+            },
+        ]
+    }
+
+
+def local_day(value):
+    """Local (TIMEZONE) date of a naive UTC datetime"""
+    utc = value.replace(tzinfo=datetime.timezone.utc)
+    return utc.astimezone(ZoneInfo(TIMEZONE)).date()
+
+
+def day_start_utc(day):
+    """Naive UTC datetime of the local (TIMEZONE) midnight starting a day"""
+    start = datetime.datetime.combine(day, datetime.time(), tzinfo=ZoneInfo(TIMEZONE))
+    return start.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def local_day_string(date):
+    """Aggregation expression: local (TIMEZONE) day of a date as YYYY-MM-DD"""
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": date, "timezone": TIMEZONE}}
+
+
+def utc_times(values):
+    """
+    Naive UTC datetimes of a series of dates (naive ones are UTC) and ISO
+    strings (local time unless they carry an offset)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        text = pd.Series(False, index=values.index)
+    else:
+        text = values.map(lambda v: isinstance(v, str)).astype(bool)
+    times = pd.to_datetime(values.mask(text), errors="coerce", utc=True)
+    if text.any():
+        strings = values[text].astype(str)
+        parsed = pd.to_datetime(strings, errors="coerce", utc=True, format="ISO8601")
+        naive = ~strings.str.contains(r"(?:Z|[+-]\d\d:?\d\d)$")
+        parsed[naive] = (
+            parsed[naive]
+            .dt.tz_localize(None)
+            .dt.tz_localize(TIMEZONE, ambiguous="NaT", nonexistent="shift_forward")
+            .dt.tz_convert("UTC")
+        )
+        times[text] = parsed
+    return times.dt.tz_localize(None)
+
+
+def local_dates(values):
+    """Local (TIMEZONE) midnight of naive UTC datetimes, as naive datetimes"""
+    times = pd.to_datetime(values, errors="coerce")
+    if times.dt.tz is None:
+        times = times.dt.tz_localize("UTC")
+    return times.dt.tz_convert(TIMEZONE).dt.tz_localize(None).dt.normalize()
+
+
+def minutes_between(start, end):
+    """Aggregation expression: minutes from start to end, null if one is missing"""
+    return {
+        "$cond": [
+            {"$and": [{"$ne": [start, None]}, {"$ne": [end, None]}]},
+            {"$divide": [{"$subtract": [end, start]}, 60000]},
+            None,
+        ]
+    }
+
+
+def count_if(condition):
+    """Aggregation accumulator: number of documents matching a condition"""
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+
+def not_null(array):
+    """Aggregation expression: array without null entries"""
+    return {"$filter": {"input": array, "cond": {"$ne": ["$$this", None]}}}
+
+
+def summary_pipeline(since=None):
+    """
+    Aggregation of the Sonderrechte KPIs per vehicle and day of EINSATZBEGINN,
+    merged into the summary collection. With `since` (a local date) only the
+    days from that day on are recomputed; each of them is replaced as a whole.
+    """
+    match = dict(ETU_DISTRICT)
+    if since is not None:
+        # EINSATZBEGINN may be stored as UTC date or local ISO string
+        match["$or"] = [
+            {"EINSATZBEGINN": {"$gte": day_start_utc(since)}},
+            {"EINSATZBEGINN": {"$gte": since.strftime("%Y-%m-%d")}},
+        ]
+
+    has_approach = {"$ne": ["$approach_min", None]}
+    has_transport = {"$ne": ["$transport_min", None]}
+    return [
+        {"$match": match},
+        {
+            "$project": {
+                "vehicle": "$EINSATZMITTEL",
+                "begin": to_date("EINSATZBEGINN"),
+                "approach_min": minutes_between(
+                    to_date("ALARMIERT"), to_date("ZEIT_AN_E")
+                ),
+                "transport_min": minutes_between(
+                    to_date("ZEIT_AB_E"), to_date("ZEIT_AN_Z")
+                ),
+                "sosi": {
+                    "$convert": {
+                        "input": "$SOSI",
+                        "to": "int",
+                        "onError": 0,
+                        "onNull": 0,
+                    }
+                },
+                "sosi_zo": {
+                    "$convert": {
+                        "input": "$SOSI_ZO",
+                        "to": "int",
+                        "onError": 0,
+                        "onNull": 0,
+                    }
+                },
+            }
+        },
+        {"$match": {"begin": {"$ne": None}, "vehicle": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {
+                    "vehicle": "$vehicle",
+                    # The local day, stored as midnight like the page's date filters
+                    "day": {
+                        "$dateFromString": {"dateString": local_day_string("$begin")}
+                    },
+                },
+                "missions": {"$sum": 1},
+                "approaches": count_if(has_approach),
+                "approaches_sosi": count_if(
+                    {"$and": [has_approach, {"$eq": ["$sosi", 1]}]}
+                ),
+                "approach_min_sum": {"$sum": "$approach_min"},
+                "approach_durations": {"$push": "$approach_min"},
+                "transports": count_if(has_transport),
+                "transports_sosi": count_if(
+                    {"$and": [has_transport, {"$eq": ["$sosi_zo", 1]}]}
+                ),
+                "transport_min_sum": {"$sum": "$transport_min"},
+                "transport_durations": {"$push": "$transport_min"},
+                "last_begin": {"$max": "$begin"},
+            }
+        },
+        {
+            "$set": {
+                "vehicle": "$_id.vehicle",
+                "day": "$_id.day",
+                # Percentiles do not add up over days, so the durations are kept
+                "approach_durations": not_null("$approach_durations"),
+                "transport_durations": not_null("$transport_durations"),
+                "updated_at": "$$NOW",
+            }
+        },
+        {
+            "$merge": {
+                "into": SUMMARY_COLLECTION,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def refresh_summary(db, rebuild=False):
+    """
+    Refresh the summaries from the day of the last processed EINSATZBEGINN on
+    (all days with rebuild=True). Returns the number of summary documents.
+    """
+    state = db[STATE_COLLECTION].find_one({"_id": SUMMARY_COLLECTION}) or {}
+    last_begin = None if rebuild else state.get("last_begin")
+    since = None
+    if last_begin is not None:
+        # The whole day of the watermark is recomputed, later missions of it included
+        since = local_day(last_begin)
+
+    db.etu_leitstelle.aggregate(summary_pipeline(since), allowDiskUse=True)
+
+    newest = db[SUMMARY_COLLECTION].find_one(
+        sort=[("last_begin", -1)], projection={"last_begin": 1}
+    )
+    if newest:
+        db[STATE_COLLECTION].update_one(
+            {"_id": SUMMARY_COLLECTION},
+            {
+                "$set": {
+                    "last_begin": newest["last_begin"],
+                    "updated_at": datetime.datetime.now(),
+                }
+            },
+            upsert=True,
+        )
+    db[SUMMARY_COLLECTION].create_index([("day", -1), ("vehicle", 1)])
+    return db[SUMMARY_COLLECTION].count_documents({})
+
+
+if __name__ == "__main__":
+    # Nightly after the ETÜ import: python etu_summary.py [--rebuild]
+    from db_connection import get_mongodb_connection, close_mongodb_connection
+
+    db, client = get_mongodb_connection()
+    try:
+        count = refresh_summary(db, rebuild="--rebuild" in sys.argv[1:])
+        print(f"{SUMMARY_COLLECTION}: {count} summaries")
+    finally:
+        close_mongodb_connection(client)
@@ -0,0 +1,145 @@
+"""Offline public holiday calendar for Schleswig-Holstein"""
+
+import os
+import json
+import time
+import datetime
+from functools import lru_cache
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOLIDAY_API_URL = "https://get.api-feiertage.de/?states=sh"
+HOLIDAY_CACHE = os.getenv("HOLIDAY_CACHE", os.path.join("cache", "holidays_sh.json"))
+# Optional refresh of the cache from the API, e.g. HOLIDAY_API_REFRESH=1
+HOLIDAY_API_REFRESH = os.getenv("HOLIDAY_API_REFRESH", "").lower() in ("1", "true")
+HOLIDAY_CACHE_MAX_AGE = 30 * 86400
+HOLIDAY_API_TIMEOUT = 5
+
+_last_refresh_attempt = 0.0
+
+
+def easter_sunday(year):
+    """Date of Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    n = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * n) // 451
+    month, day = divmod(h + n - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def sh_holidays(year):
+    """Public holidays of Schleswig-Holstein in a year as tuple of (date, name)"""
+    easter = easter_sunday(year)
+    holidays = [
+        (datetime.date(year, 1, 1), "Neujahr"),
+        (easter - datetime.timedelta(days=2), "Karfreitag"),
+        (easter + datetime.timedelta(days=1), "Ostermontag"),
+        (datetime.date(year, 5, 1), "Tag der Arbeit"),
+        (easter + datetime.timedelta(days=39), "Christi Himmelfahrt"),
+        (easter + datetime.timedelta(days=50), "Pfingstmontag"),
+        (datetime.date(year, 10, 3), "Tag der Deutschen Einheit"),
+        (datetime.date(year, 12, 25), "1. Weihnachtstag"),
+        (datetime.date(year, 12, 26), "2. Weihnachtstag"),
+    ]
+    # Statutory holiday in SH since 2018, nationwide once in 2017
+    if year >= 2017:
+        holidays.append((datetime.date(year, 10, 31), "Reformationstag"))
+    return tuple(sorted(holidays))
+
+
+def load_cached_holidays():
+    """Holidays stored by the last API refresh, empty if there is none"""
+    if not os.path.exists(HOLIDAY_CACHE):
+        return pd.DataFrame(columns=["date", "name"])
+    with open(HOLIDAY_CACHE) as f:
+        records = json.load(f)
+    df = pd.DataFrame(records, columns=["date", "name"])
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df.dropna(subset=["date"])
+
+
+def refresh_holidays_from_api(timeout=HOLIDAY_API_TIMEOUT):
+    """
+    Fetch the holidays from api-feiertage.de and store them in the cache file.
+    Returns the number of holidays, or None if the API is not reachable.
+    """
+    global _last_refresh_attempt
+    _last_refresh_attempt = time.time()
+    try:
+        response = requests.get(HOLIDAY_API_URL, timeout=timeout)
+        response.raise_for_status()
+        # the holidays are nested in a "feiertage" array with date/fname
+        holidays = response.json().get("feiertage", [])
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error refreshing holidays from API: {e}")
+        return None
+
+    records = [
+        {"date": holiday.get("date"), "name": holiday.get("fname")}
+        for holiday in holidays
+    ]
+    os.makedirs(os.path.dirname(HOLIDAY_CACHE) or ".", exist_ok=True)
+    with open(HOLIDAY_CACHE, "w") as f:
+        json.dump(records, f, indent=2)
+    return len(records)
+
+
+def cache_is_stale():
+    """Check if the API cache should be refreshed (tried at most once per max age)"""
+    if time.time() - _last_refresh_attempt < HOLIDAY_CACHE_MAX_AGE:
+        return False
+    if not os.path.exists(HOLIDAY_CACHE):
+        return True
+    return time.time() - os.path.getmtime(HOLIDAY_CACHE) > HOLIDAY_CACHE_MAX_AGE
+
+
+def holiday_calendar(start_year, end_year):
+    """
+    Holidays of Schleswig-Holstein from start_year to end_year (date, name, weekday).
+
+    Computed locally; dates from the optional API cache are added, so a
+    one-off holiday published by the API is not lost.
+    """
+    if HOLIDAY_API_REFRESH and cache_is_stale():
+        refresh_holidays_from_api()
+
+    records = [
+        {"date": pd.Timestamp(date), "name": name}
+        for year in range(start_year, end_year + 1)
+        for date, name in sh_holidays(year)
+    ]
+    df = pd.DataFrame(records, columns=["date", "name"])
+    df["date"] = pd.to_datetime(df["date"])
+
+    cached = load_cached_holidays()
+    if not cached.empty:
+        cached = cached[cached["date"].dt.year.between(start_year, end_year)]
+        cached = cached[~cached["date"].isin(df["date"])]
+        df = pd.concat([df, cached], ignore_index=True)
+
+    df = df.sort_values("date").reset_index(drop=True)
+    df["weekday"] = df["date"].dt.day_name()
+    return df
+
+
+def holiday_dates(start_year, end_year):
+    """Holiday dates from start_year to end_year as list of datetime.date"""
+    return holiday_calendar(start_year, end_year)["date"].dt.date.tolist()
+
+
+if __name__ == "__main__":
+    # Refresh the API cache: python holiday_calendar.py
+    count = refresh_holidays_from_api()
+    if count is not None:
+        print(f"{count} holidays cached in {HOLIDAY_CACHE}")
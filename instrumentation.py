@@ -0,0 +1,250 @@
+"""
+Timing of the loader calls and the MongoDB commands they issue.
+
+A pymongo CommandListener records every command (query shape, round trip,
+documents returned) under the loader call running in the same thread, see
+loader_call(). With QUERY_INSTRUMENTATION=full the reply size is measured
+and the reply decoded once more to time the BSON decoding. Admins get the
+breakdown per metric in a sidebar panel, see query_debug_panel().
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import bson
+import pandas as pd
+import streamlit as st
+from pymongo import monitoring
+from dotenv import load_dotenv
+
+from slow_log import record_slow_call
+
+load_dotenv()
+
+MEASURE_REPLIES = os.getenv("QUERY_INSTRUMENTATION", "") == "full"
+ADMIN_GROUP = os.getenv("ADMIN_GROUP", "admin")
+
+# Connection handshakes and session bookkeeping are not loader queries
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions"}
+
+_current_call = ContextVar("loader_call", default=None)
+_lock = threading.Lock()
+# Finished loader calls of all sessions, newest last
+RECENT_CALLS = deque(maxlen=500)
+# Called with every finished loader call
+CALL_HOOKS = [record_slow_call]
+
+
+def query_shape(value):
+    """Query with every value replaced by "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $and/$or/$in lists keep their structure, but not their length
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_shape(event):
+    """Query shape of a find/aggregate/distinct/count command"""
+    command = event.command
+    for key in ("filter", "pipeline", "query"):
+        if key in command:
+            shape = {key: query_shape(command[key])}
+            if "sort" in command:
+                shape["sort"] = dict(command["sort"])
+            return shape
+    return {}
+
+
+def reply_documents(reply):
+    """Number of documents in a command reply"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in reply:
+        return len(reply["values"])
+    return 1 if "n" in reply else 0
+
+
+def session_id():
+    """Id of the Streamlit session running this thread, None outside Streamlit"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else None
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """Records the commands of the current loader call"""
+
+    def __init__(self):
+        self._started = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        # getMore carries the cursor id under its name, the collection separately
+        name_field = "collection" if event.command_name == "getMore" else None
+        self._started[(event.connection_id, event.request_id)] = {
+            "command": event.command_name,
+            "collection": command.get(name_field or event.command_name),
+            "shape": command_shape(event),
+        }
+
+    def succeeded(self, event):
+        record = self._started.pop((event.connection_id, event.request_id), None)
+        if record is None:
+            return
+        record["ms"] = event.duration_micros / 1000
+        record["docs"] = reply_documents(event.reply)
+        if MEASURE_REPLIES:
+            raw = bson.encode(event.reply)
+            start = time.perf_counter()
+            bson.decode(raw)
+            record["bytes"] = len(raw)
+            record["decode_ms"] = (time.perf_counter() - start) * 1000
+        add_command(record)
+
+    def failed(self, event):
+        record = self._started.pop((event.connection_id, event.request_id), None)
+        if record is None:
+            return
+        record["ms"] = event.duration_micros / 1000
+        record["docs"] = 0
+        record["error"] = str(event.failure.get("errmsg", event.failure))
+        add_command(record)
+
+
+QUERY_MONITOR = QueryMonitor()
+
+
+def add_command(record):
+    """Attach a command record to the loader call of this thread"""
+    call = _current_call.get()
+    if call is not None:
+        call["commands"].append(record)
+
+
+@contextmanager
+def loader_call(metric, **params):
+    """
+    Time a loader call. Query time is the round trip of its Mongo commands
+    (including pymongo's decoding) or API requests, the rest counts as
+    pandas processing.
+    """
+    call = {
+        "metric": metric,
+        "params": params,
+        "session": session_id(),
+        "started": time.time(),
+        "commands": [],
+    }
+    token = _current_call.set(call)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        _current_call.reset(token)
+        commands = call["commands"]
+        call["total_ms"] = (time.perf_counter() - start) * 1000
+        call["query_ms"] = sum(c["ms"] for c in commands)
+        call["decode_ms"] = sum(c.get("decode_ms", 0) for c in commands)
+        call["pandas_ms"] = max(call["total_ms"] - call["query_ms"], 0)
+        call["docs"] = sum(c["docs"] for c in commands)
+        call["bytes"] = sum(c.get("bytes", 0) for c in commands)
+        with _lock:
+            RECENT_CALLS.append(call)
+        for hook in CALL_HOOKS:
+            try:
+                hook(call)
+            except Exception as e:
+                print(f"ERROR in loader call hook: {str(e)}")
+
+
+def is_admin():
+    """Whether the logged-in user is in the ADMIN_GROUP Keycloak group"""
+    try:
+        if not st.user.is_logged_in:
+            return False
+        groups = st.user.get("groups") or []
+    except Exception:
+        return False
+    return any(str(group).strip("/") == ADMIN_GROUP for group in groups)
+
+
+def call_breakdown(calls):
+    """Per metric: calls, documents, size and the time split in ms"""
+    summary = pd.DataFrame(
+        [
+            {
+                "Metrik": call["metric"],
+                "Gesamt (ms)": call["total_ms"],
+                "Abfragen (ms)": call["query_ms"],
+                "Dekodierung (ms)": call["decode_ms"],
+                "Pandas (ms)": call["pandas_ms"],
+                "Befehle": len(call["commands"]),
+                "Dokumente": call["docs"],
+                "KB": call["bytes"] / 1024,
+            }
+            for call in calls
+        ]
+    )
+    summary = summary.groupby("Metrik").agg(
+        Aufrufe=("Gesamt (ms)", "size"),
+        **{col: (col, "sum") for col in summary.columns[1:]},
+    )
+    return summary.sort_values("Gesamt (ms)", ascending=False).round(1)
+
+
+def query_debug_panel():
+    """
+    Sidebar breakdown of the loader calls of this session since the panel was
+    last shown (i.e. this page run), only for admins. Cached calls do not
+    reach the database and are not listed.
+    """
+    if not is_admin():
+        return
+    session = session_id()
+    since = st.session_state.get("query_panel_since", 0)
+    with _lock:
+        calls = [
+            call
+            for call in RECENT_CALLS
+            if call["session"] == session and call["started"] >= since
+        ]
+    st.session_state["query_panel_since"] = time.time()
+
+    with st.sidebar.expander("🐢 Abfragezeiten", expanded=False):
+        if not calls:
+            st.caption("Keine Datenbankabfragen in diesem Lauf, alles aus dem Cache.")
+            return
+        st.dataframe(call_breakdown(calls), use_container_width=True)
+        commands = pd.DataFrame(
+            [
+                {
+                    "Metrik": call["metric"],
+                    "Befehl": command["command"],
+                    "Collection": command["collection"],
+                    "Form": str(command["shape"]),
+                    "ms": round(command["ms"], 1),
+                    "Dokumente": command["docs"],
+                }
+                for call in calls
+                for command in call["commands"]
+            ]
+        )
+        if not commands.empty:
+            st.dataframe(commands, use_container_width=True, hide_index=True)
+        if not MEASURE_REPLIES:
+            st.caption("Größe und Dekodierung mit QUERY_INSTRUMENTATION=full messen.")
@@ -0,0 +1,166 @@
+"""
+Memoized data preparation for the KTWsh report.
+
+Each stage is cached on the fingerprint of the API data it derives from, so
+a rerun triggered by a widget only redraws; the DataFrames themselves are
+passed as unhashed arguments and never hashed by Streamlit.
+"""
+
+import hashlib
+
+import pandas as pd
+import streamlit as st
+
+import rollups
+from analytics import (
+    daily_counts_with_trend,
+    weekday_hour_heatmap,
+    weekday_group_crosstab,
+)
+from data_helpers import classify_weekday_groups
+from holiday_calendar import holiday_calendar
+from status_flow import FlowDigests, TransitionIndex, complete_flows
+
+
+def data_fingerprint(*frames):
+    """Content hash of one or more DataFrames"""
+    digest = hashlib.sha1()
+    for df in frames:
+        digest.update(repr((df.shape, list(df.columns))).encode())
+        try:
+            hashed = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Unhashable cells such as nested lists or dicts
+            hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+        digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def to_naive(series):
+    """Timezone-naive datetimes; strings are parsed as UTC"""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, errors="coerce", utc=True)
+    if series.dt.tz is not None:
+        series = series.dt.tz_localize(None)
+    return series
+
+
+def prepare_transports(transport_df):
+    """
+    Normalize the transports once: created_at filled from the agreed transport
+    time and timezone-naive, pickup_station without room numbers, and the
+    analysis datetime (agreed transport time, else created_at) with its date.
+    """
+    df = transport_df.copy()
+    if df.empty or "created_at" not in df.columns:
+        return df
+
+    created_at = df["created_at"]
+    if not pd.api.types.is_datetime64_any_dtype(created_at):
+        created_at = pd.to_datetime(created_at, errors="coerce")
+    created_at = to_naive(created_at)
+    if "agreed_transport_datetime" in df.columns:
+        # Missing created_at falls back to the agreed time in UTC
+        agreed_utc = pd.to_datetime(
+            df["agreed_transport_datetime"], errors="coerce", utc=True
+        ).dt.tz_localize(None)
+        created_at = created_at.fillna(agreed_utc)
+    df["created_at"] = created_at
+
+    if "pickup_station" in df.columns:
+        # Clean pickup_station: remove ", Zimmer XXX" pattern
+        df["pickup_station"] = df["pickup_station"].str.replace(
+            r",\s*Zimmer\s*\d+", "", regex=True
+        )
+
+    target_col = "agreed_transport_datetime"
+    if target_col not in df.columns:
+        target_col = "created_at"
+    df["analysis_dt"] = to_naive(df[target_col])
+    df["date"] = df["analysis_dt"].dt.date
+    return df
+
+
+def prepare_history(history_df):
+    """Status history with timezone-naive changed_at"""
+    df = history_df.copy()
+    if "changed_at" in df.columns:
+        df["changed_at"] = pd.to_datetime(
+            df["changed_at"], errors="coerce", utc=True
+        ).dt.tz_localize(None)
+    return df
+
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def cached_prepare(fingerprint, _transport_df, _history_df):
+    """Stage 1: normalized transports and status history"""
+    return prepare_transports(_transport_df), prepare_history(_history_df)
+
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def cached_daily_counts(fingerprint, _transport_df):
+    """
+    Daily transports with 7/30 day trends, from the nightly rollup plus the
+    transports created since, or aggregated in DuckDB.
+    """
+    if rollups.has_rollup("ktwsh"):
+        return rollups.ktwsh_daily_counts_with_trend(_transport_df)
+
+    dates = _transport_df.loc[_transport_df["created_at"].notna(), "created_at"]
+    return daily_counts_with_trend(pd.DataFrame({"created_at": dates}), "created_at")
+
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def cached_heatmap(fingerprint, _transport_df):
+    """Weekday x hour counts of the analysis datetime"""
+    return weekday_hour_heatmap(_transport_df, "analysis_dt")
+
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def cached_category_analysis(fingerprint, _transport_df):
+    """
+    Weekday groups including the SH holidays of the analysed years.
+    Returns the transports with weekday_group, the holidays, their dates and
+    the category x weekday group crosstab.
+    """
+    df = _transport_df.copy()
+    years = df["analysis_dt"].dropna().dt.year
+    holidays_df = pd.DataFrame()
+    holiday_dates = []
+    if not years.empty:
+        holidays_df = holiday_calendar(int(years.min()), int(years.max()))
+        holiday_dates = holidays_df["date"].dt.date.tolist()
+
+    df["weekday_group"] = classify_weekday_groups(df["analysis_dt"], holiday_dates)
+    crosstab = weekday_group_crosstab(
+        df, "krankenbeforderungsfahrt_kategorie", "analysis_dt", holiday_dates
+    )
+    return df, holidays_df, holiday_dates, crosstab
+
+
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
+def cached_complete_flows(fingerprint, _history_df):
+    """Transports with the complete offen → abgeschlossen flow"""
+    return complete_flows(_history_df)
+
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def shared_flow_digests():
+    """Weekly duration sketches shared by all data versions, rebuilt daily"""
+    return FlowDigests()
+
+
+def update_flow_digests(flows_df):
+    """
+    Weekly duration sketches of the complete flows: only the transports not
+    digested yet are added to the shared sketches.
+    """
+    digests = shared_flow_digests()
+    digests.update(flows_df)
+    return digests
+
+
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner=False)
+def cached_transition_index(fingerprint, _history_df):
+    """Sorted event index of the status history, built once per data version"""
+    return TransitionIndex(_history_df)
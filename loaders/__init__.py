@@ -1,8 +1,19 @@
+import functools
+
 from .index_loaders import (
+    DETAILS_FIELDS,
+    DETAILS_STATUSES,
+    ETU_PHASE_FIELDS,
+    CEDUS_ETU_FIELDS,
     get_index,
     get_details,
     get_freetext,
     get_etu,
+    get_etu_vehicles,
+    get_etu_mission_days,
+    get_etu_missions,
+    get_etu_daily_summary,
+    get_cedus_diagnosis,
     get_rtm_vorhaltung,
 )
 from .findings_loaders import (
@@ -17,8 +28,29 @@ from .results_loaders import (
     get_reanimation_with_targetDestination,
     get_symptom_onset,
 )
-from .vitals_loaders import get_vitals
+from .vitals_loaders import VITALS, get_vitals
 from .holiday_loaders import get_holidays
+from .decoding import SCHEMAS
+from .parquet_loaders import (
+    get_index_parquet,
+    get_details_parquet,
+    get_freetext_parquet,
+    get_etu_parquet,
+    get_etu_vehicles_parquet,
+    get_etu_mission_days_parquet,
+    get_etu_missions_parquet,
+    get_etu_daily_summary_parquet,
+    get_cedus_diagnosis_parquet,
+    get_rtm_vorhaltung_parquet,
+    get_metric_from_findings_parquet,
+    get_metric_from_results_parquet,
+    get_medikamente_parquet,
+    get_intubation_parquet,
+    get_12lead_ecg_parquet,
+    get_evm_parquet,
+    get_vitals_parquet,
+)
+from parquet_store import use_parquet_backend, is_materialized
 
 # Registry
 LOADERS = {
@@ -47,8 +79,219 @@ LOADERS = {
     "Neurologische_Auffälligkeiten": get_neurological_signs,
     "Pupillenstatus": get_pupil_status,
     "ETÜ": get_etu,
+    "ETÜ_Fahrzeuge": get_etu_vehicles,
+    "ETÜ_Einsatztage": get_etu_mission_days,
+    "ETÜ_Einsätze": get_etu_missions,
+    "ETÜ_Tagesübersicht": get_etu_daily_summary,
+    "CEDUS_Diagnose": get_cedus_diagnosis,
     "EVM": get_evm,
     "Feiertage": get_holidays,
     "RTM_Vorhaltung": get_rtm_vorhaltung,
 }
 
+
+def data_fields(*keys, columns=None, required=()):
+    """
+    Field map of a protocol collection loader: protocolId, the data entry
+    keys the rows are filtered on (required) and per output column the data
+    entry keys it is built from. source may sit on the document or the entry.
+    """
+    fields = {"*": ["protocolId"] + [f"data.{key}" for key in required]}
+    for column, keys in (columns or {}).items():
+        fields[column] = [f"data.{key}" for key in keys]
+    if "source" in fields:
+        fields["source"] = ["source", "data.source"]
+    return fields
+
+
+# Metric -> output column -> MongoDB fields it is built from. The fields
+# under "*" are always fetched (protocolId, the fields rows are filtered
+# or joined on). None: the loader reads no documents (distinct, aggregation,
+# holidays) or keeps whole documents whose layout varies (RTM_Vorhaltung,
+# the ETÜ daily summaries).
+LOADER_FIELDS = {
+    "Index": {
+        "*": ["protocolId"],
+        **{field: [field] for field in SCHEMAS["nida_index"] if field != "protocolId"},
+    },
+    "Details": {
+        "*": ["protocolId"],
+        **{field.replace(".", "_"): [field] for field in DETAILS_FIELDS[1:]},
+        **{
+            f"Status{status}": [
+                f"content.dateStatus{status}",
+                f"content.timeStatus{status}",
+            ]
+            for status in DETAILS_STATUSES
+        },
+    },
+    "Freetext": {"*": ["protocolId"], "content": ["content"], "text": ["text"]},
+    "GCS": data_fields(
+        required=["description"],
+        columns={
+            "value_num": ["valueInteger"],
+            "type": ["type"],
+            "timestamp": ["timeStamp"],
+            "source": ["source"],
+        },
+    ),
+    "Medikamente": data_fields(
+        # value_2/value_6 carry the medication name filter
+        required=["value_1", "value_2", "value_6"],
+        columns={
+            "route": ["value_3"],
+            "dose": ["value_4"],
+            "dose_unit": ["value_5"],
+            "timestamp": ["timeStamp"],
+            "source": ["source"],
+        },
+    ),
+    "NACA": data_fields(
+        required=["value_1"],
+        columns={"NACA-Score": ["value_2"], "source": ["source"]},
+    ),
+    "Intubation": data_fields(
+        required=["value_2", "value_3"],
+        columns={
+            "size": ["value_4"],
+            "applicant": ["value_8"],
+            "timestamp": ["timeStamp"],
+            "source": ["source"],
+        },
+    ),
+    "Reanimation": data_fields(
+        # timeStamp picks the latest entry per protocol for the destination join
+        required=["value_1", "value_2", "timeStamp"],
+        columns={"source": ["source"]},
+    ),
+    "12-Kanal-EKG": data_fields(
+        required=["value_1", "value_2"],
+        columns={
+            "result": ["value_3"],
+            "timestamp": ["timeStamp"],
+            "source": ["source"],
+        },
+    ),
+    "Symptombeginn": data_fields(
+        # value_2 holds the date, the time or the specification
+        required=["value_1", "value_2"],
+        columns={"timestamp": ["timeStamp"], "source": ["source"]},
+    ),
+    # The loader does not shape its rows yet, so it keeps whole entries
+    "Neurologische_Auffälligkeiten": {"*": ["protocolId", "data"]},
+    "Pupillenstatus": data_fields(
+        required=["description", "valueString"],
+        columns={"timestamp": ["timeStamp"], "source": ["source"]},
+    ),
+    "ETÜ": {field: [field] for field in SCHEMAS["etu_leitstelle"]},
+    "ETÜ_Fahrzeuge": None,
+    "ETÜ_Einsatztage": None,
+    "ETÜ_Einsätze": {
+        "*": ["ALARMIERT"],
+        **{field: [field] for field in ETU_PHASE_FIELDS},
+    },
+    "ETÜ_Tagesübersicht": None,
+    "CEDUS_Diagnose": {"*": CEDUS_ETU_FIELDS},
+    "EVM": data_fields(
+        required=["value_11"],
+        columns={
+            "type": ["value_1"],
+            "description": ["value_2"],
+            "applicant": ["value_10"],
+            "timestamp": ["timeStamp"],
+            "source": ["source"],
+        },
+    ),
+    "Feiertage": None,
+    "RTM_Vorhaltung": None,
+}
+LOADER_FIELDS["Schmerzen"] = LOADER_FIELDS["GCS"]
+LOADER_FIELDS["Reanimation_mit_targetDestination"] = LOADER_FIELDS["Reanimation"]
+# Vitals documents keep their values either flat or in data entries
+VITALS_KEYS = {
+    "value": ["value"],
+    "unit": ["unit", "%"],
+    "o2Administration": ["o2Administration"],
+    "description": ["description"],
+    "timestamp": ["timeStamp", "timestamp"],
+    "source": ["source"],
+}
+LOADER_FIELDS.update(
+    {
+        vital: {
+            "*": ["protocolId", "data.protocolId"],
+            **{
+                column: keys + [f"data.{key}" for key in keys]
+                for column, keys in VITALS_KEYS.items()
+            },
+        }
+        for vital in VITALS
+    }
+)
+
+
+# Metrics returning whole documents: their declared fields are the ones the
+# pages read, but without requested columns every field is loaded
+DOCUMENT_METRICS = {"Index", "Freetext", "ETÜ"}
+
+
+def loader_fields(metric, columns=None):
+    """
+    MongoDB fields a metric's loader needs for the given output columns (all
+    declared columns without `columns`), None if it takes no projection.
+    """
+    declared = LOADER_FIELDS.get(metric)
+    if declared is None or (columns is None and metric in DOCUMENT_METRICS):
+        return None
+    fields = []
+    for column, paths in declared.items():
+        if column == "*" or columns is None or column in columns:
+            fields += [path for path in paths if path not in fields]
+    if metric in DOCUMENT_METRICS:
+        # Columns of whole documents are their top-level fields
+        fields += [col for col in columns if col not in declared]
+    return fields
+
+
+# Parquet backend: metric -> (loader, materialized collection it reads)
+PARQUET_LOADERS = {
+    "Index": (get_index_parquet, "nida_index"),
+    "Details": (get_details_parquet, "protocols_details"),
+    "Freetext": (get_freetext_parquet, "protocols_freetexts"),
+    "GCS": (get_metric_from_findings_parquet, "protocols_findings"),
+    "Schmerzen": (get_metric_from_findings_parquet, "protocols_findings"),
+    "Medikamente": (get_medikamente_parquet, "protocols_measures"),
+    "NACA": (get_metric_from_results_parquet, "protocols_results"),
+    "Intubation": (get_intubation_parquet, "protocols_measures"),
+    "12-Kanal-EKG": (get_12lead_ecg_parquet, "protocols_measures"),
+    "EVM": (get_evm_parquet, "protocols_measures"),
+    "ETÜ": (get_etu_parquet, "etu_leitstelle"),
+    "ETÜ_Fahrzeuge": (get_etu_vehicles_parquet, "etu_leitstelle"),
+    "ETÜ_Einsatztage": (get_etu_mission_days_parquet, "etu_leitstelle"),
+    "ETÜ_Einsätze": (get_etu_missions_parquet, "etu_leitstelle"),
+    "ETÜ_Tagesübersicht": (get_etu_daily_summary_parquet, "etu_leitstelle"),
+    "CEDUS_Diagnose": (get_cedus_diagnosis_parquet, "etu_leitstelle"),
+    "RTM_Vorhaltung": (get_rtm_vorhaltung_parquet, "rtm_vorhaltung"),
+}
+PARQUET_LOADERS.update(
+    {vital: (get_vitals_parquet, f"vitals_{vital}") for vital in VITALS}
+)
+
+
+def get_loader(metric, columns=None):
+    """
+    Return the loader for a metric.
+
+    With DATA_BACKEND=parquet the Parquet loader is used for every metric whose
+    collection has been materialized, all other metrics still query MongoDB.
+    Both backends only read the LOADER_FIELDS of the (given) output columns.
+    """
+    loader = LOADERS[metric]
+    if use_parquet_backend() and metric in PARQUET_LOADERS:
+        parquet_loader, collection = PARQUET_LOADERS[metric]
+        if is_materialized(collection):
+            loader = parquet_loader
+    fields = loader_fields(metric, columns)
+    if fields is None:
+        return loader
+    return functools.partial(loader, fields=fields)
@@ -0,0 +1,203 @@
+"""
+Optional Arrow-native decoding of the flat collections with PyMongoArrow.
+
+find_frame() decodes the BSON batches of a query for the requested schema
+fields straight into typed Arrow columns and hands them to pandas without
+building a dict per document. pymongoarrow is optional (not installed by
+requirements.txt); without it, with ARROW_DECODING=0, for whole documents
+or fields outside the schema it falls back to list(find()) and pd.DataFrame.
+
+pymongoarrow decodes a value whose BSON type differs from the declared one
+as null. After decoding, one query by _id checks whether the documents
+behind the null cells actually hold a value (e.g. EINSATZBEGINN stored as
+ISO string); if so the query is decoded through dicts and the collection is
+marked in the metadata registry, so later queries skip the Arrow path.
+
+For wide nested documents (protocols_details) find_raw_frame() projects a
+declared field list and reads it from RawBSONDocuments. projection() builds
+the find() projection of the fields a loader declares in LOADER_FIELDS.
+"""
+
+import os
+import datetime
+
+import pandas as pd
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from dotenv import load_dotenv
+
+from bson import ObjectId
+from data_helpers import convert_objectid_to_str
+from .metadata import collection_flag, set_collection_flag
+
+load_dotenv()
+
+try:
+    import pyarrow as pa
+    from pymongoarrow.api import Schema, find_arrow_all
+    from pymongoarrow.types import ObjectIdType
+except ImportError:
+    pa = None
+
+ARROW_DECODING = pa is not None and os.getenv("ARROW_DECODING", "1") != "0"
+
+# Collection -> field -> Python type of the Arrow column
+SCHEMAS = {
+    "nida_index": {
+        "protocolId": str,
+        "missionNumber": str,
+        "missionDate": datetime.datetime,
+        "createdAt": datetime.datetime,
+        "updatedAt": datetime.datetime,
+        "leadingDiagnosis": str,
+        "targetDestination": str,
+    },
+    "etu_leitstelle": {
+        "EINSATZ_NR": str,
+        "EINSATZMITTEL": str,
+        "EO_LANDKREIS": str,
+        "EINSATZBEGINN": datetime.datetime,
+        "ALARMIERT": datetime.datetime,
+        "ZEIT_AN_E": datetime.datetime,
+        "ZEIT_AB_E": datetime.datetime,
+        "ZEIT_AN_Z": datetime.datetime,
+        "SOSI": int,
+        "SOSI_ZO": int,
+        "CEDUS_CODE": str,
+    },
+    "protocols_freetexts": {
+        "protocolId": str,
+        "content": str,
+        "text": str,
+    },
+}
+
+
+def arrow_schema(collection, fields=None):
+    """PyMongoArrow schema of a collection (restricted to the given fields) and _id"""
+    schema = SCHEMAS[collection]
+    if fields is not None:
+        schema = {field: schema[field] for field in fields if field in schema}
+    return Schema({"_id": ObjectIdType(), **schema})
+
+
+def projection(fields):
+    """find() projection of the fields (_id only if listed), None for whole documents"""
+    if fields is None:
+        return None
+    spec = {field: 1 for field in fields}
+    spec.setdefault("_id", 0)
+    return spec
+
+
+def elem_match(**fields):
+    """Query for documents with a data array entry matching all fields"""
+    return {"data": {"$elemMatch": fields}}
+
+
+def nulls_hide_values(db, collection, table, fields):
+    """
+    Whether a document behind a null cell of the decoded table has a value,
+    i.e. one of another BSON type than the schema. Only the null rows are
+    looked up, by _id.
+    """
+    ids = [
+        value if isinstance(value, ObjectId) else ObjectId(value)
+        for value in table["_id"].to_pylist()
+    ]
+    checks = []
+    for field in fields:
+        column = table[field]
+        if column.null_count == 0:
+            continue
+        null_ids = [
+            object_id
+            for object_id, value in zip(ids, column.to_pylist())
+            if value is None
+        ]
+        checks.append({"_id": {"$in": null_ids}, field: {"$ne": None}})
+    if not checks:
+        return False
+    return db[collection].find_one({"$or": checks}, {"_id": 1}) is not None
+
+
+def use_arrow(db, collection, fields):
+    """Whether find_frame() can decode the fields with pymongoarrow"""
+    if not ARROW_DECODING or collection not in SCHEMAS or not fields:
+        return False
+    if any(field not in SCHEMAS[collection] for field in fields):
+        return False
+    return not collection_flag(db, collection, "mixed_types")
+
+
+def find_frame(db, collection, query, fields=None, sort=None, limit=0):
+    """
+    DataFrame of the documents matching the query, whole documents or only
+    `fields`. Sort is a list of (field, direction).
+    """
+    if use_arrow(db, collection, fields):
+        schema = arrow_schema(collection, fields)
+        try:
+            table = find_arrow_all(
+                db[collection],
+                query,
+                schema=schema,
+                projection=projection(list(schema)),
+                sort=sort,
+                limit=limit,
+            )
+            mixed = nulls_hide_values(db, collection, table, fields)
+        except Exception as e:
+            print(f"ERROR in Arrow decoding of {collection}: {str(e)}")
+            mixed = True
+        if not mixed:
+            # Columns without nulls are handed over without a copy
+            return table.drop(["_id"]).to_pandas(split_blocks=True, self_destruct=True)
+        set_collection_flag(db, collection, "mixed_types")
+
+    cursor = db[collection].find(query, projection(fields), limit=limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    docs = convert_objectid_to_str(list(cursor))
+    return pd.DataFrame(docs)
+
+
+def find_raw_frame(db, collection, query, fields, sort=None, limit=0):
+    """
+    DataFrame of the dotted fields (content.callSign -> content_callSign) of
+    the matching documents. The query projects the fields and the cursor
+    yields RawBSONDocuments, so only the requested values are decoded and
+    go straight into columns instead of through dicts and json_normalize.
+    """
+    raw = db[collection].with_options(
+        codec_options=CodecOptions(document_class=RawBSONDocument)
+    )
+    cursor = raw.find(query, projection(fields), limit=limit)
+    if sort:
+        cursor = cursor.sort(sort)
+
+    paths = [field.split(".") for field in fields]
+    columns = [[] for _ in fields]
+    found = [False] * len(fields)
+    for doc in cursor:
+        for i, path in enumerate(paths):
+            value = doc
+            for key in path:
+                try:
+                    value = value[key]
+                except (KeyError, TypeError):
+                    value = None
+                    break
+            else:
+                found[i] = True
+            columns[i].append(value)
+    if not columns[0]:
+        return pd.DataFrame()
+    # Like json_normalize, fields no document has do not become columns
+    return pd.DataFrame(
+        {
+            field.replace(".", "_"): values
+            for field, values, present in zip(fields, columns, found)
+            if present
+        }
+    )
@@ -1,18 +1,25 @@
 import pandas as pd
 from typing import Dict, List, Any, Optional
 
+from .decoding import elem_match, projection
 
-def get_metric_from_findings(db, metric, limit=10000):
+
+def get_metric_from_findings(db, metric, limit=10000, fields=None):
     """Load structured metrics like GCS, Schmerzen from protocols_findings"""
-    query = {"data": {"$elemMatch": {"description": metric}}}
-    docs = list(db.protocols_findings.find(query, limit=limit))
+    query = elem_match(description=metric)
+    docs = list(db.protocols_findings.find(query, projection(fields), limit=limit))
     if not docs:
         return pd.DataFrame()
 
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
-    df = df[df["description"] == metric]
+    return shape_findings_metric(df, metric)
+
+
+def shape_findings_metric(df, metric):
+    """Select and rename the columns of flattened findings rows for GCS/Schmerzen"""
+    df = df[df["description"] == metric].copy()
 
     df["metric"] = metric
     df["value_num"] = pd.to_numeric(df.get("valueInteger"), errors="coerce")
@@ -33,19 +40,23 @@ def get_metric_from_findings(db, metric, limit=10000):
     return df[keep]
 
 
-def get_neurological_signs(db, limit=10000):
+def get_neurological_signs(db, limit=10000, fields=None):
     """Load neurological signs (Seitenzeichen/Sprachstörung) from protocol_findings"""
-    query = {"data": {"$elemMatch": {"description": "Auffäligkeiten"}}}
-    docs = list(db.protocols_findings.find(query, limit=limit))
+    query = elem_match(description="Auffäligkeiten")
+    docs = list(db.protocols_findings.find(query, projection(fields), limit=limit))
 
 
-def get_pupil_status(db, limit=10000):
+def get_pupil_status(db, limit=10000, fields=None):
     """Load pupil status data from protocol_findings"""
-    left_query = {"data": {"$elemMatch": {"description": "Lichtreaktion links"}}}
-    right_query = {"data": {"$elemMatch": {"description": "Lichtreaktion rechts"}}}
-
-    left_docs = list(db.protocols_findings.find(left_query, limit=limit))
-    right_docs = list(db.protocols_findings.find(right_query, limit=limit))
+    left_query = elem_match(description="Lichtreaktion links")
+    right_query = elem_match(description="Lichtreaktion rechts")
+
+    left_docs = list(
+        db.protocols_findings.find(left_query, projection(fields), limit=limit)
+    )
+    right_docs = list(
+        db.protocols_findings.find(right_query, projection(fields), limit=limit)
+    )
 
     if not left_docs and not right_docs:
         return pd.DataFrame()
@@ -1,3 +1,4 @@
+import re
 import pandas as pd
 import datetime
 from typing import Dict, List, Any, Optional
@@ -9,12 +10,15 @@ from data_helpers import (
     combine_date_time_fields,
     process_boolean_fields,
 )
+from etu_summary import local_dates, local_day_string, to_date, utc_times
+from .metadata import collection_exists
+from .decoding import find_frame, find_raw_frame
 
 load_dotenv()
 
 
-def get_index(db, filters=None, limit=10000):
-    """Query data from MongoDB nida_index collection"""
+def index_query(filters=None):
+    """MongoDB query of get_index for the year_range/protocol_ids filters"""
     query = {}
 
     # Apply year filter if provided
@@ -28,19 +32,28 @@ def get_index(db, filters=None, limit=10000):
     # Apply protocol IDs filter if provided
     if filters and "protocol_ids" in filters:
         query["protocolId"] = {"$in": filters["protocol_ids"]}
+    return query
 
-    # Query the database
-    docs = list(db.nida_index.find(query).sort("missionDate", -1).limit(limit))
-
-    # Convert ObjectId to string
-    docs = convert_objectid_to_str(docs)
 
-    # Convert to DataFrame
-    if not docs:
+def get_index(db, filters=None, limit=10000, fields=None):
+    """Query data from MongoDB nida_index collection"""
+    # Query the database
+    df = find_frame(
+        db,
+        "nida_index",
+        index_query(filters),
+        fields=fields,
+        sort=[("missionDate", -1)],
+        limit=limit,
+    )
+    if df.empty:
         return pd.DataFrame()
 
-    df = pd.DataFrame(docs)
+    return shape_index(df)
+
 
+def shape_index(df):
+    """Convert the nida_index date fields to datetime"""
     # Convert date fields to datetime
     date_fields = ["missionDate", "createdAt", "updatedAt"]
     for field in date_fields:
@@ -50,28 +63,62 @@ def get_index(db, filters=None, limit=10000):
     return df
 
 
-def get_details(db, filters=None, limit=10000):
-    """Query data from MongoDB protocols_details collection"""
-    # Get details data
-    nida_details_cursor = (
-        db.protocols_details.find(filters)
-        .sort("content.dateStatusAlarm", -1)
-        .limit(limit)
-    )
-    nida_details_list = list(nida_details_cursor)
-    nida_details_list = convert_objectid_to_str(nida_details_list)
-
-    if (
-        nida_details_list
-        and isinstance(nida_details_list[0], dict)
-        and "content" in nida_details_list[0]
-    ):
-        nida_details_df = pd.json_normalize(nida_details_list, sep="_")
+# Fields of protocols_details the pages and KPIs read, as dotted Mongo paths
+DETAILS_STATUSES = ["Alarm", "1", "2", "3", "4", "4b", "7", "8", "8b", "End"]
+DETAILS_FIELDS = (
+    [
+        "protocolId",
+        "content.callSign",
+        "content.missionType",
+        "content.date",
+        "content.time",
+    ]
+    + [
+        f"content.{kind}Status{status}"
+        for status in DETAILS_STATUSES
+        for kind in ("date", "time")
+    ]
+    + ["flashingLights", "transportFlashingLights", "nachforderungNA"]
+)
+# The same fields as flattened DataFrame columns
+DETAILS_COLUMNS = [field.replace(".", "_") for field in DETAILS_FIELDS]
+
+
+def get_details(db, filters=None, limit=10000, fields=DETAILS_FIELDS):
+    """
+    Query data from MongoDB protocols_details collection. Only the given
+    fields are fetched and decoded; fields=None loads whole documents.
+    """
+    if fields is not None:
+        df = find_raw_frame(
+            db,
+            "protocols_details",
+            filters or {},
+            fields,
+            sort=[("content.dateStatusAlarm", -1)],
+            limit=limit,
+        )
     else:
-        nida_details_df = pd.DataFrame(nida_details_list)
+        nida_details_cursor = (
+            db.protocols_details.find(filters)
+            .sort("content.dateStatusAlarm", -1)
+            .limit(limit)
+        )
+        nida_details_list = list(nida_details_cursor)
+        nida_details_list = convert_objectid_to_str(nida_details_list)
+
+        if (
+            nida_details_list
+            and isinstance(nida_details_list[0], dict)
+            and "content" in nida_details_list[0]
+        ):
+            nida_details_df = pd.json_normalize(nida_details_list, sep="_")
+        else:
+            nida_details_df = pd.DataFrame(nida_details_list)
+        df = nida_details_df
 
     # Process date/time fields
-    df = combine_date_time_fields(nida_details_df)
+    df = combine_date_time_fields(df)
 
     # Process boolean fields
     df = process_boolean_fields(df)
@@ -79,54 +126,306 @@ def get_details(db, filters=None, limit=10000):
     return df
 
 
-def get_freetext(db, filters=None, limit=10000):
+def get_freetext(db, filters=None, limit=10000, fields=None):
     """Query data from MongoDB free_text collection"""
 
     # Query the database
-    docs = list(db.protocols_freetexts.find(filters, limit=limit))
+    df = find_frame(
+        db, "protocols_freetexts", filters or {}, fields=fields, limit=limit
+    )
+    if df.empty:
+        return pd.DataFrame()
+
+    return df
+
+
+def etu_query(filters=None):
+    """MongoDB query of get_etu: the filters within the Schleswig-Flensburg district"""
+    return {**(filters or {}), **ETU_DISTRICT}
+
+
+def get_etu(db, filters=None, limit=10000, fields=None):
+    try:
+        if not collection_exists(db, "etu_leitstelle"):
+            return pd.DataFrame()
 
-    # Convert ObjectId to string
-    docs = convert_objectid_to_str(docs)
+        df = find_frame(
+            db,
+            "etu_leitstelle",
+            etu_query(filters),
+            fields=fields,
+            sort=[("EINSATZBEGINN", -1)],
+            limit=limit,
+        )
+        if df.empty:
+            return pd.DataFrame()
 
-    # Convert to DataFrame
-    if not docs:
+        return shape_etu(df)
+
+    except Exception as e:
+        print(f"ERROR in get_etu: {str(e)}")
         return pd.DataFrame()
 
-    df = pd.DataFrame(docs)
 
+# Declared dtypes of the etu_leitstelle fields, applied once at load time
+ETU_SCHEMA = {
+    "EINSATZBEGINN": "datetime64[ns]",
+    "ALARMIERT": "datetime64[ns]",
+    "ZEIT_AN_E": "datetime64[ns]",
+    "ZEIT_AB_E": "datetime64[ns]",
+    "ZEIT_AN_Z": "datetime64[ns]",
+    "EINSATZMITTEL": "category",
+    "EO_LANDKREIS": "category",
+    "SOSI": "int8",
+    "SOSI_ZO": "int8",
+}
+
+
+def shape_etu(df):
+    """
+    Convert the ETÜ fields to the dtypes of ETU_SCHEMA: the time fields are
+    parsed into naive UTC datetime64 once (ISO strings are local time),
+    vehicle and district become categoricals and the special rights flags
+    int8 (missing or invalid counts as 0).
+    """
+    for field, dtype in ETU_SCHEMA.items():
+        if field not in df.columns:
+            continue
+        if dtype.startswith("datetime"):
+            df[field] = utc_times(df[field]).astype(dtype)
+        elif dtype == "int8":
+            df[field] = (
+                pd.to_numeric(df[field], errors="coerce").fillna(0).astype(dtype)
+            )
+        else:
+            df[field] = df[field].astype(dtype)
     return df
 
 
-def get_etu(db, filters=None, limit=10000):
-    query = {}
-    if filters:
-        query.update(filters)
+# ETÜ fields of the Sonderrechte phase analysis
+ETU_PHASE_FIELDS = [
+    "EINSATZ_NR",
+    "EINSATZMITTEL",
+    "EINSATZBEGINN",
+    "ALARMIERT",
+    "ZEIT_AN_E",
+    "ZEIT_AB_E",
+    "ZEIT_AN_Z",
+    "SOSI",
+    "SOSI_ZO",
+]
+ETU_DISTRICT = {"EO_LANDKREIS": "Schleswig-Flensburg"}
 
-    # Add filter for Schleswig-Flensburg district
-    query["EO_LANDKREIS"] = "Schleswig-Flensburg"
 
-    # Debug: Check if collection exists and get count
+def get_etu_vehicles(db, filters=None):
+    """Sorted distinct EINSATZMITTEL of the ETÜ missions"""
     try:
-        collection_names = db.list_collection_names()
-        if "etu_leitstelle" not in collection_names:
-            return pd.DataFrame()
+        return sorted(
+            v
+            for v in db.etu_leitstelle.distinct("EINSATZMITTEL", etu_query(filters))
+            if v
+        )
+    except Exception as e:
+        print(f"ERROR in get_etu_vehicles: {str(e)}")
+        return []
+
+
+def etu_mission_days_pipeline(vehicle):
+    """Aggregation of get_etu_mission_days: the local days of a vehicle's missions"""
+    return [
+        {"$match": {**ETU_DISTRICT, "EINSATZMITTEL": vehicle}},
+        # Same local day as the Sonderrechte summaries, for dates and ISO strings
+        {"$group": {"_id": local_day_string(to_date("EINSATZBEGINN"))}},
+    ]
+
+
+def get_etu_mission_days(db, vehicle):
+    """Local days with ETÜ missions of a vehicle (by EINSATZBEGINN), newest first"""
+    pipeline = etu_mission_days_pipeline(vehicle)
+    try:
+        days = [doc["_id"] for doc in db.etu_leitstelle.aggregate(pipeline)]
+    except Exception as e:
+        print(f"ERROR in get_etu_mission_days: {str(e)}")
+        return []
+    return shape_mission_days(pd.Series(days, dtype=object))
+
+
+def shape_mission_days(days):
+    """Unique dates of a series of dates or date strings, newest first"""
+    dates = pd.to_datetime(days, errors="coerce").dropna().dt.date
+    return sorted(dates.unique(), reverse=True)
+
+
+def etu_search_range(start_date, end_date):
+    """EINSATZBEGINN range for missions alarmed from start_date to end_date, with a day of margin"""
+    start = datetime.datetime.combine(start_date, datetime.time())
+    end = datetime.datetime.combine(end_date, datetime.time())
+    return start - datetime.timedelta(days=1), end + datetime.timedelta(days=2)
 
-        docs = list(
-            db.etu_leitstelle.find(query).sort("EINSATZBEGINN", -1).limit(limit)
+
+def etu_range_query(vehicles, start_date, end_date):
+    """MongoDB query for the ETÜ missions of the vehicles (EINSATZBEGINN as date or ISO string)"""
+    start, end = etu_search_range(start_date, end_date)
+    iso_start, iso_end = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    return {
+        **ETU_DISTRICT,
+        "EINSATZMITTEL": {"$in": list(vehicles)},
+        "$or": [
+            {"EINSATZBEGINN": {"$gte": start, "$lt": end}},
+            {"EINSATZBEGINN": {"$gte": iso_start, "$lt": iso_end}},
+        ],
+    }
+
+
+def get_etu_missions(db, vehicles, start_date, end_date, fields=ETU_PHASE_FIELDS):
+    """
+    Phase fields of the ETÜ missions of the vehicles alarmed between
+    start_date and end_date (inclusive).
+
+    The query only touches the EINSATZMITTEL/EINSATZBEGINN range of the
+    vehicles; the exact day comes from ALARMIERT on the returned rows.
+    """
+    try:
+        df = find_frame(
+            db,
+            "etu_leitstelle",
+            etu_range_query(vehicles, start_date, end_date),
+            fields=fields,
+            sort=[("EINSATZBEGINN", 1)],
         )
+    except Exception as e:
+        print(f"ERROR in get_etu_missions: {str(e)}")
+        return pd.DataFrame(columns=ETU_PHASE_FIELDS)
+    return shape_etu_missions(df, start_date, end_date)
 
-        docs = convert_objectid_to_str(docs)
-        if not docs:
+
+def shape_etu_missions(df, start_date, end_date):
+    """Keep the missions whose local ALARMIERT day lies between start_date and end_date"""
+    for col in ETU_PHASE_FIELDS:
+        if col not in df.columns:
+            df[col] = None
+    df = shape_etu(df[ETU_PHASE_FIELDS].copy())
+    days = local_dates(df["ALARMIERT"])
+    df = df[(days >= pd.Timestamp(start_date)) & (days <= pd.Timestamp(end_date))]
+    return df.reset_index(drop=True)
+
+
+# Summary fields the pages do not read
+DAILY_SUMMARY_PROJECTION = {"_id": 0, "updated_at": 0, "last_begin": 0}
+
+
+def daily_summary_query(start_date, end_date, vehicles=None):
+    """MongoDB query of get_etu_daily_summary"""
+    query = {
+        "day": {
+            "$gte": datetime.datetime.combine(start_date, datetime.time()),
+            "$lte": datetime.datetime.combine(end_date, datetime.time()),
+        }
+    }
+    if vehicles:
+        query["vehicle"] = {"$in": list(vehicles)}
+    return query
+
+
+def get_etu_daily_summary(db, start_date, end_date, vehicles=None):
+    """
+    Per-vehicle per-day Sonderrechte summaries (etu_sonderrechte_daily,
+    written by etu_summary.py) from start_date to end_date.
+    """
+    query = daily_summary_query(start_date, end_date, vehicles)
+    try:
+        docs = list(db.etu_sonderrechte_daily.find(query, DAILY_SUMMARY_PROJECTION))
+    except Exception as e:
+        print(f"ERROR in get_etu_daily_summary: {str(e)}")
+        return pd.DataFrame()
+    return pd.DataFrame(docs)
+
+
+def vehicle_pattern(vehicles):
+    """Regex for an EINSATZMITTEL ending in one of the vehicle ids (e.g. Ret SL 20-83-01)"""
+    return r"(^|\s)(" + "|".join(re.escape(v) for v in vehicles) + r")\s*$"
+
+
+# etu_leitstelle and nida_index fields of the CEDUS/diagnosis join
+CEDUS_ETU_FIELDS = ["EINSATZ_NR", "EINSATZMITTEL", "CEDUS_CODE"]
+CEDUS_INDEX_FIELDS = ["missionNumber", "leadingDiagnosis"]
+
+
+def cedus_query(vehicles=None):
+    """MongoDB query of the ETÜ missions of the vehicles (all without vehicles)"""
+    query = dict(ETU_DISTRICT)
+    if vehicles:
+        query["EINSATZMITTEL"] = {"$regex": vehicle_pattern(vehicles)}
+    return query
+
+
+def diagnosis_query(mission_numbers):
+    """MongoDB query of the NIDA protocols of the mission numbers"""
+    return {"missionNumber": {"$in": list(mission_numbers)}}
+
+
+def get_cedus_diagnosis(db, vehicles=None, limit=50000, fields=CEDUS_ETU_FIELDS):
+    """
+    CEDUS_CODE of the ETÜ missions of the given vehicles with the
+    leadingDiagnosis of the matching NIDA protocol.
+
+    The vehicle filter runs in MongoDB and only the mission number,
+    EINSATZMITTEL, CEDUS_CODE and leadingDiagnosis are fetched.
+    """
+    try:
+        etu_df = find_frame(
+            db,
+            "etu_leitstelle",
+            cedus_query(vehicles),
+            fields=fields,
+            sort=[("EINSATZBEGINN", -1)],
+            limit=limit,
+        )
+        if etu_df.empty:
             return pd.DataFrame()
 
-        df = pd.DataFrame(docs)
-        return df
+        missions = etu_df.get("EINSATZ_NR", pd.Series(dtype=object)).dropna()
+        index_df = find_frame(
+            db,
+            "nida_index",
+            diagnosis_query(missions.unique()),
+            fields=CEDUS_INDEX_FIELDS,
+        )
+        return shape_cedus_diagnosis(etu_df, index_df, vehicles)
 
     except Exception as e:
-        print(f"ERROR in get_etu: {str(e)}")
+        print(f"ERROR in get_cedus_diagnosis: {str(e)}")
         return pd.DataFrame()
 
 
+def shape_cedus_diagnosis(etu_df, index_df, vehicles=None):
+    """
+    Join the ETÜ missions with their leadingDiagnosis; the vehicle id is the
+    last word of EINSATZMITTEL. Returns EINSATZ_NR, vehicle, CEDUS_CODE and
+    leadingDiagnosis.
+    """
+    columns = ["EINSATZ_NR", "vehicle", "CEDUS_CODE", "leadingDiagnosis"]
+    for col in ["EINSATZ_NR", "EINSATZMITTEL", "CEDUS_CODE"]:
+        if col not in etu_df.columns:
+            etu_df[col] = None
+    for col in ["missionNumber", "leadingDiagnosis"]:
+        if col not in index_df.columns:
+            index_df[col] = None
+
+    etu_df["vehicle"] = etu_df["EINSATZMITTEL"].astype("string").str.split().str[-1]
+    if vehicles:
+        etu_df = etu_df[etu_df["vehicle"].isin(vehicles)]
+
+    index_df = index_df.drop_duplicates("missionNumber")
+    df = etu_df.merge(
+        index_df[["missionNumber", "leadingDiagnosis"]],
+        left_on="EINSATZ_NR",
+        right_on="missionNumber",
+        how="left",
+    )
+    return df[columns].reset_index(drop=True)
+
+
 def get_rtm_vorhaltung(db, filters=None, limit=10000):
     """
     Load vehicle availability configuration from MongoDB into a DataFrame.
@@ -146,7 +445,7 @@ def get_rtm_vorhaltung(db, filters=None, limit=10000):
 
     try:
         # Check collection exists
-        if "rtm_vorhaltung" not in db.list_collection_names():
+        if not collection_exists(db, "rtm_vorhaltung"):
             print("Collection 'vehicles' not found.")
             return pd.DataFrame()
 
@@ -164,25 +463,29 @@ def get_rtm_vorhaltung(db, filters=None, limit=10000):
 
         # Convert to DataFrame
         df = pd.DataFrame(docs)
-
-        # Optional: enforce column order / normalization
-        expected_cols = [
-            "_id",
-            "vehicle_identifier",
-            "vehicle_type",
-            "station",
-            "valid_from",
-            "valid_to",
-            "availability",
-            "total_week_hours",
-        ]
-
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = None
-
-        return df[expected_cols]
+        return shape_rtm_vorhaltung(df)
 
     except Exception as e:
         print(f"ERROR in get_vehicle_config: {e}")
         return pd.DataFrame()
+
+
+def shape_rtm_vorhaltung(df):
+    """Enforce the column order of the vehicle availability configuration"""
+    # Optional: enforce column order / normalization
+    expected_cols = [
+        "_id",
+        "vehicle_identifier",
+        "vehicle_type",
+        "station",
+        "valid_from",
+        "valid_to",
+        "availability",
+        "total_week_hours",
+    ]
+
+    for col in expected_cols:
+        if col not in df.columns:
+            df[col] = None
+
+    return df[expected_cols]
@@ -1,7 +1,9 @@
 import pandas as pd
 
+from .decoding import elem_match, projection
 
-def get_medikamente(db, med_name=None, limit=10000):
+
+def get_medikamente(db, med_name=None, limit=10000, fields=None):
     """
     Load medications from protocols_measures
 
@@ -10,7 +12,7 @@ def get_medikamente(db, med_name=None, limit=10000):
     - med_name: Optional name of medication to filter by (can be in value_2 or value_6)
     - limit: Maximum number of records to return
     """
-    query = {"data": {"$elemMatch": {"value_1": "Medikamente"}}}
+    query = elem_match(value_1="Medikamente")
 
     # If a specific medication is requested, add to query
     if med_name:
@@ -30,14 +32,18 @@ def get_medikamente(db, med_name=None, limit=10000):
             }
         }
 
-    docs = list(db.protocols_measures.find(query, limit=limit))
+    docs = list(db.protocols_measures.find(query, projection(fields), limit=limit))
     if not docs:
         return pd.DataFrame()
 
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+    return shape_medikamente(df, med_name)
+
 
+def shape_medikamente(df, med_name=None):
+    """Select and rename the columns of flattened measures rows for medications"""
     df = df[df["value_1"] == "Medikamente"]
 
     # If a medication name was specified, filter the results
@@ -48,6 +54,7 @@ def get_medikamente(db, med_name=None, limit=10000):
         ].str.lower().str.contains(med_name_lower, na=False)
         df = df[mask]
 
+    df = df.copy()
     df["metric"] = "Medikamente"
     df["med_name"] = df.get("value_2")
     df["route"] = df.get("value_3")
@@ -73,19 +80,23 @@ def get_medikamente(db, med_name=None, limit=10000):
     return df[keep]
 
 
-def get_intubation(db, limit=10000):
+def get_intubation(db, limit=10000, fields=None):
     """Load intubation data from protocols_measures"""
-    query = {"data": {"$elemMatch": {"value_1": "Atemweg"}}}
-    docs = list(db.protocols_measures.find(query, limit=limit))
+    query = elem_match(value_1="Atemweg")
+    docs = list(db.protocols_measures.find(query, projection(fields), limit=limit))
     if not docs:
         return pd.DataFrame()
 
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+    return shape_intubation(df)
+
 
+def shape_intubation(df):
+    """Select and rename the columns of flattened measures rows for intubations"""
     # Fixed the boolean operation with proper parentheses
-    df = df[(df["value_2"] == "Intubation") & (df["value_3"].notna())]
+    df = df[(df["value_2"] == "Intubation") & (df["value_3"].notna())].copy()
 
     df["metric"] = "Intubation"
     df["type"] = df.get("value_3")
@@ -108,12 +119,10 @@ def get_intubation(db, limit=10000):
     return df[keep]
 
 
-def get_12lead_ecg(db, limit=10000):
+def get_12lead_ecg(db, limit=10000, fields=None):
     """Load 12-lead ECG data from protocols_measures"""
-    query = {
-        "data": {"$elemMatch": {"value_1": "Monitoring", "value_2": "12-Kanal-EKG"}}
-    }
-    docs = list(db.protocols_measures.find(query, limit=limit))
+    query = elem_match(value_1="Monitoring", value_2="12-Kanal-EKG")
+    docs = list(db.protocols_measures.find(query, projection(fields), limit=limit))
 
     if not docs:
         return pd.DataFrame()
@@ -121,8 +130,12 @@ def get_12lead_ecg(db, limit=10000):
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+    return shape_12lead_ecg(df)
 
-    df = df[(df["value_1"] == "Monitoring") & (df["value_2"] == "12-Kanal-EKG")]
+
+def shape_12lead_ecg(df):
+    """Select and rename the columns of flattened measures rows for 12-lead ECGs"""
+    df = df[(df["value_1"] == "Monitoring") & (df["value_2"] == "12-Kanal-EKG")].copy()
 
     df["metric"] = "12-Kanal-EKG"
     df["performed"] = True  # If it's in the database, it was performed
@@ -143,18 +156,22 @@ def get_12lead_ecg(db, limit=10000):
     return df[keep]
 
 
-def get_evm(db, limit=10000):
+def get_evm(db, limit=10000, fields=None):
     """Load EVM (erweiterte Versorgungsmaßnahmen) data from protocols_measures"""
-    query = {"data": {"$elemMatch": {"value_11": "EVM"}}}
-    docs = list(db.protocols_measures.find(query, limit=limit))
+    query = elem_match(value_11="EVM")
+    docs = list(db.protocols_measures.find(query, projection(fields), limit=limit))
     if not docs:
         return pd.DataFrame()
 
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+    return shape_evm(df)
+
 
-    df = df[df["value_11"] == "EVM"]
+def shape_evm(df):
+    """Select and rename the columns of flattened measures rows for EVM"""
+    df = df[df["value_11"] == "EVM"].copy()
 
     df["metric"] = "EVM"
     df["type"] = df.get("value_1")
@@ -0,0 +1,99 @@
+"""
+Cached metadata of the MongoDB collections: which collections exist, their
+estimated document count, their indexes and flags the loaders set (e.g.
+mixed_types from the Arrow decoding).
+
+The loaders used to call db.list_collection_names() on every query just to
+check for one collection. The registry keeps the names per database for
+REFRESH_SECONDS and fetches count and indexes of a collection on first use.
+"""
+
+import threading
+import time
+
+REFRESH_SECONDS = 600
+
+_lock = threading.Lock()
+# database name -> {"loaded_at": ..., "names": set, "collections": {name: {...}},
+#                   "flags": {name: set}}
+_registry = {}
+
+
+def _database_entry(db, refresh=False):
+    """Registry entry of a database, reloading the collection names when stale"""
+    with _lock:
+        entry = _registry.get(db.name)
+        if (
+            refresh
+            or entry is None
+            or time.monotonic() - entry["loaded_at"] > REFRESH_SECONDS
+        ):
+            entry = {
+                "loaded_at": time.monotonic(),
+                "names": set(db.list_collection_names()),
+                "collections": {},
+                "flags": {},
+            }
+            _registry[db.name] = entry
+        return entry
+
+
+def collection_exists(db, name):
+    """Whether the collection exists, without a server round trip while cached"""
+    return name in _database_entry(db)["names"]
+
+
+def collection_metadata(db, name, refresh=False):
+    """
+    Estimated document count and indexes ({index name: key list}) of a
+    collection, or None if it does not exist.
+    """
+    entry = _database_entry(db, refresh=refresh)
+    if name not in entry["names"]:
+        return None
+    metadata = entry["collections"].get(name)
+    if metadata is None:
+        collection = db[name]
+        metadata = {
+            "count": collection.estimated_document_count(),
+            "indexes": {
+                index_name: info["key"]
+                for index_name, info in collection.index_information().items()
+            },
+        }
+        with _lock:
+            entry["collections"][name] = metadata
+    return metadata
+
+
+def estimated_count(db, name):
+    """Estimated number of documents of a collection (0 if it does not exist)"""
+    metadata = collection_metadata(db, name)
+    return metadata["count"] if metadata else 0
+
+
+def collection_indexes(db, name):
+    """Indexes of a collection as {index name: key list}"""
+    metadata = collection_metadata(db, name)
+    return metadata["indexes"] if metadata else {}
+
+
+def collection_flag(db, name, flag):
+    """Whether a flag is set on a collection (flags expire with the names)"""
+    return flag in _database_entry(db)["flags"].get(name, ())
+
+
+def set_collection_flag(db, name, flag):
+    """Set a flag on a collection until the registry entry is refreshed"""
+    entry = _database_entry(db)
+    with _lock:
+        entry["flags"].setdefault(name, set()).add(flag)
+
+
+def invalidate(db=None):
+    """Drop the cached metadata of one database (all databases without db)"""
+    with _lock:
+        if db is None:
+            _registry.clear()
+        else:
+            _registry.pop(db.name, None)
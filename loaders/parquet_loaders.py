@@ -0,0 +1,326 @@
+import json
+import datetime
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from parquet_store import read_collection
+from phase_analysis import daily_phase_summary
+from etu_summary import day_start_utc, local_dates
+from data_helpers import combine_date_time_fields, process_boolean_fields
+from .index_loaders import (
+    ETU_PHASE_FIELDS,
+    CEDUS_ETU_FIELDS,
+    DETAILS_COLUMNS,
+    etu_search_range,
+    shape_index,
+    shape_etu,
+    shape_rtm_vorhaltung,
+    shape_cedus_diagnosis,
+    shape_mission_days,
+    shape_etu_missions,
+)
+from .findings_loaders import shape_findings_metric
+from .measures_loaders import (
+    shape_medikamente,
+    shape_intubation,
+    shape_12lead_ecg,
+    shape_evm,
+)
+from .results_loaders import shape_naca
+from .vitals_loaders import VITALS, shape_vitals
+
+
+def protocol_filters(filters, date_field=None):
+    """Translate the loader filters dict into a pyarrow expression and year range"""
+    expression = None
+    year_range = None
+    if filters and "year_range" in filters:
+        year_range = filters["year_range"]
+        if date_field:
+            year_start, year_end = year_range
+            expression = (
+                ds.field(date_field) >= datetime.datetime(year_start, 1, 1)
+            ) & (
+                ds.field(date_field) <= datetime.datetime(year_end, 12, 31, 23, 59, 59)
+            )
+    if filters and "protocol_ids" in filters:
+        ids = ds.field("protocolId").isin(filters["protocol_ids"])
+        expression = ids if expression is None else expression & ids
+    return expression, year_range
+
+
+def parquet_columns(fields, *extra):
+    """
+    Parquet columns of a loader's MongoDB fields (see LOADER_FIELDS): data
+    entry keys are columns of the flattened rows, nested fields are joined
+    with _. `extra` columns are read for sorting. None reads every column.
+    """
+    if fields is None:
+        return None
+    columns = [
+        field[len("data.") :] if field.startswith("data.") else field.replace(".", "_")
+        for field in fields
+    ]
+    return list(dict.fromkeys(columns + list(extra)))
+
+
+def newest_first(df, sort_col, limit):
+    """Mimic .sort(field, -1).limit(limit) of the MongoDB loaders"""
+    if df.empty:
+        return df
+    if sort_col in df.columns:
+        df = df.sort_values(sort_col, ascending=False, na_position="last")
+    return df.head(limit).reset_index(drop=True)
+
+
+def get_index_parquet(db=None, filters=None, limit=10000, fields=None):
+    """Read nida_index from Parquet with partition pruning on the year range"""
+    expression, year_range = protocol_filters(filters, "missionDate")
+    df = read_collection(
+        "nida_index",
+        columns=parquet_columns(fields, "missionDate"),
+        filter=expression,
+        year_range=year_range,
+    )
+    df = newest_first(df, "missionDate", limit)
+    if df.empty:
+        return pd.DataFrame()
+    return shape_index(df)
+
+
+def get_details_parquet(db=None, filters=None, limit=10000, fields=None):
+    """Read the flattened protocols_details from Parquet"""
+    expression, _ = protocol_filters(filters)
+    columns = DETAILS_COLUMNS
+    if fields is not None:
+        columns = parquet_columns(fields, "content_dateStatusAlarm")
+    df = read_collection("protocols_details", columns=columns, filter=expression)
+    df = newest_first(df, "content_dateStatusAlarm", limit)
+    df = combine_date_time_fields(df)
+    return process_boolean_fields(df)
+
+
+def get_freetext_parquet(db=None, filters=None, limit=10000, fields=None):
+    """Read protocols_freetexts from Parquet"""
+    expression, _ = protocol_filters(filters)
+    df = read_collection(
+        "protocols_freetexts", columns=parquet_columns(fields), filter=expression
+    )
+    return df.head(limit)
+
+
+def get_etu_parquet(db=None, filters=None, limit=10000, fields=None):
+    """Read etu_leitstelle for the Schleswig-Flensburg district from Parquet"""
+    expression = ds.field("EO_LANDKREIS") == "Schleswig-Flensburg"
+    for field, value in (filters or {}).items():
+        expression = expression & (ds.field(field) == value)
+    df = read_collection(
+        "etu_leitstelle",
+        columns=parquet_columns(fields, "EINSATZBEGINN"),
+        filter=expression,
+    )
+    return shape_etu(newest_first(df, "EINSATZBEGINN", limit))
+
+
+def etu_district():
+    """pyarrow expression of the Schleswig-Flensburg ETÜ missions"""
+    return ds.field("EO_LANDKREIS") == "Schleswig-Flensburg"
+
+
+def get_etu_vehicles_parquet(db=None, filters=None):
+    """Sorted distinct EINSATZMITTEL of the ETÜ missions from Parquet"""
+    expression = etu_district()
+    for field, value in (filters or {}).items():
+        expression = expression & (ds.field(field) == value)
+    df = read_collection("etu_leitstelle", columns=["EINSATZMITTEL"], filter=expression)
+    if df.empty:
+        return []
+    return sorted(v for v in df["EINSATZMITTEL"].dropna().unique() if v)
+
+
+def get_etu_mission_days_parquet(db=None, vehicle=None):
+    """Local days with ETÜ missions of a vehicle (by EINSATZBEGINN) from Parquet"""
+    df = read_collection(
+        "etu_leitstelle",
+        columns=["EINSATZBEGINN"],
+        filter=etu_district() & (ds.field("EINSATZMITTEL") == vehicle),
+    )
+    if df.empty:
+        return []
+    return shape_mission_days(local_dates(df["EINSATZBEGINN"]))
+
+
+def get_etu_missions_parquet(
+    db=None, vehicles=(), start_date=None, end_date=None, fields=ETU_PHASE_FIELDS
+):
+    """Phase fields of the ETÜ missions of the vehicles from Parquet"""
+    start, end = etu_search_range(start_date, end_date)
+    expression = (
+        etu_district()
+        & ds.field("EINSATZMITTEL").isin(list(vehicles))
+        & (ds.field("EINSATZBEGINN") >= start)
+        & (ds.field("EINSATZBEGINN") < end)
+    )
+    df = read_collection(
+        "etu_leitstelle",
+        columns=parquet_columns(fields, "EINSATZBEGINN"),
+        filter=expression,
+        year_range=(start.year, end.year),
+    )
+    if "EINSATZBEGINN" in df.columns:
+        df = df.sort_values("EINSATZBEGINN", kind="mergesort")
+    return shape_etu_missions(df, start_date, end_date)
+
+
+def get_etu_daily_summary_parquet(
+    db=None, start_date=None, end_date=None, vehicles=None
+):
+    """Per-vehicle per-day Sonderrechte summaries computed from the Parquet ETÜ"""
+    # EINSATZBEGINN is stored as naive UTC, the days are local
+    start = day_start_utc(start_date)
+    end = day_start_utc(end_date + datetime.timedelta(days=1))
+    expression = (
+        etu_district()
+        & (ds.field("EINSATZBEGINN") >= start)
+        & (ds.field("EINSATZBEGINN") < end)
+    )
+    if vehicles:
+        expression = expression & ds.field("EINSATZMITTEL").isin(list(vehicles))
+    df = read_collection(
+        "etu_leitstelle",
+        columns=ETU_PHASE_FIELDS,
+        filter=expression,
+        year_range=(start.year, end.year),
+    )
+    for col in ETU_PHASE_FIELDS:
+        if col not in df.columns:
+            df[col] = None
+    return daily_phase_summary(shape_etu(df))
+
+
+def get_cedus_diagnosis_parquet(
+    db=None, vehicles=None, limit=50000, fields=CEDUS_ETU_FIELDS
+):
+    """Read the CEDUS_CODE → leadingDiagnosis columns of ETÜ and Index from Parquet"""
+    etu_df = read_collection(
+        "etu_leitstelle",
+        columns=parquet_columns(fields, "EINSATZBEGINN"),
+        filter=ds.field("EO_LANDKREIS") == "Schleswig-Flensburg",
+    )
+    if etu_df.empty:
+        return pd.DataFrame()
+    if vehicles and "EINSATZMITTEL" in etu_df.columns:
+        vehicle = etu_df["EINSATZMITTEL"].astype("string").str.split().str[-1]
+        etu_df = etu_df[vehicle.isin(vehicles)]
+    etu_df = newest_first(etu_df, "EINSATZBEGINN", limit)
+
+    index_df = pd.DataFrame()
+    if "EINSATZ_NR" in etu_df.columns:
+        missions = etu_df["EINSATZ_NR"].dropna().unique().tolist()
+        index_df = read_collection(
+            "nida_index",
+            columns=["missionNumber", "leadingDiagnosis"],
+            filter=ds.field("missionNumber").isin(missions),
+        )
+    return shape_cedus_diagnosis(etu_df, index_df, vehicles)
+
+
+def get_rtm_vorhaltung_parquet(db=None, filters=None, limit=10000):
+    """Read the vehicle availability configuration from Parquet"""
+    expression = None
+    for field, value in (filters or {}).items():
+        condition = ds.field(field) == value
+        expression = condition if expression is None else expression & condition
+    df = read_collection("rtm_vorhaltung", filter=expression).head(limit)
+    if df.empty:
+        return pd.DataFrame()
+    if "availability" in df.columns:
+        # Nested availability was stored as JSON text
+        df["availability"] = df["availability"].apply(
+            lambda x: json.loads(x) if isinstance(x, str) else x
+        )
+    return shape_rtm_vorhaltung(df)
+
+
+def read_data_rows(collection, expression, limit, fields=None):
+    """Read flattened data entries, limited to the first `limit` protocols like find(limit=)"""
+    df = read_collection(
+        collection, columns=parquet_columns(fields, "_id"), filter=expression
+    )
+    if df.empty or "_id" not in df.columns:
+        return df
+    first_docs = df["_id"].drop_duplicates().head(limit)
+    return df[df["_id"].isin(first_docs)]
+
+
+def get_metric_from_findings_parquet(db=None, metric=None, limit=10000, fields=None):
+    """Read GCS/Schmerzen rows from the flattened protocols_findings"""
+    df = read_data_rows(
+        "protocols_findings", ds.field("description") == metric, limit, fields
+    )
+    if df.empty:
+        return pd.DataFrame()
+    return shape_findings_metric(df, metric)
+
+
+def get_metric_from_results_parquet(db=None, limit=10000, fields=None):
+    """Read NACA rows from the flattened protocols_results"""
+    df = read_data_rows(
+        "protocols_results", ds.field("value_1") == "NACA", limit, fields
+    )
+    if df.empty:
+        return pd.DataFrame()
+    return shape_naca(df)
+
+
+def get_medikamente_parquet(db=None, med_name=None, limit=10000, fields=None):
+    """Read medication rows from the flattened protocols_measures"""
+    df = read_data_rows(
+        "protocols_measures", ds.field("value_1") == "Medikamente", limit, fields
+    )
+    if df.empty:
+        return pd.DataFrame()
+    return shape_medikamente(df, med_name)
+
+
+def get_intubation_parquet(db=None, limit=10000, fields=None):
+    """Read intubation rows from the flattened protocols_measures"""
+    df = read_data_rows(
+        "protocols_measures", ds.field("value_2") == "Intubation", limit, fields
+    )
+    if df.empty:
+        return pd.DataFrame()
+    return shape_intubation(df)
+
+
+def get_12lead_ecg_parquet(db=None, limit=10000, fields=None):
+    """Read 12-lead ECG rows from the flattened protocols_measures"""
+    expression = (ds.field("value_1") == "Monitoring") & (
+        ds.field("value_2") == "12-Kanal-EKG"
+    )
+    df = read_data_rows("protocols_measures", expression, limit, fields)
+    if df.empty:
+        return pd.DataFrame()
+    return shape_12lead_ecg(df)
+
+
+def get_evm_parquet(db=None, limit=10000, fields=None):
+    """Read EVM rows from the flattened protocols_measures"""
+    df = read_data_rows(
+        "protocols_measures", ds.field("value_11") == "EVM", limit, fields
+    )
+    if df.empty:
+        return pd.DataFrame()
+    return shape_evm(df)
+
+
+def get_vitals_parquet(db=None, vital=None, limit=10000, fields=None):
+    """Read a flattened vitals collection from Parquet"""
+    if vital not in VITALS:
+        return pd.DataFrame()
+    collection_name = vital
+    df = read_data_rows(f"vitals_{collection_name}", None, limit, fields)
+    if df.empty:
+        return pd.DataFrame()
+    return shape_vitals(df, vital, collection_name)
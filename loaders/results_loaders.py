@@ -1,20 +1,24 @@
 import pandas as pd
 from data_helpers import ja_nein_to_bool
-import data_loading
+from .decoding import elem_match, projection
 
 
-def get_metric_from_results(db, limit=10000):
+def get_metric_from_results(db, limit=10000, fields=None):
     """Load NACA score from protocols_results"""
-    query = {"data": {"$elemMatch": {"value_1": "NACA"}}}
-    docs = list(db.protocols_results.find(query, limit=limit))
+    query = elem_match(value_1="NACA")
+    docs = list(db.protocols_results.find(query, projection(fields), limit=limit))
     if not docs:
         return pd.DataFrame()
 
     df = pd.DataFrame(docs).explode("data").reset_index(drop=True)
     flat = pd.json_normalize(df["data"])
     df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+    return shape_naca(df)
 
-    df = df[df["value_1"] == "NACA"]
+
+def shape_naca(df):
+    """Select and rename the columns of flattened results rows for the NACA score"""
+    df = df[df["value_1"] == "NACA"].copy()
 
     df["metric"] = "NACA"
     df["NACA-Score"] = df.get("value_2")
@@ -26,7 +30,7 @@ def get_metric_from_results(db, limit=10000):
     return df[keep]
 
 
-def get_symptom_onset(db, limit=10000):
+def get_symptom_onset(db, limit=10000, fields=None):
     """
     Load symptom onset time data from protocol_results
 
@@ -38,11 +42,15 @@ def get_symptom_onset(db, limit=10000):
     Note: The timeStamp field in the database is often null for these entries.
 
     """
-    onset_query = {"data": {"$elemMatch": {"value_1": "Symptombeginn"}}}
-    spec_query = {"data": {"$elemMatch": {"value_1": "Spezifikation Symptombeginn"}}}
+    onset_query = elem_match(value_1="Symptombeginn")
+    spec_query = elem_match(value_1="Spezifikation Symptombeginn")
 
-    onset_docs = list(db.protocols_results.find(onset_query, limit=limit))
-    spec_docs = list(db.protocols_results.find(spec_query, limit=limit))
+    onset_docs = list(
+        db.protocols_results.find(onset_query, projection(fields), limit=limit)
+    )
+    spec_docs = list(
+        db.protocols_results.find(spec_query, projection(fields), limit=limit)
+    )
 
     if not onset_docs and not spec_docs:
         return pd.DataFrame()
@@ -206,15 +214,19 @@ def get_symptom_onset(db, limit=10000):
         )
 
 
-def get_reanimation(db, limit=10000):
+def get_reanimation(db, limit=10000, fields=None):
     """Load reanimation data - NACA 6 or explicit reanimation field"""
     # First get all NACA 6 cases
-    naca_query = {"data": {"$elemMatch": {"value_1": "NACA", "value_2": "6"}}}
-    naca_docs = list(db.protocols_results.find(naca_query, limit=limit))
+    naca_query = elem_match(value_1="NACA", value_2="6")
+    naca_docs = list(
+        db.protocols_results.find(naca_query, projection(fields), limit=limit)
+    )
 
     # Get explicit reanimation field
-    rea_query = {"data": {"$elemMatch": {"value_1": "Rea durchgeführt"}}}
-    rea_docs = list(db.protocols_results.find(rea_query, limit=limit))
+    rea_query = elem_match(value_1="Rea durchgeführt")
+    rea_docs = list(
+        db.protocols_results.find(rea_query, projection(fields), limit=limit)
+    )
 
     # Combine and process
     if not naca_docs and not rea_docs:
@@ -283,14 +295,14 @@ def get_reanimation(db, limit=10000):
     return df[keep]
 
 
-def get_reanimation_with_targetDestination(db, limit=10000):
+def get_reanimation_with_targetDestination(db, limit=10000, fields=None):
     """
     Load reanimation data and merge with index data to get target destination
     Only returns cases where reanimation was performed (rea_status = True)
     Handles duplicate protocol IDs by keeping only the most recent entry
     """
     # Get reanimation data
-    df_rea = get_reanimation(db, limit=limit)
+    df_rea = get_reanimation(db, limit=limit, fields=fields)
 
     if df_rea.empty:
         # Return empty DataFrame with expected columns if no reanimation data
@@ -1,6 +1,8 @@
 import pandas as pd
 from typing import Dict, List, Any, Optional
 
+from .decoding import projection
+
 # Flipped vitals dictionary - collection names to API shortcodes
 VITALS = {
     "af": "af",
@@ -16,7 +18,7 @@ VITALS = {
 }
 
 
-def get_vitals(db, vital, limit=10000):
+def get_vitals(db, vital, limit=10000, fields=None):
     """Load vital signs from vitals collection"""
     # Find the collection name for the given vital shortcode
     collection_name = None
@@ -32,7 +34,7 @@ def get_vitals(db, vital, limit=10000):
     query = {}  # No specific query filter needed
     try:
         collection = db[f"vitals_{collection_name}"]
-        docs = list(collection.find(query, limit=limit))
+        docs = list(collection.find(query, projection(fields), limit=limit))
 
         if not docs:
             return pd.DataFrame()
@@ -51,46 +53,51 @@ def get_vitals(db, vital, limit=10000):
             flat = pd.json_normalize(df["data"])
             df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
 
-        # Create standardized output
-        df["metric"] = vital
-        df["value"] = df.get("value", None)
-        df["unit"] = df.get("unit", df.get("%", None))
-        df["o2Administration"] = df.get("o2Administration", None)
-        df["description"] = df.get("description", None)
-        df["timestamp"] = df.get("timeStamp", df.get("timestamp", None))
-        df["source"] = df.get("source", None)
-        df["collection"] = f"vitals_{collection_name}"
-
-        # Ensure all expected columns exist
-        for col in [
-            "protocolId",
-            "metric",
-            "value",
-            "unit",
-            "o2Administration",
-            "description",
-            "timestamp",
-            "source",
-            "collection",
-        ]:
-            if col not in df.columns:
-                df[col] = None
-
-        keep = [
-            "protocolId",
-            "metric",
-            "value",
-            "unit",
-            "o2Administration",
-            "description",
-            "timestamp",
-            "source",
-            "collection",
-        ]
-        return df[keep]
+        return shape_vitals(df, vital, collection_name)
 
     except Exception as e:
         print(
             f"Error loading vital {vital} from collection vitals_{collection_name}: {e}"
         )
         return pd.DataFrame()
+
+
+def shape_vitals(df, vital, collection_name):
+    """Standardize flattened vitals rows to the common vitals columns"""
+    # Create standardized output
+    df["metric"] = vital
+    df["value"] = df.get("value", None)
+    df["unit"] = df.get("unit", df.get("%", None))
+    df["o2Administration"] = df.get("o2Administration", None)
+    df["description"] = df.get("description", None)
+    df["timestamp"] = df.get("timeStamp", df.get("timestamp", None))
+    df["source"] = df.get("source", None)
+    df["collection"] = f"vitals_{collection_name}"
+
+    # Ensure all expected columns exist
+    for col in [
+        "protocolId",
+        "metric",
+        "value",
+        "unit",
+        "o2Administration",
+        "description",
+        "timestamp",
+        "source",
+        "collection",
+    ]:
+        if col not in df.columns:
+            df[col] = None
+
+    keep = [
+        "protocolId",
+        "metric",
+        "value",
+        "unit",
+        "o2Administration",
+        "description",
+        "timestamp",
+        "source",
+        "collection",
+    ]
+    return df[keep]
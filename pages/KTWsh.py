@@ -12,6 +12,18 @@ from api_client import (
     cached_get_transports,
     cached_get_transport_status_history
 )
+from analytics import WEEKDAY_GROUP_ORDER
+from ktwsh_pipeline import (
+    data_fingerprint,
+    cached_prepare,
+    cached_daily_counts,
+    cached_heatmap,
+    cached_category_analysis,
+    cached_complete_flows,
+    update_flow_digests,
+    cached_transition_index,
+)
+from status_flow import weekly_statistics
 
 # ========== KEYCLOAK LOGIN CHECK ==========
 # Check if user is logged in with Keycloak
@@ -93,79 +105,24 @@ def load_transport_data():
                 transportstatushistory_df['changed_by_username']
             )
     
-    return transport_df, transportstatushistory_df
+    fingerprint = data_fingerprint(transport_df, transportstatushistory_df)
+    return transport_df, transportstatushistory_df, fingerprint
 
 
 # Load the data
-transport_df, transportstatushistory_df = load_transport_data()
-
-# Data Preparation
-if not transport_df.empty and 'created_at' in transport_df.columns:
-    # Ensure created_at is datetime
-    if not pd.api.types.is_datetime64_any_dtype(transport_df["created_at"]):
-        transport_df["created_at"] = pd.to_datetime(
-            transport_df["created_at"], errors='coerce'
-        )
-    
-    # Use agreed_transport_datetime as fallback if created_at is null
-    if 'agreed_transport_datetime' in transport_df.columns:
-        null_created_at = transport_df['created_at'].isna()
-        if null_created_at.any():
-            # Convert agreed_transport_datetime to datetime if needed
-            # Use utc=True to handle mixed timezones
-            if not pd.api.types.is_datetime64_any_dtype(
-                transport_df["agreed_transport_datetime"]
-            ):
-                transport_df["agreed_transport_datetime"] = pd.to_datetime(
-                    transport_df["agreed_transport_datetime"], 
-                    errors='coerce',
-                    utc=True
-                )
-            
-            # If it was already datetime but with timezone, ensure it is UTC
-            elif transport_df["agreed_transport_datetime"].dt.tz is not None:
-                transport_df["agreed_transport_datetime"] = transport_df[
-                    "agreed_transport_datetime"
-                ].dt.tz_convert('UTC')
-            
-            # Fill null created_at with agreed_transport_datetime
-            # We need to make sure created_at is also UTC or compatible
-            if transport_df["created_at"].dt.tz is None:
-                # If created_at is naive, we might need to make agreed naive too
-                # or make created_at aware. Let's make agreed naive (UTC)
-                transport_df.loc[
-                    null_created_at, 'created_at'
-                ] = transport_df.loc[
-                    null_created_at, 'agreed_transport_datetime'
-                ].dt.tz_localize(None)
-            else:
-                # Both aware, should be fine
-                transport_df.loc[
-                    null_created_at, 'created_at'
-                ] = transport_df.loc[
-                    null_created_at, 'agreed_transport_datetime'
-                ]
-    
-    # Remove timezone information to avoid comparison issues
-    if transport_df["created_at"].dt.tz is not None:
-        # Only localize if it has timezone info
-        transport_df["created_at"] = transport_df[
-            "created_at"
-        ].dt.tz_localize(None)
-    
+transport_df, transportstatushistory_df, data_version = load_transport_data()
+
+# Data Preparation, memoized per data version: reruns without new data only redraw
+transport_df, transportstatushistory_df = cached_prepare(
+    data_version, transport_df, transportstatushistory_df
+)
+
+if 'created_at' in transport_df.columns:
     # Show data quality info
     null_count = transport_df["created_at"].isna().sum()
     if null_count > 0:
         st.warning(f"⚠️ {null_count} Transporte haben kein gültiges Zeitstempel!")
 
-
-
-# Clean pickup_station: remove ", Zimmer XXX" pattern
-if not transport_df.empty and "pickup_station" in transport_df.columns:
-    transport_df["pickup_station"] = transport_df[
-        "pickup_station"
-    ].str.replace(r',\s*Zimmer\s*\d+', '', regex=True)
-
 # Page configuration and title
 st.set_page_config(
     page_title="KTW.sh Jahresbericht 2025",
@@ -261,49 +218,12 @@ Steigerung der Nutzung nach der Einführungsphase.
 """)
 
 # Daily transport counts
-# Filter out transports without created_at
-transport_with_valid_dates = transport_df[
-    transport_df['created_at'].notna()
-].copy()
-
-if transport_with_valid_dates.empty:
+if not transport_df['created_at'].notna().any():
     st.error("❌ Keine Transporte mit gültigem created_at Datum!")
     st.stop()
 
-# Ensure created_at is timezone-naive for proper date comparisons
-transport_dates = transport_with_valid_dates["created_at"].copy()
-if transport_dates.dt.tz is not None:
-    transport_dates = transport_dates.dt.tz_localize(None)
-
-# Group by date and count transports
-daily_counts = pd.DataFrame({
-    'Datum': transport_dates.dt.date,
-    'count': 1
-}).groupby('Datum').sum().reset_index()
-daily_counts.columns = ["Datum", "Anzahl Transporte"]
-daily_counts["Datum"] = pd.to_datetime(daily_counts["Datum"])
-
-# Create a complete date range from actual data min to today
-start_date = transport_dates.min().normalize()
-end_date = pd.to_datetime('today').normalize()
-full_date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-
-# Create a complete DataFrame with all dates
-full_daily_counts = pd.DataFrame({'Datum': full_date_range})
-full_daily_counts = full_daily_counts.merge(
-    daily_counts, on='Datum', how='left'
-)
-full_daily_counts['Anzahl Transporte'] = full_daily_counts[
-    'Anzahl Transporte'
-].fillna(0)
-
-# Calculate moving averages for trend analysis
-full_daily_counts['7-Tage Durchschnitt'] = full_daily_counts[
-    'Anzahl Transporte'
-].rolling(window=7, center=True).mean()
-full_daily_counts['30-Tage Durchschnitt'] = full_daily_counts[
-    'Anzahl Transporte'
-].rolling(window=30, center=True).mean()
+# Daily counts from the first transport until today with 7/30 day trends
+full_daily_counts = cached_daily_counts(data_version, transport_df)
 
 # Create enhanced line chart with trends
 fig_daily = go.Figure()
@@ -356,65 +276,10 @@ st.subheader(
     "die meisten Transportanmeldungen erfolgen."
 )
 
-# Create German weekday mapping
-weekday_german = {
-    "Monday": "Montag",
-    "Tuesday": "Dienstag", 
-    "Wednesday": "Mittwoch",
-    "Thursday": "Donnerstag",
-    "Friday": "Freitag",
-    "Saturday": "Samstag",
-    "Sunday": "Sonntag"
-}
-
-# Use agreed_transport_datetime for heatmap
-heatmap_source_col = "agreed_transport_datetime"
-if heatmap_source_col not in transport_df.columns:
-    heatmap_source_col = "created_at"
-
-# Ensure it is datetime
-if not pd.api.types.is_datetime64_any_dtype(transport_df[heatmap_source_col]):
-    transport_df[heatmap_source_col] = pd.to_datetime(
-        transport_df[heatmap_source_col], errors='coerce', utc=True
-    )
-
-# Localize if needed
-if transport_df[heatmap_source_col].dt.tz is not None:
-    transport_df["heatmap_dt"] = transport_df[
-        heatmap_source_col
-    ].dt.tz_localize(None)
-else:
-    transport_df["heatmap_dt"] = transport_df[heatmap_source_col]
-
-transport_df["weekday"] = transport_df["heatmap_dt"].dt.day_name().map(
-    weekday_german
-)
-transport_df["hour"] = transport_df["heatmap_dt"].dt.hour
-
-# Create heatmap data
-heatmap_data_2d = (
-    transport_df.groupby(["weekday", "hour"])
-    .size().reset_index(name="counts")
-)
+# Weekday x hour counts of agreed_transport_datetime (else created_at)
+heatmap_data_2d = cached_heatmap(data_version, transport_df)
 
 if not heatmap_data_2d.empty:
-    heatmap_data_2d = heatmap_data_2d.pivot(
-        index="weekday", columns="hour", values="counts"
-    ).fillna(0)
-    
-    # Ensure all hours from 0 to 23 are included
-    all_hours = list(range(24))
-    heatmap_data_2d = heatmap_data_2d.reindex(
-        columns=all_hours, fill_value=0
-    )
-    
-    # Reorder weekdays - German names
-    weekdays_order = [
-        "Montag", "Dienstag", "Mittwoch", "Donnerstag",
-        "Freitag", "Samstag", "Sonntag"
-    ]
-    heatmap_data_2d = heatmap_data_2d.reindex(weekdays_order)
-    
     # Create enhanced heatmap
     fig2 = px.imshow(
         heatmap_data_2d,
@@ -465,69 +330,14 @@ if not heatmap_data_2d.empty:
         **Anzahl Anmeldungen:** {busiest_count:.0f}
         """)
 
-# Load holidays (simplified - empty dataframe for demonstration)
-holidays_df = pd.DataFrame()
-
-# Prepare holiday dates
-holiday_dates = []
-if not holidays_df.empty:
-    holiday_dates = holidays_df['date'].dt.date.tolist()
-
-# Create weekday groups and handle holidays
-transport_df_analysis = transport_df.copy()
-
-# Use agreed_transport_datetime for analysis as requested
-target_col = 'agreed_transport_datetime'
-if target_col not in transport_df_analysis.columns:
-    target_col = 'created_at'
-
-# Normalize to timezone-naive datetime for analysis
-if not pd.api.types.is_datetime64_any_dtype(transport_df_analysis[target_col]):
-    transport_df_analysis[target_col] = pd.to_datetime(
-        transport_df_analysis[target_col], errors='coerce', utc=True
-    )
-
-if transport_df_analysis[target_col].dt.tz is not None:
-    transport_df_analysis['analysis_dt'] = transport_df_analysis[
-        target_col
-    ].dt.tz_localize(None)
-else:
-    transport_df_analysis['analysis_dt'] = transport_df_analysis[target_col]
-
-transport_df_analysis['weekday_name'] = transport_df_analysis[
-    'analysis_dt'
-].dt.day_name()
-transport_df_analysis['date'] = transport_df_analysis['analysis_dt'].dt.date
-
-# Function to categorize weekdays including holidays
-def categorize_weekday(row):
-    if row['date'] in holiday_dates:
-        return 'Wochenfeiertag'
-    elif row['weekday_name'] in ['Monday', 'Tuesday', 'Wednesday', 'Thursday']:
-        return 'Mo-Do'
-    elif row['weekday_name'] == 'Friday':
-        return 'Fr'
-    elif row['weekday_name'] == 'Saturday':
-        return 'Sa'
-    else:  # Sunday
-        return 'So'
-
-transport_df_analysis['weekday_group'] = transport_df_analysis.apply(categorize_weekday, axis=1)
-
-# Group by transport category and weekday group
-category_weekday_analysis = transport_df_analysis.groupby([
-    'krankenbeforderungsfahrt_kategorie', 
-    'weekday_group'
-]).size().unstack(fill_value=0)
-
-# Ensure all weekday groups are present
-weekday_order = ['Mo-Do', 'Fr', 'Sa', 'So', 'Wochenfeiertag']
-for group in weekday_order:
-    if group not in category_weekday_analysis.columns:
-        category_weekday_analysis[group] = 0
-
-# Reorder columns
-category_weekday_analysis = category_weekday_analysis[weekday_order]
+# Weekday groups including the holidays, category x weekday group crosstab
+(
+    transport_df_analysis,
+    holidays_df,
+    holiday_dates,
+    category_weekday_analysis,
+) = cached_category_analysis(data_version, transport_df)
+weekday_order = WEEKDAY_GROUP_ORDER
 
 st.write("### Krankenbeforderungsfahrt-Kategorien nach Wochentag-Gruppen")
 
@@ -649,85 +459,18 @@ Notwendigkeit telefonischer Nachfragen erheblich reduziert.
 
 st.markdown("### 📊 Zeitanalyse der Statusübergänge")
 
-# Prepare the data
-df = transportstatushistory_df.copy()
+# The status history is already prepared with timezone-naive changed_at
+df = transportstatushistory_df
 
-if not df.empty and "changed_at" in df.columns:
-    # Convert to datetime and handle timezone issues
-    df["changed_at"] = pd.to_datetime(df["changed_at"], utc=True)
-    # Convert to timezone-naive for analysis
-    df["changed_at"] = df["changed_at"].dt.tz_localize(None)
-else:
+if df.empty or "changed_at" not in df.columns:
     # If no data, create empty result
     st.info("Keine Transportstatus-Daten verfügbar für die Analyse.")
     st.stop()
 
-# Analyze complete flow paths
-complete_flows = []
-
-for transport_id in df["transport_id"].unique():
-    transportHistorySorted_df = df[df["transport_id"] == transport_id].sort_values("changed_at")
-
-    # Look for transports that go through all these statuses
-    statuses = transportHistorySorted_df["new_status"].tolist()
-
-    # Check if this transport follows or contains the sequence
-    if "offen" in statuses:
-        offen_idx = statuses.index("offen")
-        remaining_statuses = statuses[offen_idx:]
-
-        # Check for various sequences
-        has_angenommen = "angenommen" in remaining_statuses
-        has_disponiert = "disponiert" in remaining_statuses
-        has_abgeschlossen = "abgeschlossen" in remaining_statuses
-
-        if (
-            has_angenommen and has_disponiert and has_abgeschlossen
-        ):  # Full flow
-            offen_time = transportHistorySorted_df[
-                transportHistorySorted_df["new_status"] == "offen"
-            ]["changed_at"].iloc[0]
-            angenommen_time = transportHistorySorted_df[
-                transportHistorySorted_df["new_status"] == "angenommen"
-            ]["changed_at"].iloc[0]
-            disponiert_time = transportHistorySorted_df[
-                transportHistorySorted_df["new_status"] == "disponiert"
-            ]["changed_at"].iloc[0]
-            abgeschlossen_time = transportHistorySorted_df[
-                transportHistorySorted_df["new_status"] == "abgeschlossen"
-            ]["changed_at"].iloc[-1]
-
-            # Calculate durations for each step
-            offen_to_angenommen = (
-                angenommen_time - offen_time
-            ).total_seconds() / 60
-            angenommen_to_disponiert = (
-                disponiert_time - angenommen_time
-            ).total_seconds() / 60
-            disponiert_to_abgeschlossen = (
-                abgeschlossen_time - disponiert_time
-            ).total_seconds() / 60
-            total_duration = (
-                abgeschlossen_time - offen_time
-            ).total_seconds() / 60
-
-            complete_flows.append(
-                {
-                    "transport_id": transport_id,
-                    "offen_start": offen_time,
-                    "angenommen_time": angenommen_time,
-                    "disponiert_time": disponiert_time,
-                    "abgeschlossen_time": abgeschlossen_time,
-                    "offen_to_angenommen_min": offen_to_angenommen,
-                    "angenommen_to_disponiert_min": angenommen_to_disponiert,
-                    "disponiert_to_abgeschlossen_min": disponiert_to_abgeschlossen,
-                    "total_duration_min": total_duration,
-                }
-            )
-
-if complete_flows:
-    complete_flows_df = pd.DataFrame(complete_flows)
+# Analyze complete flow paths (offen → angenommen → disponiert → abgeschlossen)
+complete_flows_df = cached_complete_flows(data_version, df)
 
+if not complete_flows_df.empty:
     st.write(
         f"**Transporte mit vollständiger Flussfolge "
         f"(offen → angenommen → disponiert → abgeschlossen): "
@@ -748,38 +491,33 @@ if complete_flows:
     # Summary statistics for each step
     st.write("**Durchschnittliche Dauer pro Schritt:**")
 
+    flow_digests = update_flow_digests(complete_flows_df)
+
+    # Step statistics of the selected weeks, merged from the weekly sketches
+    digest_weeks = flow_digests.weeks()
+    selected_weeks = st.select_slider(
+        "Zeitraum (Wochenbeginn)",
+        options=digest_weeks,
+        value=(digest_weeks[0], digest_weeks[-1]),
+        format_func=lambda week: week.strftime('%d.%m.%Y'),
+    ) if len(digest_weeks) > 1 else (None, None)
+
+    step_digests = {
+        label: flow_digests.merged(step, *selected_weeks)
+        for label, step in [
+            ("offen → angenommen", "offen_to_angenommen_min"),
+            ("angenommen → disponiert", "angenommen_to_disponiert_min"),
+            ("disponiert → abgeschlossen", "disponiert_to_abgeschlossen_min"),
+            ("Gesamtdauer", "total_duration_min"),
+        ]
+    }
     step_stats = pd.DataFrame(
         {
-            "Schritt": [
-                "offen → angenommen",
-                "angenommen → disponiert",
-                "disponiert → abgeschlossen",
-                "Gesamtdauer",
-            ],
-            "Durchschnitt": [
-                f"{complete_flows_df['offen_to_angenommen_min'].mean():.1f}",
-                f"{complete_flows_df['angenommen_to_disponiert_min'].mean():.1f}",
-                f"{complete_flows_df['disponiert_to_abgeschlossen_min'].mean():.1f}",
-                f"{complete_flows_df['total_duration_min'].mean():.1f}",
-            ],
-            "Median": [
-                f"{complete_flows_df['offen_to_angenommen_min'].median():.1f}",
-                f"{complete_flows_df['angenommen_to_disponiert_min'].median():.1f}",
-                f"{complete_flows_df['disponiert_to_abgeschlossen_min'].median():.1f}",
-                f"{complete_flows_df['total_duration_min'].median():.1f}",
-            ],
-            "Min": [
-                f"{complete_flows_df['offen_to_angenommen_min'].min():.1f}",
-                f"{complete_flows_df['angenommen_to_disponiert_min'].min():.1f}",
-                f"{complete_flows_df['disponiert_to_abgeschlossen_min'].min():.1f}",
-                f"{complete_flows_df['total_duration_min'].min():.1f}",
-            ],
-            "Max": [
-                f"{complete_flows_df['offen_to_angenommen_min'].max():.1f}",
-                f"{complete_flows_df['angenommen_to_disponiert_min'].max():.1f}",
-                f"{complete_flows_df['disponiert_to_abgeschlossen_min'].max():.1f}",
-                f"{complete_flows_df['total_duration_min'].max():.1f}",
-            ],
+            "Schritt": list(step_digests),
+            "Durchschnitt": [f"{d.mean:.1f}" for d in step_digests.values()],
+            "Median": [f"{d.quantile(0.5):.1f}" for d in step_digests.values()],
+            "Min": [f"{d.min:.1f}" for d in step_digests.values()],
+            "Max": [f"{d.max:.1f}" for d in step_digests.values()],
         }
     )
 
@@ -788,87 +526,56 @@ if complete_flows:
     # Zeitliche Entwicklung der offen -> angenommen Zeiten
     st.subheader("Zeitliche Entwicklung: offen → angenommen Dauer")
     
-    # Gruppiere nach Woche für bessere Visualisierung
-    complete_flows_df['week'] = complete_flows_df['offen_start'].dt.to_period('W')
-    weekly_stats = complete_flows_df.groupby('week').agg({
-        'offen_to_angenommen_min': ['mean', 'median', 'count']
-    }).round(1)
-    
-    # Flatten column names
-    weekly_stats.columns = ['Durchschnitt', 'Median', 'Anzahl']
-    weekly_stats = weekly_stats.reset_index()
-    weekly_stats['week'] = weekly_stats['week'].dt.start_time
+    # Quartile per week, only weeks with at least 2 transports for more stable statistics
+    weekly_candlestick = flow_digests.weekly('offen_to_angenommen_min')
+    weekly_candlestick_filtered = weekly_candlestick[weekly_candlestick['Count'] >= 2]
     
-    # Nur Wochen mit mindestens 2 Transporten anzeigen für stabilere Statistiken
-    weekly_stats_filtered = weekly_stats[weekly_stats['Anzahl'] >= 2]
-    
-    if len(weekly_stats_filtered) > 1:
-        # Erstelle erweiterte Statistiken für Candlestick Chart
-        weekly_candlestick = complete_flows_df.groupby('week').agg({
-            'offen_to_angenommen_min': [
-                'min',        # Low
-                lambda x: x.quantile(0.25),  # Q1 (25%)
-                'median',     # Median (50%)
-                'mean',       # Mean
-                lambda x: x.quantile(0.75),  # Q3 (75%)
-                'max',        # High
-                'count'
-            ]
-        }).round(1)
+    if len(weekly_candlestick_filtered) > 1:
+        # Erstelle Candlestick Chart
+        fig_candle = go.Figure()
         
-        # Flatten column names
-        weekly_candlestick.columns = ['Min', 'Q1', 'Median', 'Mean', 'Q3', 'Max', 'Count']
-        weekly_candlestick = weekly_candlestick.reset_index()
-        weekly_candlestick['week'] = weekly_candlestick['week'].dt.start_time
-        weekly_candlestick_filtered = weekly_candlestick[weekly_candlestick['Count'] >= 2]
+        # Candlestick für Q1-Q3 Bereich
+        fig_candle.add_trace(go.Candlestick(
+            x=weekly_candlestick_filtered['week'],
+            open=weekly_candlestick_filtered['Q1'],
+            high=weekly_candlestick_filtered['Max'],
+            low=weekly_candlestick_filtered['Min'],
+            close=weekly_candlestick_filtered['Q3'],
+            name='Min/Max & Q1-Q3',
+            increasing_line_color='green',
+            decreasing_line_color='red'
+        ))
         
-        if len(weekly_candlestick_filtered) > 1:
-            # Erstelle Candlestick Chart
-            fig_candle = go.Figure()
-            
-            # Candlestick für Q1-Q3 Bereich
-            fig_candle.add_trace(go.Candlestick(
-                x=weekly_candlestick_filtered['week'],
-                open=weekly_candlestick_filtered['Q1'],
-                high=weekly_candlestick_filtered['Max'],
-                low=weekly_candlestick_filtered['Min'],
-                close=weekly_candlestick_filtered['Q3'],
-                name='Min/Max & Q1-Q3',
-                increasing_line_color='green',
-                decreasing_line_color='red'
-            ))
-            
-            # Median als Linie
-            fig_candle.add_trace(go.Scatter(
-                x=weekly_candlestick_filtered['week'],
-                y=weekly_candlestick_filtered['Median'],
-                mode='lines+markers',
-                name='Median',
-                line=dict(color='blue', width=2),
-                marker=dict(size=6)
-            ))
-            
-            # Mean als Linie
-            fig_candle.add_trace(go.Scatter(
-                x=weekly_candlestick_filtered['week'],
-                y=weekly_candlestick_filtered['Mean'],
-                mode='lines+markers',
-                name='Durchschnitt',
-                line=dict(color='orange', width=2, dash='dash'),
-                marker=dict(size=6, symbol='diamond')
-            ))
-            
-            fig_candle.update_layout(
-                title='Quartil-Analyse: offen → angenommen Dauer (pro Woche)',
-                xaxis_title='Wochenbeginn',
-                yaxis_title='Dauer (Minuten)',
-                xaxis_rangeslider_visible=False,
-                height=500
-            )
-            
-            st.plotly_chart(fig_candle, use_container_width=True, key="status_flow_candlestick")
-
+        # Median als Linie
+        fig_candle.add_trace(go.Scatter(
+            x=weekly_candlestick_filtered['week'],
+            y=weekly_candlestick_filtered['Median'],
+            mode='lines+markers',
+            name='Median',
+            line=dict(color='blue', width=2),
+            marker=dict(size=6)
+        ))
         
+        # Mean als Linie
+        fig_candle.add_trace(go.Scatter(
+            x=weekly_candlestick_filtered['week'],
+            y=weekly_candlestick_filtered['Mean'],
+            mode='lines+markers',
+            name='Durchschnitt',
+            line=dict(color='orange', width=2, dash='dash'),
+            marker=dict(size=6, symbol='diamond')
+        ))
+        
+        fig_candle.update_layout(
+            title='Quartil-Analyse: offen → angenommen Dauer (pro Woche)',
+            xaxis_title='Wochenbeginn',
+            yaxis_title='Dauer (Minuten)',
+            xaxis_rangeslider_visible=False,
+            height=500
+        )
+        
+        st.plotly_chart(fig_candle, use_container_width=True, key="status_flow_candlestick")
+
         # Zusätzliche Tabelle mit den detaillierten wöchentlichen Daten
         with st.expander("Detaillierte wöchentliche Quartil-Statistiken"):
             st.dataframe(weekly_candlestick_filtered, use_container_width=True)
@@ -901,6 +608,48 @@ else:
     - Transporte befinden sich noch nicht in allen Workflow-Stufen
     """)
 
+# Freely selectable status transitions (e.g. offen → storniert)
+st.subheader("Statusübergänge frei auswählen")
+
+transition_index = cached_transition_index(data_version, df)
+available_statuses = transition_index.statuses
+
+if len(available_statuses) >= 2:
+    col1, col2 = st.columns(2)
+    with col1:
+        start_status = st.selectbox(
+            "Von Status",
+            available_statuses,
+            index=available_statuses.index("offen") if "offen" in available_statuses else 0,
+        )
+    with col2:
+        end_status = st.selectbox(
+            "Bis Status",
+            available_statuses,
+            index=available_statuses.index("storniert") if "storniert" in available_statuses else 1,
+        )
+
+    transition_df = transition_index.durations(start_status, end_status)
+
+    if transition_df.empty:
+        st.info(f"Keine Transporte mit Übergang {start_status} → {end_status} gefunden.")
+    else:
+        percentiles = transition_index.percentiles(start_status, end_status)
+        cols = st.columns(len(percentiles) + 1)
+        cols[0].metric("Transporte", f"{len(transition_df):,}")
+        for col, (q, value) in zip(cols[1:], percentiles.items()):
+            col.metric(f"P{q * 100:.0f}", f"{value:.1f} Min")
+
+        transition_weekly = weekly_statistics(transition_df)
+        fig_transition = px.line(
+            transition_weekly,
+            x='week',
+            y=['Q1', 'Median', 'Q3'],
+            title=f'{start_status} → {end_status} Dauer (pro Woche)',
+            labels={'week': 'Wochenbeginn', 'value': 'Dauer (Minuten)', 'variable': ''},
+        )
+        st.plotly_chart(fig_transition, use_container_width=True, key="status_transition_weekly")
+
 st.markdown("---")
 
 ## 🎯 **Fazit und Ausblick 2025**
@@ -7,6 +7,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 from data_loading import data_loading
+from instrumentation import query_debug_panel
+from data_helpers import classify_weekday_groups
+from vehicle_kpis import vehicle_kpis, top_mission_types, turnaround_times, turnaround_stats
+from utilization import vehicle_utilization, weekly_utilization
+from concurrency import busy_intervals, concurrency_series, hourly_load, peak_profile, series_window
+from sankey import cedus_diagnosis_sankey
+from analytics import (
+    missions_per_vehicle_per_day,
+    vehicle_group_daily_counts,
+    weekday_hour_heatmap,
+    weekday_group_crosstab,
+)
+import rollups
 
 # ========== KEYCLOAK LOGIN CHECK ==========
 # Check if user is logged in with Keycloak
@@ -34,6 +47,15 @@ st.set_page_config(
 # Load Details data
 details_df = data_loading("Details", limit=15000)
 
+# Daily counts, heatmap and concurrency come from the nightly rollups once they
+# exist, limited to the alarm days of the loaded Details like the KPIs
+rollup_days = None
+if rollups.has_rollup("details") and 'StatusAlarm' in details_df.columns:
+    alarm_days = pd.to_datetime(details_df['StatusAlarm'], errors='coerce').dropna()
+    if not alarm_days.empty:
+        rollup_days = (alarm_days.min().normalize(), alarm_days.max().normalize())
+use_rollups = rollup_days is not None
+
 # Header section with improved styling
 st.title("🚑 S-KTW Jahresbericht 2025")
 st.markdown("---")
@@ -74,18 +96,8 @@ if not selected_df.empty:
     unique_days = selected_df['content_dateStatus1'].nunique() if 'content_dateStatus1' in selected_df.columns else 1
     avg_daily_missions = total_missions / unique_days if unique_days > 0 else 0
     
-    # Calculate total fleet hours (sum of all vehicle working hours)
-    total_fleet_hours = 0
-    vehicle_stats = []
-    
-    for vehicle in selected_vehicles:
-        vehicle_data = selected_df[selected_df['content_callSign'] == vehicle]
-        vehicle_missions = len(vehicle_data)
-        vehicle_stats.append({
-            'Fahrzeug': vehicle,
-            'Einsätze': vehicle_missions,
-            'Anteil (%)': (vehicle_missions / total_missions * 100) if total_missions > 0 else 0
-        })
+    # All per-vehicle KPIs from one groupby on content_callSign
+    fleet_kpis = vehicle_kpis(selected_df, selected_vehicles)
     
     # Display main KPIs
     col1, col2, col3, col4 = st.columns(4)
@@ -116,169 +128,69 @@ if not selected_df.empty:
     
     ### **Fahrzeugspezifische Leistungsübersicht**
     
-    # Total transports per vehicle
-    transport_stats = selected_df['content_callSign'].value_counts().reset_index()
-    transport_stats.columns = ['Fahrzeug', 'Gesamt Transporte']
-    
-    # Calculate time working between StatusAlarm and StatusEnd
-    time_working_stats = []
-    
-    for vehicle in selected_vehicles:
-        vehicle_data = selected_df[selected_df['content_callSign'] == vehicle]
-        
-        # Try to calculate time difference using Status1 and StatusEnd
-        total_working_time = 0
-        
-        # Check if we have the datetime columns for Status1 and StatusEnd
-        if ('content_dateStatus1' in details_df.columns and 'content_timeStatus1' in details_df.columns and
-            'content_dateStatusEnd' in details_df.columns and 'content_timeStatusEnd' in details_df.columns):
-            
-            vehicle_data_copy = vehicle_data.copy()
-            
-            # Combine date and time for Status1 (start time)
-            vehicle_data_copy['status1_datetime'] = pd.to_datetime(
-                vehicle_data_copy['content_dateStatus1'].astype(str) + ' ' + 
-                vehicle_data_copy['content_timeStatus1'].astype(str), 
-                errors='coerce'
-            )
-            
-            # Combine date and time for StatusEnd
-            vehicle_data_copy['statusend_datetime'] = pd.to_datetime(
-                vehicle_data_copy['content_dateStatusEnd'].astype(str) + ' ' + 
-                vehicle_data_copy['content_timeStatusEnd'].astype(str), 
-                errors='coerce'
-            )
-            
-            # Calculate time differences where both timestamps are valid
-            valid_times = (vehicle_data_copy['status1_datetime'].notna() & 
-                          vehicle_data_copy['statusend_datetime'].notna())
-            
-            if valid_times.any():
-                time_diffs = (vehicle_data_copy.loc[valid_times, 'statusend_datetime'] - 
-                             vehicle_data_copy.loc[valid_times, 'status1_datetime']).dt.total_seconds() / 3600
-                total_working_time = time_diffs.sum()
-        
-        # Fallback: try using StatusAlarm column if it exists as datetime
-        elif 'StatusAlarm' in details_df.columns and 'StatusEnd' in details_df.columns:
-            vehicle_data_copy = vehicle_data.copy()
-            vehicle_data_copy['StatusAlarm'] = pd.to_datetime(vehicle_data_copy['StatusAlarm'], errors='coerce')
-            vehicle_data_copy['StatusEnd'] = pd.to_datetime(vehicle_data_copy['StatusEnd'], errors='coerce')
-            
-            valid_times = (vehicle_data_copy['StatusAlarm'].notna() & 
-                          vehicle_data_copy['StatusEnd'].notna())
-            
-            if valid_times.any():
-                time_diffs = (vehicle_data_copy.loc[valid_times, 'StatusEnd'] - 
-                             vehicle_data_copy.loc[valid_times, 'StatusAlarm']).dt.total_seconds() / 3600
-                total_working_time = time_diffs.sum()
-        
-        time_working_stats.append({
-            'Fahrzeug': vehicle,
-            'Gesamt Einsatzstunden': round(total_working_time, 2) if total_working_time > 0 else 'N/A'
-        })
-    
-    # Merge statistics
-    stats_df = transport_stats.merge(pd.DataFrame(time_working_stats), on='Fahrzeug', how='left')
+    # Total transports and working time (Status1 to StatusEnd) per vehicle
+    stats_df = pd.DataFrame({
+        'Fahrzeug': fleet_kpis.index,
+        'Gesamt Transporte': fleet_kpis['Einsätze'].to_numpy(),
+        'Gesamt Einsatzstunden': [
+            hours if hours > 0 else 'N/A' for hours in fleet_kpis['Gesamt Einsatzstunden']
+        ],
+    })
     st.dataframe(stats_df)
 
     # Add collapsed detail field for individual vehicle analysis
     with st.expander("🔍 Detaillierte S-KTW Fahrzeug-Analyse", expanded=False):
         st.markdown("### Einzelfahrzeug-Statistiken")
         
-        # Find date column for charts
-        chart_date_col = None
-        for col in details_df.columns:
-            if 'content_dateStatus1' in col:
-                chart_date_col = col
-                break
-            elif 'date' in col.lower() and 'alarm' in col.lower():
-                chart_date_col = col
-                break
-            elif 'date' in col.lower():
-                chart_date_col = col
-        
+        mission_types_by_vehicle = top_mission_types(selected_df)
         
         for vehicle in selected_vehicles:
-            vehicle_data = selected_df[selected_df['content_callSign'] == vehicle]
-            
-            if not vehicle_data.empty:
+            if vehicle in fleet_kpis.index:
+                kpis = fleet_kpis.loc[vehicle]
                 st.markdown(f"#### 🚐 **{vehicle}**")
                 
                 # Create columns for metrics
                 col1, col2, col3, col4 = st.columns(4)
                 
                 with col1:
-                    vehicle_missions = len(vehicle_data)
+                    vehicle_missions = int(kpis['Einsätze'])
                     st.metric("Einsätze", f"{vehicle_missions:,}")
                 
                 with col2:
-                    # Calculate percentage of total fleet missions
-                    percentage = (vehicle_missions / total_missions * 100) if total_missions > 0 else 0
-                    st.metric("Flotten-Anteil", f"{percentage:.1f}%")
+                    # Percentage of total fleet missions
+                    st.metric("Flotten-Anteil", f"{kpis['Anteil (%)']:.1f}%")
                 
                 with col3:
                     # Active days for this vehicle
-                    if 'content_dateStatus1' in vehicle_data.columns:
-                        vehicle_active_days = vehicle_data['content_dateStatus1'].nunique()
-                        st.metric("Aktive Tage", f"{vehicle_active_days}")
+                    if pd.notna(kpis['Aktive Tage']):
+                        st.metric("Aktive Tage", f"{int(kpis['Aktive Tage'])}")
                     else:
                         st.metric("Aktive Tage", "N/A")
                 
                 with col4:
                     # Average missions per active day
-                    if 'content_dateStatus1' in vehicle_data.columns:
-                        vehicle_active_days = vehicle_data['content_dateStatus1'].nunique()
-                        avg_per_day = vehicle_missions / vehicle_active_days if vehicle_active_days > 0 else 0
-                        st.metric("Ø Einsätze/Tag", f"{avg_per_day:.1f}")
+                    if pd.notna(kpis['Ø Einsätze/Tag']):
+                        st.metric("Ø Einsätze/Tag", f"{kpis['Ø Einsätze/Tag']:.1f}")
                     else:
                         st.metric("Ø Einsätze/Tag", "N/A")
                 
                 # Mission type distribution for this vehicle
-                if 'content_missionType' in vehicle_data.columns:
-                    mission_types = vehicle_data['content_missionType'].value_counts()
-                    if not mission_types.empty:
-                        st.write("**Top Einsatztypen:**")
-                        for mission_type, count in mission_types.head(3).items():
-                            percentage = (count / vehicle_missions * 100) if vehicle_missions > 0 else 0
-                            st.write(f"- {mission_type}: {count} ({percentage:.1f}%)")
+                mission_types = mission_types_by_vehicle[
+                    mission_types_by_vehicle['Fahrzeug'] == vehicle
+                ]
+                if not mission_types.empty:
+                    st.write("**Top Einsatztypen:**")
+                    for mission_type, count in zip(mission_types['Einsatztyp'], mission_types['Anzahl']):
+                        percentage = (count / vehicle_missions * 100) if vehicle_missions > 0 else 0
+                        st.write(f"- {mission_type}: {count} ({percentage:.1f}%)")
                 
                 # Time analysis if possible
-                if ('content_dateStatus1' in vehicle_data.columns and 
-                    'content_timeStatus1' in vehicle_data.columns and
-                    'content_dateStatusEnd' in vehicle_data.columns and 
-                    'content_timeStatusEnd' in vehicle_data.columns):
-                    
-                    vehicle_time_data = vehicle_data.copy()
-                    
-                    # Create datetime columns
-                    vehicle_time_data['start_datetime'] = pd.to_datetime(
-                        vehicle_time_data['content_dateStatus1'].astype(str) + ' ' + 
-                        vehicle_time_data['content_timeStatus1'].astype(str), 
-                        errors='coerce'
-                    )
-                    
-                    vehicle_time_data['end_datetime'] = pd.to_datetime(
-                        vehicle_time_data['content_dateStatusEnd'].astype(str) + ' ' + 
-                        vehicle_time_data['content_timeStatusEnd'].astype(str), 
-                        errors='coerce'
-                    )
-                    
-                    # Calculate mission durations
-                    valid_durations = (vehicle_time_data['start_datetime'].notna() & 
-                                     vehicle_time_data['end_datetime'].notna())
-                    
-                    if valid_durations.any():
-                        durations = (vehicle_time_data.loc[valid_durations, 'end_datetime'] - 
-                                   vehicle_time_data.loc[valid_durations, 'start_datetime']).dt.total_seconds() / 60
-                        
-                        avg_duration = durations.mean()
-                        total_hours = durations.sum() / 60
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**Ø Einsatzdauer:** {avg_duration:.1f} Min")
-                        with col2:
-                            st.write(f"**Gesamt Einsatzzeit:** {total_hours:.1f} Std")
+                if pd.notna(kpis['Ø Einsatzdauer (Min)']):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"**Ø Einsatzdauer:** {kpis['Ø Einsatzdauer (Min)']:.1f} Min")
+                    with col2:
+                        st.write(f"**Gesamt Einsatzzeit:** {kpis['Gesamt Einsatzstunden']:.1f} Std")
                 
                 st.markdown("---")
             else:
@@ -310,7 +222,31 @@ if status1_col and status2_col:
     
     st.metric("Anzahl S-KTW: Alarmiert aus Status1 aber nicht Status2", len(alerted_but_not_status2_selected))
 
-    # hi i want to add a calculation metric to calculate the time between status 2 and the next status alarm for each vehicle inside StatusAlarm
+    # Turnaround: time between Status 2 and the next alarm of the same vehicle (all vehicles)
+    turnarounds = turnaround_times(details_df)
+    if not turnarounds.empty:
+        st.write("#### Wendezeit: Status 2 bis zur nächsten Alarmierung")
+        selected_turnarounds = turnarounds[turnarounds['Fahrzeug'].isin(selected_vehicles)]
+        if not selected_turnarounds.empty:
+            st.metric(
+                "Median Wendezeit der S-KTW Fahrzeuge",
+                f"{selected_turnarounds['Wendezeit (Min)'].median():.0f} Min"
+            )
+            st.dataframe(turnaround_stats(selected_turnarounds), use_container_width=True)
+
+            hourly_turnaround = turnaround_stats(selected_turnarounds, by='Stunde').reset_index()
+            fig_turnaround = px.bar(
+                hourly_turnaround,
+                x='Stunde',
+                y='Median',
+                hover_data=['Anzahl', 'P25', 'P75', 'P90'],
+                title='Median Wendezeit nach Uhrzeit von Status 2 (S-KTW Fahrzeuge)',
+                labels={'Median': 'Median Wendezeit (Min)', 'Stunde': 'Uhrzeit'}
+            )
+            st.plotly_chart(fig_turnaround, use_container_width=True, key="turnaround_by_hour")
+
+        with st.expander("Wendezeiten aller Fahrzeuge", expanded=False):
+            st.dataframe(turnaround_stats(turnarounds), use_container_width=True)
 
 
 else:
@@ -319,61 +255,20 @@ else:
 
 # 3. Einsatzaufkommen über Zeit - Vergleich
 st.write("### Einsatzaufkommen über Zeit - Vergleich")
-
-# Find date column
-date_col = None
-for col in details_df.columns:
-    if 'content_dateStatus1' in col:
-        date_col = col
-        break
-    elif 'date' in col.lower() and 'alarm' in col.lower():
-        date_col = col
-        break
-    elif 'date' in col.lower():
-        date_col = col
-
-if 'content_callSign' in details_df.columns and date_col:
-    # Filter vehicles with -83- pattern
-    vehicles_83 = details_df[details_df['content_callSign'].str.contains('-83-', na=False)]
-    
-    # Filter vehicles with -85- pattern  
-    vehicles_85 = details_df[details_df['content_callSign'].str.contains('-85-', na=False)]
-    
-    # Filter -85- vehicles excluding selected vehicles (S-KTW)
-    vehicles_85_excluding_selected = vehicles_85[~vehicles_85['content_callSign'].isin(selected_vehicles)]
-    
-    # Prepare data for all three groups
-    details_df_copy = details_df.copy()
-    details_df_copy[date_col] = pd.to_datetime(details_df_copy[date_col], errors='coerce')
-    details_df_copy = details_df_copy.dropna(subset=[date_col])
-    
-    # Group by date for each vehicle type
-    daily_83 = vehicles_83.copy()
-    daily_83[date_col] = pd.to_datetime(daily_83[date_col], errors='coerce')
-    daily_83 = daily_83.dropna(subset=[date_col])
-    daily_83_counts = daily_83.groupby(daily_83[date_col].dt.date).size().reset_index()
-    daily_83_counts.columns = ['Datum', 'Anzahl']
-    daily_83_counts['Typ'] = 'Fahrzeuge mit **-83-**'
-    
-    daily_selected = selected_df.copy()
-    daily_selected[date_col] = pd.to_datetime(daily_selected[date_col], errors='coerce')
-    daily_selected = daily_selected.dropna(subset=[date_col])
-    daily_selected_counts = daily_selected.groupby(daily_selected[date_col].dt.date).size().reset_index()
-    daily_selected_counts.columns = ['Datum', 'Anzahl']
-    daily_selected_counts['Typ'] = 'S-KTW Fahrzeuge'
-    
-    daily_85 = vehicles_85_excluding_selected.copy()
-    daily_85[date_col] = pd.to_datetime(daily_85[date_col], errors='coerce')
-    daily_85 = daily_85.dropna(subset=[date_col])
-    daily_85_counts = daily_85.groupby(daily_85[date_col].dt.date).size().reset_index()
-    daily_85_counts.columns = ['Datum', 'Anzahl']
-    daily_85_counts['Typ'] = 'Fahrzeuge mit **-85-** ausgenommen S-KTW'
-    
-    # Combine all data
-    all_daily_counts = pd.concat([daily_83_counts, daily_selected_counts, daily_85_counts], ignore_index=True)
-    
-    # Ensure Datum is datetime
-    all_daily_counts['Datum'] = pd.to_datetime(all_daily_counts['Datum'])
+if use_rollups:
+    st.caption(f"Zeitraum: {rollup_days[0]:%d.%m.%Y} – {rollup_days[1]:%d.%m.%Y}")
+
+if use_rollups or ('content_callSign' in details_df.columns and 'StatusAlarm' in details_df.columns):
+    vehicle_groups = {
+        'Fahrzeuge mit **-83-**': ('%-83-%', None, None),
+        'S-KTW Fahrzeuge': (None, selected_vehicles, None),
+        'Fahrzeuge mit **-85-** ausgenommen S-KTW': ('%-85-%', None, selected_vehicles),
+    }
+    # Daily counts per vehicle group, from the rollup or aggregated in DuckDB
+    if use_rollups:
+        all_daily_counts = rollups.vehicle_group_daily_counts(vehicle_groups, rollup_days)
+    else:
+        all_daily_counts = vehicle_group_daily_counts(details_df, vehicle_groups)
     
     if not all_daily_counts.empty:
         # Find the maximum value across all datasets for consistent Y-axis scaling
@@ -457,45 +352,17 @@ if 'content_callSign' in details_df.columns and date_col:
     with st.expander("📊 Individuelle S-KTW Fahrzeug-Vergleich", expanded=False):
         st.markdown("### Vergleich der einzelnen S-KTW Fahrzeuge")
         
-        if not selected_df.empty and date_col:
-            # Prepare data for individual vehicle comparison
-            individual_vehicle_data = []
-            individual_max_value = 0
-            
-            for vehicle in selected_vehicles:
-                vehicle_subset = selected_df[selected_df['content_callSign'] == vehicle].copy()
-                
-                if not vehicle_subset.empty:
-                    # Create datetime column
-                    if 'StatusAlarm' in vehicle_subset.columns:
-                        vehicle_subset['alarm_datetime'] = pd.to_datetime(vehicle_subset['StatusAlarm'], errors='coerce')
-                    elif date_col in vehicle_subset.columns:
-                        vehicle_subset['alarm_datetime'] = pd.to_datetime(vehicle_subset[date_col], errors='coerce')
-                    else:
-                        continue
-                    
-                    # Remove invalid dates
-                    vehicle_subset = vehicle_subset.dropna(subset=['alarm_datetime'])
-                    
-                    if not vehicle_subset.empty:
-                        # Group by date and count missions
-                        daily_vehicle_counts = vehicle_subset.groupby(
-                            vehicle_subset['alarm_datetime'].dt.date
-                        ).size().reset_index()
-                        daily_vehicle_counts.columns = ['Datum', 'Anzahl']
-                        daily_vehicle_counts['Fahrzeug'] = vehicle
-                        daily_vehicle_counts['Datum'] = pd.to_datetime(daily_vehicle_counts['Datum'])
-                        
-                        individual_vehicle_data.append(daily_vehicle_counts)
-                        
-                        # Track maximum value for consistent Y-axis
-                        if len(daily_vehicle_counts) > 0:
-                            individual_max_value = max(individual_max_value, daily_vehicle_counts['Anzahl'].max())
+        if use_rollups or not selected_df.empty:
+            # Daily mission counts per S-KTW vehicle
+            if use_rollups:
+                all_individual_data = rollups.missions_per_vehicle_per_day(selected_vehicles, rollup_days)
+            else:
+                all_individual_data = missions_per_vehicle_per_day(
+                    selected_df, selected_vehicles
+                )
+            individual_max_value = all_individual_data['Anzahl'].max() if not all_individual_data.empty else 0
             
-            # Combine all individual vehicle data
-            if individual_vehicle_data:
-                all_individual_data = pd.concat(individual_vehicle_data, ignore_index=True)
-                
+            if not all_individual_data.empty:
                 # Create comparison chart for individual vehicles
                 fig_individual = px.line(
                     all_individual_data, 
@@ -555,20 +422,152 @@ if 'content_callSign' in details_df.columns and date_col:
             else:
                 st.warning("Keine Daten für individuellen Fahrzeugvergleich verfügbar")
         else:
-            st.warning("Keine S-KTW Daten oder Datumsspalte für Fahrzeugvergleich verfügbar")
+            st.warning("Keine S-KTW Daten für Fahrzeugvergleich verfügbar")
         
 else:
     st.error("Erforderliche Spalten nicht gefunden für die Vergleichsgrafik")
 
-# for each vehicle:
-## calculate: zeit zwischen Status2 and next status alarm for each vehicle
+st.markdown("---")
+
+## ⏱️ **Auslastung mit Vorhaltung**
+
+st.markdown("""
+Die Auslastung setzt die Einsatzzeit (Alarmierung bis Einsatzende) ins Verhältnis
+zur Vorhaltung laut RTM_Vorhaltung. Einsatzzeit außerhalb der Vorhaltung wird
+separat ausgewiesen.
+""")
+
+rtm_vorhaltung = data_loading("RTM_Vorhaltung")
+
+if (not selected_df.empty and not rtm_vorhaltung.empty
+        and {'vehicle_identifier', 'availability'} <= set(rtm_vorhaltung.columns)):
+    daily_usage = vehicle_utilization(rtm_vorhaltung, selected_df, selected_vehicles)
+
+    if not daily_usage.empty and daily_usage['available_h'].sum() > 0:
+        weekly_usage = weekly_utilization(daily_usage)
+
+        usage_summary = daily_usage.groupby('vehicle')[
+            ['available_h', 'busy_h', 'busy_available_h']
+        ].sum()
+        usage_summary['Auslastung (%)'] = (
+            usage_summary['busy_available_h'] / usage_summary['available_h'] * 100
+        )
+        usage_summary['Einsatzstunden außerhalb Vorhaltung'] = (
+            usage_summary['busy_h'] - usage_summary['busy_available_h']
+        )
+        usage_summary = usage_summary.rename(columns={
+            'available_h': 'Vorhaltestunden',
+            'busy_h': 'Einsatzstunden',
+            'busy_available_h': 'Einsatzstunden in Vorhaltung',
+        })
+        usage_summary.index.name = 'Fahrzeug'
+        st.dataframe(usage_summary.round(1), use_container_width=True)
+
+        fig_usage = px.line(
+            weekly_usage,
+            x='week',
+            y='utilization_pct',
+            color='vehicle',
+            markers=True,
+            title="Wöchentliche Auslastung je Fahrzeug",
+            labels={'week': 'Woche', 'utilization_pct': 'Auslastung (%)', 'vehicle': 'Fahrzeug'},
+        )
+        fig_usage.update_layout(height=450)
+        st.plotly_chart(fig_usage, use_container_width=True, key="weekly_utilization")
+
+        with st.expander("📅 Tägliche Auslastung"):
+            st.dataframe(
+                daily_usage.rename(columns={
+                    'vehicle': 'Fahrzeug',
+                    'day': 'Tag',
+                    'available_h': 'Vorhaltestunden',
+                    'busy_h': 'Einsatzstunden',
+                    'busy_available_h': 'Einsatzstunden in Vorhaltung',
+                    'utilization_pct': 'Auslastung (%)',
+                }).round(1),
+                use_container_width=True,
+            )
+    else:
+        st.info("Keine Vorhaltung für die ausgewählten Fahrzeuge im Einsatzzeitraum gefunden")
+else:
+    st.info("Keine Vorhaltungsdaten (RTM_Vorhaltung) verfügbar")
 
+st.markdown("---")
 
-# rtm_vorhaltung = data_loading("RTM_Vorhaltung")
+## 🔀 **Gleichzeitig gebundene Fahrzeuge**
 
-# st.dataframe(rtm_vorhaltung)
+st.markdown("""
+Anzahl der gleichzeitig im Einsatz gebundenen Fahrzeuge mit **-83-** und **-85-**
+(Alarmierung bis Einsatzende, minutengenau).
+""")
 
-## existing: auslastung in Prozent & Absolut mit vorhaltung
+# Concurrency from the rollup, otherwise swept over the loaded Details
+if use_rollups and rollups.has_rollup("concurrency"):
+    hourly_concurrency = rollups.concurrency_hourly(rollup_days)
+    concurrency_points = None
+else:
+    concurrency_points = concurrency_series(busy_intervals(details_df))
+    hourly_concurrency = hourly_load(concurrency_points)
+
+if not hourly_concurrency.empty:
+    vehicle_type = st.selectbox(
+        "Fahrzeugtyp",
+        sorted(hourly_concurrency['vehicle_type'].unique()),
+        key="concurrency_vehicle_type",
+    )
+    type_hourly = hourly_concurrency[hourly_concurrency['vehicle_type'] == vehicle_type]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Maximal gleichzeitig gebunden", int(type_hourly['peak'].max()))
+    with col2:
+        st.metric("Ø gleichzeitig gebunden", f"{type_hourly['mean_level'].mean():.1f}")
+
+    profile = peak_profile(type_hourly)
+    peak_matrix = profile.pivot(index='weekday', columns='hour', values='Ø Spitze')
+    peak_matrix = peak_matrix.reindex(index=range(7), columns=range(24))
+    peak_matrix.index = [
+        'Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag'
+    ]
+    fig_peaks = px.imshow(
+        peak_matrix,
+        labels=dict(x="Stunde", y="Wochentag", color="Ø Spitze"),
+        color_continuous_scale="Reds",
+        aspect="auto",
+        title=f"Ø Spitzenlast je Stunde ({vehicle_type})",
+    )
+    st.plotly_chart(fig_peaks, use_container_width=True, key="concurrency_peaks")
+
+    # Minute-exact course of a single day from the change points
+    last_day = type_hourly['hour_start'].max().date()
+    selected_day = st.date_input(
+        "Tagesverlauf",
+        value=last_day,
+        min_value=type_hourly['hour_start'].min().date(),
+        max_value=last_day,
+        key="concurrency_day",
+    )
+    day_start = pd.Timestamp(selected_day)
+    day_end = day_start + pd.Timedelta(days=1)
+    if concurrency_points is None:
+        day_points = rollups.concurrency_window(vehicle_type, day_start, day_end)
+    else:
+        day_points = concurrency_points
+    day_points = series_window(day_points, vehicle_type, day_start, day_end)
+    fig_day = px.line(
+        day_points,
+        x='time',
+        y='level',
+        line_shape='hv',
+        title=f"Gleichzeitig gebundene Fahrzeuge am {day_start:%d.%m.%Y}",
+        labels={'time': 'Uhrzeit', 'level': 'Fahrzeuge'},
+    )
+    st.plotly_chart(fig_day, use_container_width=True, key="concurrency_day_chart")
+
+    with st.expander("Spitzenlast je Wochentag und Stunde"):
+        st.dataframe(profile.round(1), use_container_width=True)
+else:
+    st.info("Keine Einsatzzeiten für die Gleichzeitigkeitsanalyse verfügbar")
 
 st.markdown("---")
 
@@ -626,45 +625,15 @@ if not selected_df.empty:
         heatmap_df = heatmap_df.dropna(subset=[alarm_col])
         
         if not heatmap_df.empty:
-            # Create German weekday names
-            weekday_german = {
-                0: "Montag",
-                1: "Dienstag", 
-                2: "Mittwoch",
-                3: "Donnerstag",
-                4: "Freitag",
-                5: "Samstag",
-                6: "Sonntag"
-            }
-            
-            heatmap_df["weekday"] = heatmap_df[alarm_col].dt.dayofweek.map(weekday_german)
-            heatmap_df["hour"] = heatmap_df[alarm_col].dt.hour
-            
-            heatmap_data = (
-                heatmap_df.groupby(["weekday", "hour"]).size().reset_index(name="counts")
-            )
+            # Weekday x hour counts, from the rollup or aggregated in DuckDB
+            if use_rollups:
+                heatmap_data = rollups.weekday_hour_heatmap(
+                    selected_vehicles, "Sonstige Fahrten", rollup_days
+                )
+            else:
+                heatmap_data = weekday_hour_heatmap(heatmap_df, alarm_col)
             
             if not heatmap_data.empty:
-                heatmap_data = heatmap_data.pivot(
-                    index="weekday", columns="hour", values="counts"
-                ).fillna(0)
-                
-                # Ensure all hours from 0 to 23 are included
-                all_hours = list(range(24))
-                heatmap_data = heatmap_data.reindex(columns=all_hours, fill_value=0)
-                
-                # Reorder weekdays (German names)
-                weekdays_order = [
-                    "Montag",
-                    "Dienstag", 
-                    "Mittwoch",
-                    "Donnerstag",
-                    "Freitag",
-                    "Samstag",
-                    "Sonntag",
-                ]
-                heatmap_data = heatmap_data.reindex(weekdays_order)
-                
                 # Create enhanced heatmap
                 fig = px.imshow(
                     heatmap_data,
@@ -750,34 +719,16 @@ if not selected_df.empty and 'content_missionType' in selected_df.columns:
         if not mission_analysis_df.empty:
             # Extract date information
             mission_analysis_df['date'] = mission_analysis_df[datetime_col].dt.date
-            mission_analysis_df['weekday'] = mission_analysis_df[datetime_col].dt.day_name()
             
             # Create holiday date set for comparison
             holiday_dates = set()
             if not wochenfeiertage.empty and 'date' in wochenfeiertage.columns:
                 holiday_dates = set(pd.to_datetime(wochenfeiertage['date'], errors='coerce').dt.date)
             
-            # Function to classify weekday groups
-            def classify_weekday_group(row):
-                date_obj = row['date']
-                weekday = row['weekday']
-                
-                # Check if it's a holiday first
-                if date_obj in holiday_dates:
-                    return 'Wochenfeiertag'
-                elif weekday in ['Monday', 'Tuesday', 'Wednesday', 'Thursday']:
-                    return 'Mo-Do'
-                elif weekday == 'Friday':
-                    return 'Fr'
-                elif weekday == 'Saturday':
-                    return 'Sa'
-                elif weekday == 'Sunday':
-                    return 'So'
-                else:
-                    return 'Unbekannt'
-            
-            # Apply classification
-            mission_analysis_df['weekday_group'] = mission_analysis_df.apply(classify_weekday_group, axis=1)
+            # Classify weekday groups
+            mission_analysis_df['weekday_group'] = classify_weekday_groups(
+                mission_analysis_df[datetime_col], holiday_dates
+            )
             
             # Handle empty mission types - replace empty strings with "Unbekannter Missionstyp"
             mission_analysis_df['content_missionType'] = mission_analysis_df['content_missionType'].fillna("Unbekannter Missionstyp")
@@ -788,36 +739,22 @@ if not selected_df.empty and 'content_missionType' in selected_df.columns:
             
             st.markdown("### 📊 Einsatztypen-Analyse")
                         
-            # Create cross-tabulation
-            mission_crosstab = pd.crosstab(
-                mission_analysis_df['content_missionType'], 
-                mission_analysis_df['weekday_group'], 
-                margins=True
+            # Create cross-tabulation in DuckDB
+            mission_crosstab = weekday_group_crosstab(
+                mission_analysis_df, 'content_missionType', datetime_col, sorted(holiday_dates)
             )
+            # Only keep weekday groups that occur, like pd.crosstab
+            mission_crosstab = mission_crosstab.loc[:, mission_crosstab.sum() > 0]
+            mission_pct = mission_crosstab / mission_crosstab.sum() * 100
+            available_cols_pct = list(mission_pct.columns)
             
-            # Reorder columns in desired sequence
-            desired_order = ['Mo-Do', 'Fr', 'Sa', 'So', 'Wochenfeiertag', 'All']
-            available_cols = [col for col in desired_order if col in mission_crosstab.columns]
-            mission_crosstab = mission_crosstab[available_cols]
-            
-            # Rename 'All' to 'Gesamt' for German users
-            if 'All' in mission_crosstab.columns:
-                mission_crosstab = mission_crosstab.rename(columns={'All': 'Gesamt'})
+            # Add totals (margins)
+            mission_crosstab['Gesamt'] = mission_crosstab.sum(axis=1)
+            mission_crosstab.loc['Gesamt'] = mission_crosstab.sum()
             
             st.write("#### Absolute Zahlen - Mission Types nach Wochentag-Gruppen")
             st.dataframe(mission_crosstab)
             
-            # Calculate percentages
-            mission_pct = pd.crosstab(
-                mission_analysis_df['content_missionType'], 
-                mission_analysis_df['weekday_group'], 
-                normalize='columns'
-            ) * 100
-            
-            # Reorder percentage table
-            available_cols_pct = [col for col in desired_order[:-1] if col in mission_pct.columns]  # Exclude 'All'
-            mission_pct = mission_pct[available_cols_pct]
-            
             st.write("#### Prozentuale Verteilung - Mission Types nach Wochentag-Gruppen")
             st.dataframe(mission_pct.round(1).applymap(lambda x: f"{x:.1f}%"))
             
@@ -999,201 +936,82 @@ top_n_flows = st.slider(
     "Anzahl der Top-Flüsse", min_value=5, max_value=500, value=20, step=5
 )
 
-# Datensätze für Sankey nur ETÜ + Index
+# CEDUS_CODE → leadingDiagnosis flows of the selected vehicles only
 with st.spinner("Lade ETÜ & Index für Sankey..."):
-    df_etu = None
-    df_index = None
-    load_errors = []
-
-    try:
-        df_etu = data_loading("ETÜ", limit=50000)
-    except Exception as e:
-        load_errors.append(f"ETÜ Daten konnten nicht geladen werden: {e}")
-
-    try:
-        df_index = data_loading("Index", limit=50000)
-    except Exception as e:
-        load_errors.append(f"Index Daten konnten nicht geladen werden: {e}")
-
-    sankey_df = pd.DataFrame()
-    if not load_errors and df_etu is not None and df_index is not None:
-        if df_etu.empty or df_index.empty:
-            load_errors.append("ETÜ oder Index leer – keine Verknüpfung möglich.")
-        else:
-            mission_col_index = 'missionNumber' if 'missionNumber' in df_index.columns else None
-            # Mögliche Einsatznummer-Kandidaten in ETÜ
-            etu_cols_lower = {c.lower(): c for c in df_etu.columns}
-            candidates = ['einsatz_nr', 'einsatznr', 'missionnumber', 'einsatznummer']
-            mission_col_etu = None
-            for cand in candidates:
-                if cand in etu_cols_lower:
-                    mission_col_etu = etu_cols_lower[cand]
-                    break
-            if not mission_col_etu:
-                for c in df_etu.columns:
-                    cl = c.lower()
-                    if 'einsatz' in cl and ('nr' in cl or 'number' in cl):
-                        mission_col_etu = c
-                        break
-
-            if mission_col_index and mission_col_etu:
-                # Find EINSATZMITTEL column (vehicle ID in ETÜ)
-                einsatzmittel_col = None
-                for c in df_etu.columns:
-                    if c.lower() in ['einsatzmittel', 'einsatz_mittel']:
-                        einsatzmittel_col = c
-                        break
-                if not einsatzmittel_col:
-                    for c in df_etu.columns:
-                        if 'einsatz' in c.lower() and 'mittel' in c.lower():
-                            einsatzmittel_col = c
-                            break
-
-                merged_df = df_etu.merge(
-                    df_index[['missionNumber', 'leadingDiagnosis']],
-                    left_on=mission_col_etu,
-                    right_on='missionNumber',
-                    how='left'
-                )
+    sankey_data = cedus_diagnosis_sankey(tuple(selected_vehicles), top_n=top_n_flows)
 
-                # Extract vehicle from EINSATZMITTEL e.g. "Ret SL 20-83-01"
-                if einsatzmittel_col:
-                    merged_df['extracted_vehicle_id'] = (
-                        merged_df[einsatzmittel_col].astype(str).apply(
-                            lambda x: x.split()[-1] if ' ' in str(x)
-                            else str(x)
-                        )
-                    )
-                    merged_df = merged_df[
-                        merged_df['extracted_vehicle_id'].isin(
-                            selected_vehicles
-                        )
-                    ]
-
-                sankey_df = merged_df.copy()
-            else:
-                load_errors.append(
-                    "Konnte keine passenden Einsatznummer-Spalten für Merge finden (ETÜ vs Index)."
-                )
-
-    if load_errors:
-        st.warning("\n".join(load_errors))
-
-if not sankey_df.empty:
-    # CEDUS_CODE Spalte ermitteln (robust)
-    cedus_col = None
-    for c in sankey_df.columns:
-        if c.upper() == 'CEDUS_CODE' or 'cedus' in c.lower():
-            cedus_col = c
-            break
-    if not cedus_col:
-        st.info(
-            "Keine CEDUS_CODE Spalte gefunden – Sankey nicht darstellbar."
-        )
-    elif 'leadingDiagnosis' not in sankey_df.columns:
-        st.info(
-            "Spalte 'leadingDiagnosis' fehlt – Sankey nicht darstellbar."
-        )
+if sankey_data is not None:
+    if not sankey_data['value']:
+        st.info("Keine ausreichenden Daten für Flussanalyse.")
     else:
-        flow_df = sankey_df[[cedus_col, 'leadingDiagnosis']].copy()
-        # Bereinigen / fehlende Werte entfernen
-        flow_df = flow_df.dropna(subset=[cedus_col, 'leadingDiagnosis'])
-        flow_df[cedus_col] = flow_df[cedus_col].astype(str).str.strip()
-        flow_df['leadingDiagnosis'] = (
-            flow_df['leadingDiagnosis'].astype(str).str.strip()
-        )
-
-        # Aggregation
-        counts = (
-            flow_df.groupby([cedus_col, 'leadingDiagnosis'])
-            .size()
-            .reset_index(name='value')
-        )
-        counts = counts.sort_values('value', ascending=False).head(top_n_flows)
-
-        if counts.empty:
-            st.info("Keine ausreichenden Daten für Flussanalyse.")
-        else:
-            # Knotenlisten erstellen
-            sources_unique = list(counts[cedus_col].unique())
-            targets_unique = list(counts['leadingDiagnosis'].unique())
-            all_nodes = sources_unique + targets_unique
-            node_index = {n: i for i, n in enumerate(all_nodes)}
-
-            # Sankey Quell-/Ziel-Indices
-            source_indices = [node_index[s] for s in counts[cedus_col]]
-            target_indices = [
-                node_index[t] for t in counts['leadingDiagnosis']
+        all_nodes = sankey_data['labels']
+        source_indices = sankey_data['source']
+        target_indices = sankey_data['target']
+        values = sankey_data['value']
+
+        # Improved color palette (light pastels for readability)
+        palette = px.colors.qualitative.Set3
+        if not palette:
+            palette = [
+                '#A6CEE3', '#B2DF8A', '#FB9A99', '#FDBF6F',
+                '#CAB2D6', '#FFFF99'
             ]
-            values = counts['value'].tolist()
-
-            # Improved color palette (light pastels for readability)
-            palette = px.colors.qualitative.Set3
-            if not palette:
-                palette = [
-                    '#A6CEE3', '#B2DF8A', '#FB9A99', '#FDBF6F',
-                    '#CAB2D6', '#FFFF99'
-                ]
-            node_colors = []
-            for i, _ in enumerate(sources_unique):
-                node_colors.append(palette[i % len(palette)])
-            offset = len(sources_unique)
-            for j, _ in enumerate(targets_unique):
-                node_colors.append(palette[(offset + j) % len(palette)])
-
-            # Display full labels (no truncation)
-            sankey_fig = go.Figure(data=[go.Sankey(
-                arrangement='snap',
-                node=dict(
-                    pad=20,
-                    thickness=16,
-                    line=dict(color='#444', width=0.7),
-                    label=all_nodes,
-                    color=node_colors,
-                    hovertemplate='%{label}<extra></extra>'
-                ),
-                link=dict(
-                    source=source_indices,
-                    target=target_indices,
-                    value=values,
-                    color='rgba(120,120,120,0.3)',
-                    hovertemplate=(
-                        '%{source.label} → %{target.label}<br>'
-                        'Anzahl: %{value}<extra></extra>'
-                    )
+        # Source nodes first, the target nodes continue the palette
+        node_colors = [palette[i % len(palette)] for i in range(len(all_nodes))]
+
+        # Display full labels (no truncation)
+        sankey_fig = go.Figure(data=[go.Sankey(
+            arrangement='snap',
+            node=dict(
+                pad=20,
+                thickness=16,
+                line=dict(color='#444', width=0.7),
+                label=all_nodes,
+                color=node_colors,
+                hovertemplate='%{label}<extra></extra>'
+            ),
+            link=dict(
+                source=source_indices,
+                target=target_indices,
+                value=values,
+                color='rgba(120,120,120,0.3)',
+                hovertemplate=(
+                    '%{source.label} → %{target.label}<br>'
+                    'Anzahl: %{value}<extra></extra>'
                 )
-            )])
-
-            sankey_fig.update_layout(
-                title=(
-                    f"Top {len(values)} Flüsse CEDUS_CODE → "
-                    "LeadingDiagnosis (S-KTW)"
-                ),
-                font=dict(
-                    size=13, color='#222',
-                    family='Arial, sans-serif'
-                ),
-                hoverlabel=dict(font_size=12),
-                margin=dict(l=10, r=10, t=50, b=10),
-                paper_bgcolor='white',
-                plot_bgcolor='white'
             )
-            # Add text outline/shadow to node labels for readability
-            sankey_fig.update_traces(
-                selector=dict(type='sankey'),
-                textfont=dict(
-                    size=13,
-                    color='#222'
+        )])
+
+        sankey_fig.update_layout(
+            title=(
+                f"Top {len(values)} Flüsse CEDUS_CODE → "
+                "LeadingDiagnosis (S-KTW)"
+            ),
+            font=dict(
+                size=13, color='#222',
+                family='Arial, sans-serif'
+            ),
+            hoverlabel=dict(font_size=12),
+            margin=dict(l=10, r=10, t=50, b=10),
+            paper_bgcolor='white',
+            plot_bgcolor='white'
+        )
+        # Add text outline/shadow to node labels for readability
+        sankey_fig.update_traces(
+            selector=dict(type='sankey'),
+            textfont=dict(
+                size=13,
+                color='#222'
+            ),
+            node=dict(
+                line=dict(
+                    color='#666',
+                    width=1.5
                 ),
-                node=dict(
-                    line=dict(
-                        color='#666',
-                        width=1.5
-                    ),
-                    pad=22
-                )
+                pad=22
             )
-            st.plotly_chart(sankey_fig, use_container_width=True)
+        )
+        st.plotly_chart(sankey_fig, use_container_width=True)
 else:
     st.info(
         "Keine geeigneten verknüpften Datensätze für Sankey verfügbar oder Laden fehlgeschlagen."
@@ -1223,3 +1041,5 @@ qualitativ hochwertige Patientenversorgung.
 *Dieser Bericht basiert auf Einsatzdaten der S-KTW-Flotte für das Jahr 2025.  
 Letzte Aktualisierung: {pd.Timestamp.now().strftime('%d.%m.%Y')}*
 """)
+
+query_debug_panel()
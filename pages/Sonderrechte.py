@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
-from data_loading import data_loading
+from data_loading import etu_vehicles, etu_mission_days, etu_missions, etu_daily_summary
+from phase_analysis import phase_analysis, phase_summary, fleet_overview
+from instrumentation import query_debug_panel
 
 # ========== KEYCLOAK LOGIN CHECK ==========
 # Check if user is logged in with Keycloak
@@ -46,28 +48,49 @@ tatsächlich dokumentierten Zeiten und Sonderrechte-Nutzung.
 
 
 
-etu_df = data_loading("ETÜ")
-
 # ========== FILTERS ==========
 col1, col2 = st.columns(2)
 
 with col1:
-    # Filter for EINSATZMITTEL (Vehicle)
-    vehicles = sorted(etu_df["EINSATZMITTEL"].dropna().unique())
+    # Filter for EINSATZMITTEL (Vehicle), distinct values from the database
+    vehicles = etu_vehicles()
     selected_vehicle = st.selectbox("🚑 Fahrzeug auswählen:", vehicles)
 
 with col2:
-    # Filter for Date
-    etu_df["ALARMIERT_date"] = pd.to_datetime(etu_df["ALARMIERT"], errors="coerce").dt.date
-    available_dates = sorted(etu_df["ALARMIERT_date"].dropna().unique(), reverse=True)
+    # Filter for Date, the newest mission day of the vehicle is preselected
+    available_dates = etu_mission_days(selected_vehicle) if selected_vehicle else []
     selected_date = st.date_input("📅 Datum auswählen:", value=available_dates[0] if available_dates else None)
 
+# ========== PERIOD REPORT ==========
+with st.expander("📅 Auswertung über mehrere Fahrzeuge und Zeitraum", expanded=False):
+    report_vehicles = st.multiselect(
+        "Fahrzeuge", vehicles, default=[selected_vehicle] if selected_vehicle else []
+    )
+    report_end = available_dates[0] if available_dates else pd.Timestamp.today().date()
+    report_range = st.date_input(
+        "Zeitraum", value=(report_end - pd.Timedelta(days=30), report_end)
+    )
+    if report_vehicles and isinstance(report_range, tuple) and len(report_range) == 2:
+        # Overview from the per-day summaries, raw missions only on demand
+        summary = etu_daily_summary(*report_range, vehicles=tuple(sorted(report_vehicles)))
+        if summary.empty:
+            st.warning("❌ Keine Einsätze im gewählten Zeitraum gefunden.")
+        else:
+            st.write(f"**{int(summary['missions'].sum())} Einsätze** im Zeitraum")
+            st.dataframe(fleet_overview(summary).reset_index(), use_container_width=True, hide_index=True)
+
+            if st.checkbox("🔍 Einzelne Fahrten laden", key="report_drill_down"):
+                report_missions = etu_missions(tuple(report_vehicles), *report_range)
+                report_phases = phase_analysis(report_missions)
+                st.dataframe(phase_summary(report_phases), use_container_width=True, hide_index=True)
+
 # ========== DATA PROCESSING ==========
-# Filter data for selected vehicle and date
-filtered_df = etu_df[
-    (etu_df["EINSATZMITTEL"] == selected_vehicle) &
-    (etu_df["ALARMIERT_date"] == selected_date)
-].copy()
+# Only the missions of the selected vehicle and date are loaded
+if not selected_vehicle or selected_date is None:
+    st.warning("❌ Kein Fahrzeug oder Datum ausgewählt.")
+    st.stop()
+
+filtered_df = etu_missions((selected_vehicle,), selected_date, selected_date)
 
 if filtered_df.empty:
     st.warning(f"❌ Keine Einsätze für {selected_vehicle} am {selected_date} gefunden.")
@@ -78,43 +101,18 @@ st.success(f"✅ {len(filtered_df)} Einsätze gefunden für {selected_vehicle} a
 # ========== ANALYSIS TABLE ==========
 st.subheader("📊 Fahrtanalyse - Anfahrt & Transport mit Sonderrechten")
 
-analysis_data = []
-
-for idx, row in filtered_df.iterrows():
-    # Anfahrt (Approach)
-    alarmiert = pd.to_datetime(row["ALARMIERT"], errors="coerce")
-    zeit_an_e = pd.to_datetime(row["ZEIT_AN_E"], errors="coerce")
-    sosi = row.get("SOSI", 0)
-    
-    if pd.notna(alarmiert) and pd.notna(zeit_an_e):
-        anfahrt_duration = (zeit_an_e - alarmiert).total_seconds() / 60  # in minutes
-        analysis_data.append({
-            "Einsatznr": row.get("EINSATZ_NR", "N/A"),
-            "Fahrtart": "🚗 Anfahrt",
-            "Start": alarmiert.strftime("%H:%M:%S"),
-            "Ende": zeit_an_e.strftime("%H:%M:%S"),
-            "Dauer (Min)": round(anfahrt_duration, 1),
-            "Sonderrechte (SOSI)": "✅ Ja" if sosi == 1 else "❌ Nein"
-        })
-    
-    # Transport (Transport)
-    zeit_ab_e = pd.to_datetime(row["ZEIT_AB_E"], errors="coerce")
-    zeit_an_z = pd.to_datetime(row["ZEIT_AN_Z"], errors="coerce")
-    sosi_zo = row.get("SOSI_ZO", 0)
-    
-    if pd.notna(zeit_ab_e) and pd.notna(zeit_an_z):
-        transport_duration = (zeit_an_z - zeit_ab_e).total_seconds() / 60  # in minutes
-        analysis_data.append({
-            "Einsatznr": row.get("EINSATZ_NR", "N/A"),
-            "Fahrtart": "🚑 Transport",
-            "Start": zeit_ab_e.strftime("%H:%M:%S"),
-            "Ende": zeit_an_z.strftime("%H:%M:%S"),
-            "Dauer (Min)": round(transport_duration, 1),
-            "Sonderrechte (SOSI)": "✅ Ja" if sosi_zo == 1 else "❌ Nein"
-        })
-
-if analysis_data:
-    analysis_df = pd.DataFrame(analysis_data)
+# Approach and transport phases of all missions at once
+phases = phase_analysis(filtered_df)
+
+if not phases.empty:
+    analysis_df = pd.DataFrame({
+        "Einsatznr": phases["Einsatznr"],
+        "Fahrtart": phases["Fahrtart"],
+        "Start": phases["Start"].dt.strftime("%H:%M:%S"),
+        "Ende": phases["Ende"].dt.strftime("%H:%M:%S"),
+        "Dauer (Min)": phases["Dauer (Min)"],
+        "Sonderrechte (SOSI)": phases["Sonderrechte"].map({True: "✅ Ja", False: "❌ Nein"}),
+    })
     st.dataframe(analysis_df, use_container_width=True, hide_index=True)
     
     # Summary statistics
@@ -138,3 +136,4 @@ if analysis_data:
 else:
     st.warning("❌ Keine gültigen Zeitstempel für die Analyse gefunden.")
 
+query_debug_panel()
@@ -0,0 +1,348 @@
+"""Columnar Parquet materialization of the MongoDB collections used by LOADERS"""
+
+import os
+import sys
+import json
+import datetime
+import uuid
+import shutil
+from functools import lru_cache
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from etu_summary import utc_times
+
+load_dotenv()
+
+PARQUET_DIR = os.getenv("PARQUET_DIR", "parquet")
+DATA_BACKEND = os.getenv("DATA_BACKEND", "mongo")
+BATCH_SIZE = 10000
+
+# Collection name -> (flatten mode, partition date field, datetime fields)
+# flatten mode: "data" explodes the nested data array into one row per entry,
+# "normalize" flattens nested documents with json_normalize(sep="_"),
+# None keeps the top-level fields as they are.
+COLLECTIONS = {
+    "nida_index": (None, "missionDate", ["missionDate", "createdAt", "updatedAt"]),
+    "protocols_details": ("normalize", "content_dateStatusAlarm", []),
+    "protocols_freetexts": (None, None, []),
+    "etu_leitstelle": (None, "EINSATZBEGINN", ["EINSATZBEGINN"]),
+    "rtm_vorhaltung": (None, None, []),
+    "protocols_findings": ("data", None, []),
+    "protocols_measures": ("data", None, []),
+    "protocols_results": ("data", None, []),
+}
+for vital in ["af", "bd", "bz", "co2", "co", "hb", "hf", "puls", "spo2", "temp"]:
+    COLLECTIONS[f"vitals_{vital}"] = ("data", None, [])
+
+
+def use_parquet_backend():
+    """Return True if the loaders should read from the materialized Parquet files"""
+    return DATA_BACKEND.lower() == "parquet"
+
+
+def collection_path(collection):
+    """Directory holding the partitioned Parquet files of a collection"""
+    return os.path.join(PARQUET_DIR, collection)
+
+
+def is_materialized(collection):
+    """Check if a collection has been exported at least once"""
+    return os.path.isdir(collection_path(collection))
+
+
+def load_state():
+    """Load the export watermarks (last exported _id per collection)"""
+    state_file = os.path.join(PARQUET_DIR, "_state.json")
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    """Persist the export watermarks"""
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    state_file = os.path.join(PARQUET_DIR, "_state.json")
+    with open(state_file, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def flatten_documents(docs, mode):
+    """Turn a batch of MongoDB documents into a flat DataFrame"""
+    if mode == "normalize":
+        df = pd.json_normalize(docs, sep="_")
+    else:
+        df = pd.DataFrame(docs)
+
+    if mode == "data" and "data" in df.columns:
+        df = df.explode("data").reset_index(drop=True)
+        items = df["data"].apply(lambda x: x if isinstance(x, dict) else {})
+        flat = pd.json_normalize(items.tolist())
+        df = pd.concat([df.drop(columns=["data"]), flat], axis=1)
+
+    # Parent and data entry may share field names (e.g. source)
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def coerce_types(df, datetime_fields):
+    """
+    Give every column a stable Parquet type so batches exported on different
+    nights can be read as one dataset: timestamps, doubles, booleans or strings.
+    Timestamps are naive UTC; ISO strings without offset are local time.
+    """
+    for col in df.columns:
+        if col in ("year", "month"):
+            continue
+        series = df[col]
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+
+        if col in datetime_fields or kind in ("datetime", "datetime64", "date"):
+            df[col] = utc_times(series).astype("datetime64[ns]")
+        elif kind in ("integer", "floating", "mixed-integer-float", "decimal"):
+            df[col] = pd.to_numeric(series, errors="coerce").astype("float64")
+        elif kind == "boolean":
+            df[col] = series.astype("boolean")
+        elif kind == "empty":
+            df[col] = series.astype("string")
+        else:
+            df[col] = series.apply(
+                lambda x: (
+                    json.dumps(x, default=str)
+                    if isinstance(x, (dict, list))
+                    else (None if x is None or x is pd.NA or x != x else str(x))
+                )
+            ).astype("string")
+    return df
+
+
+def add_partition_columns(df, ids, date_field):
+    """Add year/month columns from the date field, falling back to the _id creation time"""
+    created = pd.to_datetime(
+        pd.Series([oid.generation_time for oid in ids], index=df.index), utc=True
+    ).dt.tz_localize(None)
+
+    if date_field and date_field in df.columns:
+        dates = pd.to_datetime(df[date_field], errors="coerce")
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)
+        dates = dates.fillna(created)
+    else:
+        dates = created
+
+    df["year"] = dates.dt.year.astype("int32")
+    df["month"] = dates.dt.month.astype("int32")
+    return df
+
+
+def write_batch(collection, docs, run_id, batch_no):
+    """Flatten, type and append one batch of documents to the collection dataset"""
+    mode, date_field, datetime_fields = COLLECTIONS[collection]
+    ids = [doc["_id"] for doc in docs]
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+
+    df = flatten_documents(docs, mode)
+    if df.empty:
+        return 0
+
+    # explode() repeats the parent row, so map the ObjectIds back via _id
+    id_lookup = {str(oid): oid for oid in ids}
+    df = add_partition_columns(df, df["_id"].map(id_lookup), date_field)
+    df = coerce_types(df, datetime_fields)
+
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        collection_path(collection),
+        format="parquet",
+        partitioning=["year", "month"],
+        partitioning_flavor="hive",
+        basename_template=f"part-{run_id}-{batch_no}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(df)
+
+
+def export_collection(db, collection, batch_size=BATCH_SIZE):
+    """
+    Incrementally export a collection into year/month partitioned Parquet.
+
+    Only documents with an _id greater than the last exported one are read,
+    so a nightly run appends the documents inserted since the previous run.
+    Documents updated in place are not picked up; delete the collection
+    directory and its watermark to rebuild it from scratch.
+    """
+    if collection not in COLLECTIONS:
+        raise ValueError(f"Unknown collection: {collection}")
+
+    state = load_state()
+    last_id = state.get(collection)
+    query = {"_id": {"$gt": ObjectId(last_id)}} if last_id else {}
+
+    run_id = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
+    run_id = f"{run_id}-{uuid.uuid4().hex[:8]}"
+    cursor = db[collection].find(query).sort("_id", 1).batch_size(batch_size)
+
+    rows = 0
+    batch = []
+    batch_no = 0
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            last_id = str(batch[-1]["_id"])
+            rows += write_batch(collection, batch, run_id, batch_no)
+            batch_no += 1
+            batch = []
+    if batch:
+        last_id = str(batch[-1]["_id"])
+        rows += write_batch(collection, batch, run_id, batch_no)
+
+    if last_id:
+        state[collection] = last_id
+        save_state(state)
+    return rows
+
+
+def export_all(db, collections=None):
+    """Export every collection used by LOADERS, returns rows written per collection"""
+    existing = set(db.list_collection_names())
+    results = {}
+    for collection in collections or COLLECTIONS:
+        if collection not in existing:
+            continue
+        results[collection] = export_collection(db, collection)
+    return results
+
+
+def export_frame(name, df, date_field=None):
+    """
+    Replace the materialized snapshot of a source that is not a MongoDB
+    collection, e.g. the KTW.sh API which always returns the full history.
+    """
+    path = collection_path(name)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    if df.empty:
+        return 0
+
+    df = df.copy()
+    dates = pd.Series(pd.NaT, index=df.index)
+    if date_field and date_field in df.columns:
+        dates = pd.to_datetime(df[date_field], errors="coerce", utc=True)
+        dates = dates.dt.tz_localize(None)
+    dates = dates.fillna(pd.Timestamp.now().normalize())
+    df["year"] = dates.dt.year.astype("int32")
+    df["month"] = dates.dt.month.astype("int32")
+    df = coerce_types(df, [date_field] if date_field else [])
+
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        path,
+        format="parquet",
+        partitioning=["year", "month"],
+        partitioning_flavor="hive",
+    )
+
+    state = load_state()
+    state[name] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    save_state(state)
+    return len(df)
+
+
+def export_ktwsh():
+    """Snapshot the KTW.sh transports and status history into Parquet"""
+    from api_client import KTWAPIClient
+
+    client = KTWAPIClient()
+    return {
+        "ktwsh_transports": export_frame(
+            "ktwsh_transports", client.get_transports(), "created_at"
+        ),
+        "ktwsh_status_history": export_frame(
+            "ktwsh_status_history", client.get_transport_status_history(), "changed_at"
+        ),
+    }
+
+
+@lru_cache(maxsize=64)
+def open_dataset(collection, watermark):
+    """
+    Open a collection dataset with the union schema of all exported batches.
+
+    A column that was exported with different types on different nights
+    (e.g. numbers first, free text later) is read as string.
+    """
+    path = collection_path(collection)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+
+    fields = {}
+    for fragment in dataset.get_fragments():
+        for field in fragment.physical_schema:
+            known = fields.get(field.name)
+            if known is None or known.type == pa.null():
+                fields[field.name] = field
+            elif field.type != known.type and field.type != pa.null():
+                fields[field.name] = pa.field(field.name, pa.large_string())
+    if not fields:
+        return dataset
+
+    fields["year"] = pa.field("year", pa.int32())
+    fields["month"] = pa.field("month", pa.int32())
+    schema = pa.schema(list(fields.values()))
+    return ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+
+
+def read_collection(collection, columns=None, filter=None, year_range=None):
+    """
+    Read a materialized collection into a DataFrame.
+
+    Parameters:
+    - collection: Name of the exported collection
+    - columns: Optional list of columns to read (column projection)
+    - filter: Optional pyarrow.dataset expression (predicate pushdown)
+    - year_range: Optional tuple (start_year, end_year) to prune partitions
+    """
+    if not is_materialized(collection):
+        return pd.DataFrame()
+
+    dataset = open_dataset(collection, load_state().get(collection))
+    names = set(dataset.schema.names)
+
+    expression = filter
+    if year_range:
+        start_year, end_year = year_range
+        year_filter = (ds.field("year") >= start_year) & (ds.field("year") <= end_year)
+        expression = year_filter if expression is None else expression & year_filter
+
+    if columns is not None:
+        columns = [col for col in columns if col in names]
+
+    try:
+        table = dataset.to_table(columns=columns, filter=expression)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # Filter on a column this collection never had
+        print(f"Error reading {collection} from Parquet: {e}")
+        return pd.DataFrame()
+
+    return table.to_pandas()
+
+
+if __name__ == "__main__":
+    # Nightly job: python parquet_store.py [collection ...]
+    from db_connection import get_mongodb_connection, close_mongodb_connection
+
+    db, client = get_mongodb_connection()
+    try:
+        written = export_all(db, sys.argv[1:] or None)
+    finally:
+        close_mongodb_connection(client)
+
+    if not sys.argv[1:] and os.getenv("KTWSH_API_URL"):
+        written.update(export_ktwsh())
+
+    for name, count in written.items():
+        print(f"{name}: {count} rows exported")
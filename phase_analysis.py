@@ -0,0 +1,182 @@
+"""Column-wise Sonderrechte phase analysis of ETÜ missions"""
+
+import numpy as np
+import pandas as pd
+
+from etu_summary import local_dates
+
+# Phase label -> (start field, end field, special rights flag)
+PHASES = {
+    "🚗 Anfahrt": ("ALARMIERT", "ZEIT_AN_E", "SOSI"),
+    "🚑 Transport": ("ZEIT_AB_E", "ZEIT_AN_Z", "SOSI_ZO"),
+}
+
+
+def phase_analysis(df):
+    """
+    One row per mission and phase with valid start and end time: Einsatznr,
+    Fahrzeug, Fahrtart, Start, Ende, Dauer (Min) and Sonderrechte (bool).
+
+    Every time column is parsed once for all rows, so the same function
+    serves a single vehicle and day or a whole fleet over months. Rows keep
+    the mission order with the approach before the transport.
+    """
+    columns = [
+        "Einsatznr",
+        "Fahrzeug",
+        "Fahrtart",
+        "Start",
+        "Ende",
+        "Dauer (Min)",
+        "Sonderrechte",
+    ]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    phases = []
+    for order, (label, (start_col, end_col, flag_col)) in enumerate(PHASES.items()):
+        start = pd.to_datetime(df.get(start_col), errors="coerce")
+        end = pd.to_datetime(df.get(end_col), errors="coerce")
+        flag = pd.to_numeric(df.get(flag_col), errors="coerce")
+        phase = pd.DataFrame(
+            {
+                "Einsatznr": df.get("EINSATZ_NR", "N/A"),
+                "Fahrzeug": df.get("EINSATZMITTEL"),
+                "Fahrtart": label,
+                "Start": start,
+                "Ende": end,
+                "Dauer (Min)": ((end - start).dt.total_seconds() / 60).round(1),
+                "Sonderrechte": flag == 1,
+                "order": order,
+            },
+            index=df.index,
+        )
+        phases.append(phase[start.notna() & end.notna()])
+
+    result = pd.concat(phases)
+    result = result.rename_axis("mission").sort_values(
+        ["mission", "order"], kind="mergesort"
+    )
+    return result[columns].reset_index(drop=True)
+
+
+def phase_summary(phases, by="Fahrzeug"):
+    """
+    Per group (e.g. vehicle or month) and phase: number of trips, trips with
+    special rights, their share in percent and the mean duration.
+    """
+    summary = phases.groupby([by, "Fahrtart"], observed=True).agg(
+        Fahrten=("Sonderrechte", "size"),
+        **{"mit Sonderrechten": ("Sonderrechte", "sum")},
+        **{"Ø Dauer (Min)": ("Dauer (Min)", "mean")},
+    )
+    summary["Anteil Sonderrechte (%)"] = (
+        summary["mit Sonderrechten"] / summary["Fahrten"] * 100
+    )
+    return summary.round(1).reset_index()
+
+
+def daily_phase_summary(missions):
+    """
+    Per-vehicle per-day summary of raw ETÜ missions, with the fields of the
+    etu_sonderrechte_daily collection (local day of EINSATZBEGINN).
+    """
+    columns = [
+        "vehicle",
+        "day",
+        "missions",
+        "approaches",
+        "approaches_sosi",
+        "approach_min_sum",
+        "approach_durations",
+        "transports",
+        "transports_sosi",
+        "transport_min_sum",
+        "transport_durations",
+    ]
+    if missions.empty:
+        return pd.DataFrame(columns=columns)
+
+    phases = phase_analysis(missions.reset_index(drop=True))
+    days = pd.DataFrame(
+        {
+            "Einsatznr": missions["EINSATZ_NR"],
+            "Fahrzeug": missions["EINSATZMITTEL"],
+            "day": local_dates(missions["EINSATZBEGINN"]),
+        }
+    ).dropna(subset=["day", "Fahrzeug"])
+    summary = (
+        days.groupby(["Fahrzeug", "day"], observed=True)
+        .size()
+        .rename("missions")
+        .to_frame()
+    )
+
+    phases = phases.merge(
+        days.drop_duplicates(["Einsatznr", "Fahrzeug"]), on=["Einsatznr", "Fahrzeug"]
+    )
+    for label, counts, prefix in (
+        ("🚗 Anfahrt", "approaches", "approach"),
+        ("🚑 Transport", "transports", "transport"),
+    ):
+        grouped = phases[phases["Fahrtart"] == label].groupby(
+            ["Fahrzeug", "day"], observed=True
+        )
+        summary[counts] = grouped.size()
+        summary[f"{counts}_sosi"] = grouped["Sonderrechte"].sum()
+        summary[f"{prefix}_min_sum"] = grouped["Dauer (Min)"].sum()
+        summary[f"{prefix}_durations"] = grouped["Dauer (Min)"].agg(list)
+
+    summary = summary.reset_index().rename(columns={"Fahrzeug": "vehicle"})
+    for col in ["approaches", "approaches_sosi", "transports", "transports_sosi"]:
+        summary[col] = summary[col].fillna(0).astype(int)
+    for col in ["approach_min_sum", "transport_min_sum"]:
+        summary[col] = summary[col].fillna(0.0)
+    for col in ["approach_durations", "transport_durations"]:
+        summary[col] = summary[col].apply(lambda x: x if isinstance(x, list) else [])
+    return summary[columns]
+
+
+def fleet_overview(summary, by="vehicle"):
+    """
+    Sonderrechte KPIs from the daily summaries per vehicle (or any other
+    column): missions, share of approaches and transports with special
+    rights, mean and percentiles of the approach time.
+    """
+    grouped = summary.groupby(by, observed=True)
+    totals = grouped[
+        [
+            "missions",
+            "approaches",
+            "approaches_sosi",
+            "approach_min_sum",
+            "transports",
+            "transports_sosi",
+        ]
+    ].sum()
+    durations = grouped["approach_durations"].agg(
+        lambda lists: np.concatenate([np.asarray(x, dtype=float) for x in lists])
+    )
+
+    overview = pd.DataFrame(index=totals.index)
+    overview["Einsätze"] = totals["missions"]
+    overview["Anfahrten mit SOSI (%)"] = (
+        totals["approaches_sosi"]
+        / totals["approaches"].where(totals["approaches"] > 0)
+        * 100
+    )
+    overview["Transporte mit SOSI (%)"] = (
+        totals["transports_sosi"]
+        / totals["transports"].where(totals["transports"] > 0)
+        * 100
+    )
+    overview["Ø Anfahrt (Min)"] = totals["approach_min_sum"] / totals[
+        "approaches"
+    ].where(totals["approaches"] > 0)
+    overview["Median Anfahrt (Min)"] = durations.apply(
+        lambda x: np.median(x) if len(x) else np.nan
+    )
+    overview["P90 Anfahrt (Min)"] = durations.apply(
+        lambda x: np.percentile(x, 90) if len(x) else np.nan
+    )
+    return overview.round(1)
@@ -0,0 +1,475 @@
+"""
+Incrementally maintained daily rollups for the report pages.
+
+The rollups hold counts (and mission durations) per day, hour and vehicle or
+category in a persistent DuckDB file. Each refresh only aggregates the rows
+beyond the last rolled-up id, so the reports read a table that grows with the
+number of days instead of re-aggregating all raw records on every visit.
+
+DuckDB allows one writer process per file: the nightly job (run this module)
+is the only writer. The pages open a short-lived read-only connection per
+query and fall back to the raw data while the file is missing or locked.
+"""
+
+import os
+import sys
+
+import duckdb
+import pandas as pd
+
+from parquet_store import PARQUET_DIR
+from concurrency import busy_intervals, concurrency_series, hourly_load
+from analytics import (
+    create_views,
+    daily_trend_sql,
+    has_view,
+    heatmap_matrix,
+)
+
+ROLLUP_DB = os.getenv("ROLLUP_DB", os.path.join(PARQUET_DIR, "rollups.duckdb"))
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS details_rollup (
+        day DATE NOT NULL,
+        hour INTEGER NOT NULL,
+        call_sign VARCHAR NOT NULL,
+        mission_type VARCHAR NOT NULL,
+        missions BIGINT NOT NULL,
+        timed_missions BIGINT NOT NULL,
+        duration_min DOUBLE NOT NULL,
+        PRIMARY KEY (day, hour, call_sign, mission_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ktwsh_rollup (
+        day DATE NOT NULL,
+        hour INTEGER NOT NULL,
+        category VARCHAR NOT NULL,
+        transports BIGINT NOT NULL,
+        PRIMARY KEY (day, hour, category)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS concurrency_series (
+        vehicle_type VARCHAR NOT NULL,
+        time TIMESTAMP NOT NULL,
+        level INTEGER NOT NULL,
+        PRIMARY KEY (vehicle_type, time)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS concurrency_hourly (
+        vehicle_type VARCHAR NOT NULL,
+        hour_start TIMESTAMP NOT NULL,
+        peak INTEGER NOT NULL,
+        mean_level DOUBLE NOT NULL,
+        PRIMARY KEY (vehicle_type, hour_start)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        rollup VARCHAR PRIMARY KEY,
+        last_id VARCHAR NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    )
+    """,
+]
+
+
+def connect(path=ROLLUP_DB):
+    """Open (and create if needed) the rollup database for writing"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    con = duckdb.connect(path)
+    for statement in SCHEMA:
+        con.execute(statement)
+    return con
+
+
+def read_connection(path=ROLLUP_DB):
+    """Read-only connection to the rollup database, closed by the caller"""
+    return duckdb.connect(path, read_only=True)
+
+
+def get_watermark(con, rollup):
+    """Last rolled-up id of a rollup, None before the first refresh"""
+    row = con.execute(
+        "SELECT last_id FROM rollup_watermarks WHERE rollup = ?", [rollup]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(con, rollup, last_id):
+    """Store the last rolled-up id of a rollup"""
+    con.execute(
+        """
+        INSERT INTO rollup_watermarks VALUES (?, ?, now())
+        ON CONFLICT (rollup) DO UPDATE
+        SET last_id = excluded.last_id, updated_at = excluded.updated_at
+        """,
+        [rollup, str(last_id)],
+    )
+
+
+def update_details_rollup(con):
+    """
+    Add the Details rows exported since the last refresh to details_rollup.
+
+    Reads the materialized protocols_details; ObjectId hex strings sort like
+    the ObjectIds, so `_id > watermark` selects the newly exported documents.
+    Returns the number of rows rolled up.
+    """
+    if not has_view("details"):
+        return 0
+
+    cursor = con.cursor()
+    try:
+        create_views(cursor, temporary=True)
+        watermark = get_watermark(cursor, "details") or ""
+        last_id, rows = cursor.execute(
+            """
+            SELECT max(_id), count(*) FROM details
+            WHERE _id > ? AND StatusAlarm IS NOT NULL
+            """,
+            [watermark],
+        ).fetchone()
+        if not rows:
+            return 0
+
+        cursor.execute("BEGIN TRANSACTION")
+        cursor.execute(
+            """
+            INSERT INTO details_rollup
+            SELECT CAST(StatusAlarm AS DATE) AS day,
+                   hour(StatusAlarm) AS hour,
+                   coalesce(content_callSign, '') AS call_sign,
+                   coalesce(content_missionType, '') AS mission_type,
+                   count(*) AS missions,
+                   count(duration) AS timed_missions,
+                   coalesce(sum(duration), 0) AS duration_min
+            FROM (
+                SELECT *,
+                       CASE WHEN StatusEnd > StatusAlarm
+                            THEN date_diff('second', StatusAlarm, StatusEnd) / 60.0
+                       END AS duration
+                FROM details
+                WHERE _id > ? AND _id <= ? AND StatusAlarm IS NOT NULL
+            )
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (day, hour, call_sign, mission_type) DO UPDATE SET
+                missions = missions + excluded.missions,
+                timed_missions = timed_missions + excluded.timed_missions,
+                duration_min = duration_min + excluded.duration_min
+            """,
+            [watermark, last_id],
+        )
+        set_watermark(cursor, "details", last_id)
+        cursor.execute("COMMIT")
+        return rows
+    except duckdb.Error as e:
+        # Closing the cursor rolls back the open transaction
+        print(f"Error updating details rollup: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def transport_frame(transports, ts_col="created_at"):
+    """Id, naive timestamp and category of the KTW.sh transports"""
+    if transports is None or "id" not in transports.columns:
+        return pd.DataFrame(
+            {
+                "id": pd.Series(dtype="float64"),
+                "ts": pd.Series(dtype="datetime64[ns]"),
+                "category": pd.Series(dtype="object"),
+            }
+        )
+    frame = pd.DataFrame(
+        {
+            "id": pd.to_numeric(transports["id"], errors="coerce"),
+            "ts": pd.to_datetime(transports[ts_col], errors="coerce"),
+            "category": transports.get("krankenbeforderungsfahrt_kategorie"),
+        }
+    )
+    if getattr(frame["ts"].dt, "tz", None) is not None:
+        frame["ts"] = frame["ts"].dt.tz_localize(None)
+    return frame
+
+
+def update_ktwsh_rollup(con, transports, ts_col="created_at"):
+    """
+    Add the KTW.sh transports with an id above the watermark to ktwsh_rollup.
+
+    The API always returns the full history, so only transports created since
+    the last refresh are aggregated. Returns the number of rows rolled up.
+    """
+    if transports.empty or "id" not in transports.columns:
+        return 0
+
+    frame = transport_frame(transports, ts_col)
+
+    cursor = con.cursor()
+    try:
+        watermark = int(get_watermark(cursor, "ktwsh") or -1)
+        new_rows = frame[(frame["id"] > watermark) & frame["ts"].notna()]
+        if new_rows.empty:
+            return 0
+
+        cursor.register("frame", new_rows)
+        cursor.execute("BEGIN TRANSACTION")
+        cursor.execute("""
+            INSERT INTO ktwsh_rollup
+            SELECT CAST(ts AS DATE), hour(ts), coalesce(category, ''), count(*)
+            FROM frame
+            GROUP BY 1, 2, 3
+            ON CONFLICT (day, hour, category) DO UPDATE SET
+                transports = transports + excluded.transports
+            """)
+        set_watermark(cursor, "ktwsh", int(new_rows["id"].max()))
+        cursor.execute("COMMIT")
+        return len(new_rows)
+    except duckdb.Error as e:
+        print(f"Error updating KTW.sh rollup: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def update_concurrency_rollup(con):
+    """
+    Rebuild the concurrency series and hourly load when details_rollup moved on.
+
+    A new mission changes the level until it ends, so the sweep runs over all
+    Details again; it is keyed on the details watermark it was built from.
+    Returns the number of change points stored.
+    """
+    details_watermark = get_watermark(con, "details")
+    if not has_view("details") or details_watermark is None:
+        return 0
+    if get_watermark(con, "concurrency") == details_watermark:
+        return 0
+
+    cursor = con.cursor()
+    try:
+        create_views(cursor, temporary=True)
+        details = cursor.execute("""
+            SELECT content_callSign, StatusAlarm, StatusEnd FROM details
+            WHERE content_callSign SIMILAR TO '.*-8[35]-.*'
+            """).df()
+        series = concurrency_series(busy_intervals(details))
+        hourly = hourly_load(series)
+
+        cursor.register("series", series)
+        cursor.register("hourly", hourly)
+        cursor.execute("BEGIN TRANSACTION")
+        cursor.execute("DELETE FROM concurrency_series")
+        cursor.execute("DELETE FROM concurrency_hourly")
+        cursor.execute(
+            "INSERT INTO concurrency_series SELECT vehicle_type, time, level FROM series"
+        )
+        cursor.execute("""
+            INSERT INTO concurrency_hourly
+            SELECT vehicle_type, hour_start, peak, mean_level FROM hourly
+            """)
+        set_watermark(cursor, "concurrency", details_watermark)
+        cursor.execute("COMMIT")
+        return len(series)
+    except duckdb.Error as e:
+        print(f"Error updating concurrency rollup: {e}")
+        return 0
+    finally:
+        cursor.close()
+
+
+def has_rollup(rollup):
+    """Check if a rollup table holds data (False while missing or locked)"""
+    try:
+        con = read_connection()
+    except duckdb.Error:
+        return False
+    try:
+        return get_watermark(con, rollup) is not None
+    except duckdb.Error:
+        return False
+    finally:
+        con.close()
+
+
+def query_rollup(sql, params=None, frames=None):
+    """Run a query on a read-only connection, with DataFrames registered by name"""
+    con = read_connection()
+    try:
+        for name, frame in (frames or {}).items():
+            con.register(name, frame)
+        return con.execute(sql, params or []).df()
+    finally:
+        con.close()
+
+
+def day_filter(days, column="day"):
+    """SQL condition and params limiting column to the (first, last) days"""
+    if days is None:
+        return "TRUE", []
+    first, last = (pd.Timestamp(day).date() for day in days)
+    return f"{column} BETWEEN ? AND ?", [first, last]
+
+
+def vehicle_group_daily_counts(groups, days=None):
+    """
+    Daily mission counts per vehicle group (Datum, Typ, Anzahl) from the
+    rollup; groups as for analytics.vehicle_group_daily_counts.
+    """
+    in_days, day_params = day_filter(days)
+    selects = []
+    params = []
+    for label, (pattern, included, excluded) in groups.items():
+        params.append(label)
+        conditions = [in_days]
+        params.extend(day_params)
+        if pattern:
+            conditions.append("call_sign LIKE ?")
+            params.append(pattern)
+        if included is not None:
+            conditions.append("list_contains(?, call_sign)")
+            params.append(list(included))
+        if excluded:
+            conditions.append("NOT list_contains(?, call_sign)")
+            params.append(list(excluded))
+        selects.append(f"""
+            SELECT day AS Datum, ? AS Typ, CAST(sum(missions) AS BIGINT) AS Anzahl
+            FROM details_rollup
+            WHERE {" AND ".join(conditions)}
+            GROUP BY 1
+            """)
+
+    df = query_rollup(" UNION ALL ".join(selects) + " ORDER BY 1", params)
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    return df
+
+
+def missions_per_vehicle_per_day(call_signs, days=None):
+    """Daily mission counts per call sign (Datum, Fahrzeug, Anzahl) from the rollup"""
+    in_days, day_params = day_filter(days)
+    df = query_rollup(
+        f"""
+        SELECT day AS Datum, call_sign AS Fahrzeug, CAST(sum(missions) AS BIGINT) AS Anzahl
+        FROM details_rollup
+        WHERE list_contains(?, call_sign) AND {in_days}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        [list(call_signs), *day_params],
+    )
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    return df
+
+
+def weekday_hour_heatmap(call_signs, exclude_mission_type=None, days=None):
+    """7x24 weekday/hour mission counts of the given call signs from the rollup"""
+    in_days, day_params = day_filter(days)
+    exclude = ""
+    params = [list(call_signs), *day_params]
+    if exclude_mission_type:
+        exclude = "AND mission_type NOT ILIKE ?"
+        params.append(f"%{exclude_mission_type}%")
+    counts = query_rollup(
+        f"""
+        SELECT isodow(day) - 1 AS weekday, hour, CAST(sum(missions) AS BIGINT) AS counts
+        FROM details_rollup
+        WHERE list_contains(?, call_sign) AND {in_days} {exclude}
+        GROUP BY 1, 2
+        """,
+        params,
+    )
+    return heatmap_matrix(counts)
+
+
+def ktwsh_daily_counts_with_trend(transports=None, end_date=None):
+    """
+    KTW.sh daily transport counts with 7/30 day trends from the rollup, plus
+    the given transports created since its last refresh
+    """
+    end_date = pd.Timestamp(end_date or pd.Timestamp.today()).normalize()
+    df = query_rollup(
+        daily_trend_sql("""
+            SELECT day, sum(n) AS n FROM (
+                SELECT day, transports AS n FROM ktwsh_rollup
+                UNION ALL
+                SELECT CAST(ts AS DATE), 1 FROM frame
+                WHERE ts IS NOT NULL AND id > (
+                    SELECT CAST(last_id AS BIGINT) FROM rollup_watermarks
+                    WHERE rollup = 'ktwsh'
+                )
+            )
+            GROUP BY 1
+            """),
+        [end_date.to_pydatetime()],
+        frames={"frame": transport_frame(transports)},
+    )
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    df["Anzahl Transporte"] = df["Anzahl Transporte"].astype(float)
+    return df
+
+
+def concurrency_hourly(days=None):
+    """Hourly peak and mean of busy vehicles per type from the rollup"""
+    in_days, day_params = day_filter(days, "CAST(hour_start AS DATE)")
+    return query_rollup(
+        f"""
+        SELECT vehicle_type, hour_start, peak, mean_level
+        FROM concurrency_hourly
+        WHERE {in_days}
+        ORDER BY vehicle_type, hour_start
+        """,
+        day_params,
+    )
+
+
+def concurrency_window(vehicle_type, start, end):
+    """
+    Change points of busy vehicles of one type between start and end,
+    including the last point before start so the window begins at its level.
+    """
+    return query_rollup(
+        """
+        SELECT vehicle_type, time, level FROM concurrency_series
+        WHERE vehicle_type = ? AND time < ? AND time >= coalesce(
+            (SELECT max(time) FROM concurrency_series
+             WHERE vehicle_type = ? AND time <= ?),
+            ?
+        )
+        ORDER BY time
+        """,
+        [vehicle_type, end, vehicle_type, start, start],
+    )
+
+
+def rebuild(con, rollup):
+    """Drop a rollup and its watermark so the next refresh starts from scratch"""
+    tables = {
+        "details": ["details_rollup"],
+        "ktwsh": ["ktwsh_rollup"],
+        "concurrency": ["concurrency_series", "concurrency_hourly"],
+    }[rollup]
+    for table in tables:
+        con.execute(f"DELETE FROM {table}")
+    con.execute("DELETE FROM rollup_watermarks WHERE rollup = ?", [rollup])
+
+
+if __name__ == "__main__":
+    # After the nightly Parquet export: python rollups.py [--rebuild]
+    # The only writer; pages fall back to the raw data while it holds the lock.
+    con = connect()
+    if "--rebuild" in sys.argv[1:]:
+        rebuild(con, "details")
+        rebuild(con, "ktwsh")
+        rebuild(con, "concurrency")
+
+    print(f"details: {update_details_rollup(con)} rows rolled up")
+    print(f"concurrency: {update_concurrency_rollup(con)} change points")
+    if has_view("ktwsh_transports"):
+        from parquet_store import read_collection
+
+        transports = read_collection("ktwsh_transports")
+        print(f"ktwsh: {update_ktwsh_rollup(con, transports)} rows rolled up")
+    con.close()
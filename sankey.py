@@ -0,0 +1,56 @@
+"""Node and link arrays for the CEDUS_CODE → leadingDiagnosis Sankey"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_loading import data_loading
+
+
+def sankey_links(
+    flows, source_col="CEDUS_CODE", target_col="leadingDiagnosis", top_n=20
+):
+    """
+    Labels and link arrays of the top_n source → target flows.
+
+    Both columns are turned into categoricals and the pairs are counted on
+    their integer codes instead of grouping by two string columns. Returns a
+    dict with labels (sources first), source, target, value and n_sources.
+    """
+    source = flows[source_col].astype("string").str.strip()
+    target = flows[target_col].astype("string").str.strip()
+    valid = source.notna() & target.notna()
+    source = pd.Categorical(source[valid])
+    target = pd.Categorical(target[valid])
+
+    n_targets = max(len(target.categories), 1)
+    pairs = source.codes.astype(np.int64) * n_targets + target.codes
+    pairs, counts = np.unique(pairs, return_counts=True)
+    top = np.argsort(-counts, kind="stable")[:top_n]
+    source_codes, target_codes = np.divmod(pairs[top], n_targets)
+
+    # Nodes in order of their first (largest) flow
+    source_nodes = pd.unique(source_codes)
+    target_nodes = pd.unique(target_codes)
+    source_index = np.empty(len(source.categories), dtype=np.int64)
+    source_index[source_nodes] = np.arange(len(source_nodes))
+    target_index = np.empty(n_targets, dtype=np.int64)
+    target_index[target_nodes] = np.arange(len(target_nodes)) + len(source_nodes)
+
+    return {
+        "labels": list(source.categories[source_nodes])
+        + list(target.categories[target_nodes]),
+        "source": source_index[source_codes].tolist(),
+        "target": target_index[target_codes].tolist(),
+        "value": counts[top].tolist(),
+        "n_sources": len(source_nodes),
+    }
+
+
+@st.cache_data(ttl=604800, show_spinner=False)
+def cedus_diagnosis_sankey(vehicles, limit=50000, top_n=20):
+    """Sankey arrays of the CEDUS_CODE → leadingDiagnosis flows of the vehicles"""
+    flows = data_loading("CEDUS_Diagnose", limit=limit, vehicles=list(vehicles))
+    if flows.empty:
+        return None
+    return sankey_links(flows, top_n=top_n)
@@ -0,0 +1,108 @@
+"""Mergeable quantile sketches for streaming duration statistics"""
+
+import numpy as np
+
+
+class TDigest:
+    """
+    Merging t-digest (Dunning) over float values.
+
+    Values are summarized into at most about `compression` centroids, dense at
+    the tails and coarse around the median, so memory stays bounded however
+    many values are added. Digests of disjoint sets can be merged, e.g. the
+    weekly digests of an arbitrary date range. Count, sum, min and max are
+    exact; as long as no more than `compression` values were added the
+    quantiles are exact as well.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        """Add a batch of values (NaN is ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.total += values.sum()
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._add_centroids(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        """Merge another digest into this one"""
+        if other.count == 0:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add_centroids(other.means, other.weights)
+        return self
+
+    def _add_centroids(self, means, weights):
+        order = np.argsort(np.concatenate([self.means, means]), kind="mergesort")
+        self.means = np.concatenate([self.means, means])[order]
+        self.weights = np.concatenate([self.weights, weights])[order]
+        if len(self.means) > self.compression:
+            self._compress()
+
+    def _scale(self, q):
+        """k1 scale function: centroid size limit in quantile space"""
+        return self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+    def _inverse_scale(self, k):
+        if k >= self.compression / 4:
+            return 1.0
+        return (np.sin(k * 2 * np.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        """Merge neighbouring centroids as long as the scale function allows it"""
+        total = self.weights.sum()
+        means, weights = [], []
+        current_mean, current_weight = self.means[0], self.weights[0]
+        cumulative = 0.0
+        limit = self._inverse_scale(self._scale(0.0) + 1) * total
+        for mean, weight in zip(self.means[1:], self.weights[1:]):
+            if cumulative + current_weight + weight <= limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                cumulative += current_weight
+                limit = self._inverse_scale(self._scale(cumulative / total) + 1)
+                limit *= total
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self.means = np.array(means)
+        self.weights = np.array(weights)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def quantile(self, q):
+        """Estimated q-quantile (linear interpolation like pandas when exact)"""
+        if self.count == 0:
+            return np.nan
+        if np.all(self.weights == 1):
+            return float(np.quantile(self.means, q))
+        # Centroid means sit at the middle of their rank range
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        return float(
+            np.interp(
+                q * self.count,
+                np.concatenate([[0], ranks, [self.count]]),
+                np.concatenate([[self.min], self.means, [self.max]]),
+            )
+        )
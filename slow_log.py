@@ -0,0 +1,151 @@
+"""
+Persistent log of slow loader calls.
+
+Every loader call (MongoDB or KTW.sh API) slower than SLOW_LOG_THRESHOLD_MS
+is appended as one JSON line with a fingerprint of its query shapes, its
+parameters and timings. The file rotates at SLOW_LOG_MAX_BYTES. Run this
+module to list the fingerprints that cost the most time.
+"""
+
+import os
+import sys
+import json
+import glob
+import hashlib
+import logging
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SLOW_LOG_FILE = os.getenv("SLOW_LOG_FILE", os.path.join("logs", "slow_loaders.jsonl"))
+SLOW_LOG_THRESHOLD_MS = float(os.getenv("SLOW_LOG_THRESHOLD_MS", "1000"))
+SLOW_LOG_MAX_BYTES = int(os.getenv("SLOW_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SLOW_LOG_BACKUPS = 5
+
+_logger = None
+
+
+def slow_logger():
+    """Logger writing plain JSON lines to the rotating slow log file"""
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(SLOW_LOG_FILE) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            SLOW_LOG_FILE,
+            maxBytes=SLOW_LOG_MAX_BYTES,
+            backupCount=SLOW_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("slow_loaders")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def call_shapes(call):
+    """Distinct (command, collection, query shape) of a loader call, sorted"""
+    shapes = {
+        json.dumps(
+            [command["command"], command["collection"], command["shape"]],
+            sort_keys=True,
+            default=str,
+            ensure_ascii=False,
+        )
+        for command in call["commands"]
+    }
+    return sorted(shapes)
+
+
+def fingerprint(call):
+    """Short hash of the metric and the query shapes, equal for equal queries"""
+    key = json.dumps([call["metric"], call_shapes(call)], ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def log_params(params):
+    """Parameters for the log, sequences (protocol ids, vehicles) as their length"""
+    return {
+        key: len(value) if isinstance(value, (list, set)) else value
+        for key, value in params.items()
+    }
+
+
+def record_slow_call(call):
+    """Append a finished loader call to the slow log if it took too long"""
+    if call["total_ms"] < SLOW_LOG_THRESHOLD_MS:
+        return
+    entry = {
+        "time": pd.Timestamp.fromtimestamp(call["started"]).isoformat(),
+        "metric": call["metric"],
+        "fingerprint": fingerprint(call),
+        "shapes": call_shapes(call),
+        "params": log_params(call["params"]),
+        "total_ms": round(call["total_ms"], 1),
+        "query_ms": round(call["query_ms"], 1),
+        "decode_ms": round(call["decode_ms"], 1),
+        "pandas_ms": round(call["pandas_ms"], 1),
+        "commands": len(call["commands"]),
+        "docs": call["docs"],
+        "bytes": call["bytes"],
+    }
+    slow_logger().info(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+def read_slow_log(path=SLOW_LOG_FILE):
+    """All entries of the slow log and its rotated files as a DataFrame"""
+    entries = []
+    for file in sorted(glob.glob(f"{glob.escape(path)}*")):
+        with open(file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    df = pd.DataFrame(entries)
+    if not df.empty:
+        df["time"] = pd.to_datetime(df["time"], errors="coerce")
+    return df
+
+
+def worst_offenders(entries, top=20):
+    """Fingerprints by total time spent: calls, median/P95/max and the time split"""
+    if entries.empty:
+        return pd.DataFrame()
+    grouped = entries.groupby("fingerprint")
+    summary = grouped.agg(
+        metric=("metric", "first"),
+        calls=("total_ms", "size"),
+        total_s=("total_ms", lambda ms: ms.sum() / 1000),
+        median_ms=("total_ms", "median"),
+        p95_ms=("total_ms", lambda ms: ms.quantile(0.95)),
+        max_ms=("total_ms", "max"),
+        query_ms=("query_ms", "mean"),
+        pandas_ms=("pandas_ms", "mean"),
+        docs=("docs", "mean"),
+    ).round(1)
+    summary["last_seen"] = grouped["time"].max()
+    summary["shapes"] = grouped["shapes"].first().apply(" | ".join)
+    return summary.sort_values("total_s", ascending=False).head(top)
+
+
+if __name__ == "__main__":
+    # python slow_log.py [--top N] [--since YYYY-MM-DD]
+    args = sys.argv[1:]
+    top = int(args[args.index("--top") + 1]) if "--top" in args else 20
+    entries = read_slow_log()
+    if "--since" in args and not entries.empty:
+        entries = entries[
+            entries["time"] >= pd.Timestamp(args[args.index("--since") + 1])
+        ]
+    if entries.empty:
+        print(f"No slow calls in {SLOW_LOG_FILE}")
+        sys.exit()
+    print(f"{len(entries)} slow calls (>= {SLOW_LOG_THRESHOLD_MS:.0f} ms)\n")
+    with pd.option_context("display.width", 200, "display.max_colwidth", 80):
+        print(worst_offenders(entries, top).to_string())
@@ -0,0 +1,371 @@
+"""Vectorized status-flow analysis of the KTW.sh transport status history"""
+
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from sketches import TDigest
+
+FLOW_STATUSES = ["offen", "angenommen", "disponiert", "abgeschlossen"]
+STEPS = [
+    ("offen_to_angenommen_min", "offen_start", "angenommen_time"),
+    ("angenommen_to_disponiert_min", "angenommen_time", "disponiert_time"),
+    ("disponiert_to_abgeschlossen_min", "disponiert_time", "abgeschlossen_time"),
+    ("total_duration_min", "offen_start", "abgeschlossen_time"),
+]
+
+
+def sort_history(df):
+    """
+    Sort the history by transport and changed_at and number the events of
+    each transport (position); ties keep their original order.
+    """
+    history = df[["transport_id", "new_status", "changed_at"]].sort_values(
+        ["transport_id", "changed_at"], kind="mergesort"
+    )
+    history = history.reset_index(drop=True)
+    history["position"] = history.groupby("transport_id", sort=False).cumcount()
+    return history
+
+
+def status_times(history):
+    """
+    First/last changed_at and first/last position per transport and status,
+    as one grouped pivot: columns (aggregate, field, status), one row per transport.
+    """
+    history = history[history["new_status"].isin(FLOW_STATUSES)]
+    return history.pivot_table(
+        index="transport_id",
+        columns="new_status",
+        values=["changed_at", "position"],
+        aggfunc=["min", "max"],
+    )
+
+
+def complete_flows(df):
+    """
+    Transports that pass offen -> angenommen -> disponiert -> abgeschlossen.
+
+    A transport counts as complete if angenommen, disponiert and abgeschlossen
+    each occur at or after its first offen event. Like the original per
+    transport analysis the step times are the first offen, angenommen and
+    disponiert and the last abgeschlossen. Returns one row per transport with
+    the step timestamps and the step durations in minutes.
+    """
+    columns = ["transport_id", "offen_start", "angenommen_time", "disponiert_time"]
+    columns += ["abgeschlossen_time"] + [step for step, _, _ in STEPS]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    history = sort_history(df)
+    times = status_times(history)
+    if times.empty or not set(FLOW_STATUSES) <= set(times.columns.get_level_values(2)):
+        return pd.DataFrame(columns=columns)
+
+    first_offen = times[("min", "position", "offen")]
+    complete = first_offen.notna()
+    for status in FLOW_STATUSES[1:]:
+        # The last occurrence is after the first offen if any occurrence is
+        complete &= times[("max", "position", status)] >= first_offen
+
+    times = times[complete]
+    flows = pd.DataFrame(
+        {
+            "transport_id": times.index,
+            "offen_start": times[("min", "changed_at", "offen")].to_numpy(),
+            "angenommen_time": times[("min", "changed_at", "angenommen")].to_numpy(),
+            "disponiert_time": times[("min", "changed_at", "disponiert")].to_numpy(),
+            "abgeschlossen_time": times[
+                ("max", "changed_at", "abgeschlossen")
+            ].to_numpy(),
+        }
+    )
+    for step, start, end in STEPS:
+        flows[step] = (flows[end] - flows[start]).dt.total_seconds() / 60
+
+    # Keep the order in which the transports first appear in the history
+    order = pd.Index(df["transport_id"].unique())
+    flows = flows.iloc[np.argsort(order.get_indexer(flows["transport_id"]))]
+    return flows.reset_index(drop=True)
+
+
+class TransitionIndex:
+    """
+    Sorted event index over the status history for arbitrary transitions.
+
+    The events are sorted by transport and changed_at once; per status the
+    index keeps the sorted global positions of its events, so the next
+    status B after a status A of the same transport is a searchsorted away.
+    """
+
+    def __init__(self, df):
+        history = sort_history(df)
+        self.transport_ids, transport_codes = np.unique(
+            history["transport_id"].to_numpy(), return_inverse=True
+        )
+        self.transports = transport_codes
+        self.times = history["changed_at"].to_numpy(dtype="datetime64[ns]")
+        statuses = history["new_status"].fillna("").to_numpy(dtype=object)
+        self.positions = {
+            status: np.flatnonzero(statuses == status)
+            for status in pd.unique(statuses)
+            if status
+        }
+
+    @property
+    def statuses(self):
+        """Statuses occurring in the history"""
+        return sorted(self.positions)
+
+    def durations(self, start_status, end_status, start="first"):
+        """
+        Duration from start_status to the next end_status of the same transport.
+
+        start="first" measures from the first start_status of each transport,
+        start="last" from the last one. Transports without an end_status after
+        it are left out. Returns transport_id, start_time, end_time and
+        duration_min.
+        """
+        empty = pd.DataFrame(
+            columns=["transport_id", "start_time", "end_time", "duration_min"]
+        )
+        starts = self.positions.get(start_status)
+        ends = self.positions.get(end_status)
+        if starts is None or ends is None:
+            return empty
+
+        # One start event per transport: its first or last occurrence
+        transports = self.transports[starts]
+        if start == "first":
+            keep = np.r_[True, transports[1:] != transports[:-1]]
+        else:
+            keep = np.r_[transports[1:] != transports[:-1], True]
+        starts = starts[keep]
+
+        following = np.searchsorted(ends, starts, side="right")
+        valid = following < len(ends)
+        starts, following = starts[valid], following[valid]
+        matches = ends[following]
+        same_transport = self.transports[matches] == self.transports[starts]
+        starts, matches = starts[same_transport], matches[same_transport]
+        if len(starts) == 0:
+            return empty
+
+        start_times = self.times[starts]
+        end_times = self.times[matches]
+        return pd.DataFrame(
+            {
+                "transport_id": self.transport_ids[self.transports[starts]],
+                "start_time": start_times,
+                "end_time": end_times,
+                "duration_min": (end_times - start_times) / np.timedelta64(1, "m"),
+            }
+        )
+
+    def percentiles(self, start_status, end_status, q=(0.25, 0.5, 0.75, 0.9)):
+        """Percentiles of the transition duration in minutes"""
+        durations = self.durations(start_status, end_status)["duration_min"]
+        return durations.astype(float).quantile(list(q))
+
+
+def weekly_statistics(df, time_col="start_time", value_col="duration_min"):
+    """Min, quartiles, mean, max and count of a duration per week"""
+    weeks = df[time_col].dt.to_period("W")
+    weekly = (
+        df.groupby(weeks)[value_col]
+        .agg(
+            [
+                "min",
+                lambda x: x.quantile(0.25),
+                "median",
+                "mean",
+                lambda x: x.quantile(0.75),
+                "max",
+                "count",
+            ]
+        )
+        .round(1)
+    )
+    weekly.columns = ["Min", "Q1", "Median", "Mean", "Q3", "Max", "Count"]
+    weekly.index.name = "week"
+    weekly = weekly.reset_index()
+    weekly["week"] = weekly["week"].dt.start_time
+    return weekly
+
+
+class FlowDigests:
+    """
+    Quantile sketches of the step durations per week (of offen_start).
+
+    New complete flows are added incrementally: every transport is digested
+    once, whenever its flow first shows up (late imports included). A flow
+    that changes afterwards keeps its first durations, sketches cannot
+    remove values; such changes are picked up when the digests are rebuilt.
+    Weekly statistics and the statistics of any date range are read
+    from the merged sketches instead of the full set of flows.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.digests = {}
+        self.digested = set()
+        self._lock = threading.Lock()
+
+    def update(self, flows):
+        """Digest the flows of transports not digested yet, returns their number"""
+        with self._lock:
+            return self._update(flows)
+
+    def _update(self, flows):
+        if flows.empty:
+            return 0
+        flows = flows[~flows["transport_id"].isin(self.digested)]
+        if flows.empty:
+            return 0
+
+        weeks = flows["offen_start"].dt.to_period("W").dt.start_time
+        for week, week_flows in flows.groupby(weeks):
+            for step, _, _ in STEPS:
+                key = (week, step)
+                if key not in self.digests:
+                    self.digests[key] = TDigest(self.compression)
+                self.digests[key].update(week_flows[step].to_numpy(dtype=float))
+
+        self.digested.update(flows["transport_id"])
+        return len(flows)
+
+    def weeks(self):
+        return sorted({week for week, _ in self.digests})
+
+    def merged(self, step, start=None, end=None):
+        """One digest of a step over the weeks starting between start and end"""
+        merged = TDigest(self.compression)
+        for (week, digest_step), digest in self.digests.items():
+            if digest_step != step:
+                continue
+            if start is not None and week < pd.Timestamp(start):
+                continue
+            if end is not None and week > pd.Timestamp(end):
+                continue
+            merged.merge(digest)
+        return merged
+
+    def weekly(self, step):
+        """Min, quartiles, mean, max and count per week like weekly_statistics"""
+        rows = []
+        for week in self.weeks():
+            digest = self.digests.get((week, step))
+            if digest is None or digest.count == 0:
+                continue
+            rows.append(
+                {
+                    "week": week,
+                    "Min": digest.min,
+                    "Q1": digest.quantile(0.25),
+                    "Median": digest.quantile(0.5),
+                    "Mean": digest.mean,
+                    "Q3": digest.quantile(0.75),
+                    "Max": digest.max,
+                    "Count": digest.count,
+                }
+            )
+        columns = ["week", "Min", "Q1", "Median", "Mean", "Q3", "Max", "Count"]
+        weekly = pd.DataFrame(rows, columns=columns)
+        weekly[columns[1:-1]] = weekly[columns[1:-1]].astype(float).round(1)
+        return weekly
+
+
+def synthetic_history(transports, seed=0):
+    """Random status history in the shape of the KTW.sh API for benchmarks"""
+    rng = np.random.default_rng(seed)
+    paths = [
+        FLOW_STATUSES,
+        ["offen", "angenommen", "disponiert", "abgeschlossen", "abgeschlossen"],
+        ["offen", "storniert"],
+        ["offen", "angenommen", "storniert"],
+        ["angenommen", "offen", "angenommen", "disponiert", "abgeschlossen"],
+    ]
+    choice = rng.choice(len(paths), size=transports, p=[0.6, 0.1, 0.1, 0.1, 0.1])
+    lengths = np.array([len(p) for p in paths])[choice]
+
+    transport_ids = np.repeat(np.arange(transports), lengths)
+    statuses = np.concatenate([paths[c] for c in choice])
+    start = pd.Timestamp("2025-07-01") + pd.to_timedelta(
+        rng.integers(0, 180 * 24 * 60, size=transports), unit="min"
+    )
+    steps = rng.exponential(30, size=len(transport_ids))
+    offsets = pd.Series(steps).groupby(transport_ids).cumsum().to_numpy()
+    changed_at = np.repeat(start.to_numpy(), lengths) + pd.to_timedelta(
+        offsets, unit="min"
+    )
+
+    history = pd.DataFrame(
+        {
+            "transport_id": transport_ids,
+            "new_status": statuses,
+            "changed_at": changed_at,
+        }
+    )
+    # The API does not return the history sorted
+    return history.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def loop_complete_flows(df):
+    """The former per-transport loop of pages/KTWsh.py, kept for the benchmark"""
+    flows = []
+    for transport_id in df["transport_id"].unique():
+        sorted_df = df[df["transport_id"] == transport_id].sort_values(
+            "changed_at", kind="mergesort"
+        )
+        statuses = sorted_df["new_status"].tolist()
+        if "offen" not in statuses:
+            continue
+        remaining = statuses[statuses.index("offen") :]
+        if not all(status in remaining for status in FLOW_STATUSES[1:]):
+            continue
+
+        def time_of(status, index):
+            return sorted_df[sorted_df["new_status"] == status]["changed_at"].iloc[
+                index
+            ]
+
+        flow = {
+            "transport_id": transport_id,
+            "offen_start": time_of("offen", 0),
+            "angenommen_time": time_of("angenommen", 0),
+            "disponiert_time": time_of("disponiert", 0),
+            "abgeschlossen_time": time_of("abgeschlossen", -1),
+        }
+        for step, start, end in STEPS:
+            flow[step] = (flow[end] - flow[start]).total_seconds() / 60
+        flows.append(flow)
+    return pd.DataFrame(flows)
+
+
+if __name__ == "__main__":
+    # Benchmark: python status_flow.py
+    history = synthetic_history(100_000)
+    started = time.perf_counter()
+    flows = complete_flows(history)
+    vectorized = time.perf_counter() - started
+    print(
+        f"vectorized: {len(history)} events, {len(flows)} complete flows "
+        f"in {vectorized:.2f}s"
+    )
+
+    # The loop is quadratic, time it on a sample and extrapolate
+    sample_size = 2_000
+    sample = history[history["transport_id"] < sample_size]
+    started = time.perf_counter()
+    expected = loop_complete_flows(sample)
+    loop = time.perf_counter() - started
+    estimate = loop * (100_000 / sample_size) ** 2
+    print(
+        f"loop: {sample_size} transports in {loop:.2f}s, "
+        f"~{estimate:.0f}s estimated for 100k"
+    )
+
+    pd.testing.assert_frame_equal(complete_flows(sample), expected, check_dtype=False)
+    print("vectorized and loop results are identical")
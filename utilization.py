@@ -0,0 +1,296 @@
+"""
+Vehicle utilization from the RTM_Vorhaltung availability and the Details missions.
+
+Availability windows and mission intervals are turned into sorted start/end
+events per vehicle and day; one cumulative sweep then yields available,
+busy and busy-while-available time without comparing intervals pairwise.
+"""
+
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+WEEKDAY_KEYS = {
+    "mo": 0,
+    "montag": 0,
+    "monday": 0,
+    "mon": 0,
+    "di": 1,
+    "dienstag": 1,
+    "tuesday": 1,
+    "tue": 1,
+    "mi": 2,
+    "mittwoch": 2,
+    "wednesday": 2,
+    "wed": 2,
+    "do": 3,
+    "donnerstag": 3,
+    "thursday": 3,
+    "thu": 3,
+    "fr": 4,
+    "freitag": 4,
+    "friday": 4,
+    "fri": 4,
+    "sa": 5,
+    "samstag": 5,
+    "saturday": 5,
+    "sat": 5,
+    "so": 6,
+    "sonntag": 6,
+    "sunday": 6,
+    "sun": 6,
+}
+TIME_RANGE = re.compile(r"(\d{1,2})[:.](\d{2})\s*-\s*(\d{1,2})[:.](\d{2})")
+DAY = pd.Timedelta(days=1)
+
+
+def parse_weekdays(key):
+    """Weekday numbers (0=Monday) of a key like 'Mo', 'Montag', 0, 'Mo-Fr' or 'täglich'"""
+    if isinstance(key, (int, np.integer)):
+        return [int(key) % 7]
+    key = str(key).strip().lower()
+    if key.isdigit():
+        return [int(key) % 7]
+    if key in ("täglich", "daily", "all", "*", "mo-so"):
+        return list(range(7))
+    if "-" in key:
+        first, last = (WEEKDAY_KEYS.get(part.strip()) for part in key.split("-", 1))
+        if first is not None and last is not None:
+            return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+    return [WEEKDAY_KEYS[key]] if key in WEEKDAY_KEYS else []
+
+
+def parse_time(value):
+    """Minutes after midnight of 'HH:MM' (24:00 allowed)"""
+    hours, minutes = re.match(r"\s*(\d{1,2})[:.](\d{2})", str(value)).groups()
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_window(window):
+    """(start, end) minutes of a window; an end before the start runs past midnight"""
+    if isinstance(window, dict):
+        start = window.get("start", window.get("from", window.get("von")))
+        end = window.get("end", window.get("to", window.get("bis")))
+        start, end = parse_time(start), parse_time(end)
+    else:
+        match = TIME_RANGE.search(str(window))
+        if str(window).strip() in ("24h", "24/7", "ganztägig"):
+            return 0, 24 * 60
+        if not match:
+            raise ValueError(f"Unknown availability window: {window}")
+        h1, m1, h2, m2 = map(int, match.groups())
+        start, end = h1 * 60 + m1, h2 * 60 + m2
+    if end <= start:
+        end += 24 * 60
+    return start, end
+
+
+def parse_availability(availability):
+    """
+    Weekly availability as list of (weekday, start minute, end minute).
+
+    Accepts a dict of weekday -> window(s), a list of dicts with a day/weekday
+    key and start/end, window strings like '07:00-19:00', '24/7' or the same
+    structures as JSON text. Unparseable entries are skipped.
+    """
+    if isinstance(availability, str):
+        text = availability.strip()
+        if text in ("24/7", "24h"):
+            return [(day, 0, 24 * 60) for day in range(7)]
+        try:
+            availability = json.loads(text)
+        except ValueError:
+            availability = {"täglich": text}
+    if availability is None or (
+        not isinstance(availability, (dict, list)) and pd.isna(availability)
+    ):
+        return []
+
+    if isinstance(availability, dict):
+        items = availability.items()
+    else:
+        items = [
+            (entry.get("day", entry.get("weekday", entry.get("tag", "täglich"))), entry)
+            for entry in availability
+            if isinstance(entry, dict)
+        ]
+
+    windows = []
+    for key, value in items:
+        days = parse_weekdays(key)
+        entries = value if isinstance(value, list) else [value]
+        for entry in entries:
+            if entry in (None, False, "", "-"):
+                continue
+            try:
+                start, end = (0, 24 * 60) if entry is True else parse_window(entry)
+            except (ValueError, AttributeError, TypeError):
+                continue
+            windows.extend((day, start, end) for day in days)
+    return windows
+
+
+def availability_intervals(vorhaltung_df, start, end):
+    """
+    Expand the weekly availability of each vehicle into concrete intervals
+    between start and end, limited to each configuration's validity.
+    Returns vehicle, start, end.
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end)
+    days = pd.date_range(start - DAY, end, freq="D")
+    calendar = pd.DataFrame({"day": days, "weekday": days.dayofweek})
+
+    patterns = []
+    for row in vorhaltung_df.itertuples(index=False):
+        valid_from = pd.to_datetime(getattr(row, "valid_from", None), errors="coerce")
+        valid_to = pd.to_datetime(getattr(row, "valid_to", None), errors="coerce")
+        for weekday, minute_start, minute_end in parse_availability(row.availability):
+            patterns.append(
+                {
+                    "vehicle": row.vehicle_identifier,
+                    "weekday": weekday,
+                    "offset_start": minute_start,
+                    "offset_end": minute_end,
+                    "valid_from": valid_from,
+                    "valid_to": valid_to,
+                }
+            )
+    if not patterns:
+        return pd.DataFrame(columns=["vehicle", "start", "end"])
+
+    # One row per vehicle window and calendar day of its weekday
+    intervals = pd.DataFrame(patterns).merge(calendar, on="weekday")
+    intervals["start"] = intervals["day"] + pd.to_timedelta(
+        intervals["offset_start"], unit="min"
+    )
+    intervals["end"] = intervals["day"] + pd.to_timedelta(
+        intervals["offset_end"], unit="min"
+    )
+    valid = intervals["valid_from"].isna() | (
+        intervals["day"] >= intervals["valid_from"].dt.normalize()
+    )
+    valid &= intervals["valid_to"].isna() | (intervals["day"] <= intervals["valid_to"])
+    intervals = intervals[valid]
+
+    intervals["start"] = intervals["start"].clip(lower=start)
+    intervals["end"] = intervals["end"].clip(upper=end)
+    intervals = intervals[intervals["end"] > intervals["start"]]
+    return intervals[["vehicle", "start", "end"]].reset_index(drop=True)
+
+
+def mission_intervals(details_df, start_col="StatusAlarm", end_col="StatusEnd"):
+    """Mission intervals (vehicle, start, end) from the combined Details datetimes"""
+    intervals = pd.DataFrame(
+        {
+            "vehicle": details_df["content_callSign"],
+            "start": pd.to_datetime(details_df[start_col], errors="coerce"),
+            "end": pd.to_datetime(details_df[end_col], errors="coerce"),
+        }
+    ).dropna()
+    return intervals[intervals["end"] > intervals["start"]].reset_index(drop=True)
+
+
+def split_by_day(intervals):
+    """Split intervals at midnight so each piece belongs to one day"""
+    if intervals.empty:
+        return intervals.assign(day=pd.Series(dtype="datetime64[ns]"))
+    first_day = intervals["start"].dt.normalize()
+    last_day = (intervals["end"] - pd.Timedelta(1, "ns")).dt.normalize()
+    day_count = ((last_day - first_day) // DAY).astype(int) + 1
+
+    pieces = intervals.loc[intervals.index.repeat(day_count)].copy()
+    offset = pieces.groupby(level=0).cumcount().to_numpy()
+    pieces["day"] = first_day.loc[pieces.index].to_numpy() + offset * DAY
+    pieces["start"] = pieces["start"].where(
+        pieces["start"] > pieces["day"], pieces["day"]
+    )
+    pieces["end"] = pieces["end"].where(
+        pieces["end"] < pieces["day"] + DAY, pieces["day"] + DAY
+    )
+    return pieces.reset_index(drop=True)
+
+
+def daily_utilization(available, busy):
+    """
+    Available, busy and busy-while-available hours per vehicle and day.
+
+    Both interval sets become +1/-1 events; after one sort per (vehicle, day)
+    the cumulative sums give the number of open availability windows and
+    missions for every segment between two events, so overlaps within a set
+    are not counted twice.
+    """
+    events = []
+    for kind, intervals in (("available", available), ("busy", busy)):
+        pieces = split_by_day(intervals)
+        for time_col, step in (("start", 1), ("end", -1)):
+            events.append(
+                pd.DataFrame(
+                    {
+                        "vehicle": pieces["vehicle"].to_numpy(),
+                        "day": pieces["day"].to_numpy(),
+                        "time": pieces[time_col].to_numpy(),
+                        "available": step if kind == "available" else 0,
+                        "busy": step if kind == "busy" else 0,
+                    }
+                )
+            )
+    events = pd.concat(events, ignore_index=True)
+    columns = ["vehicle", "day", "available_h", "busy_h", "busy_available_h"]
+    if events.empty:
+        return pd.DataFrame(columns=columns + ["utilization_pct"])
+
+    events = events.sort_values(["vehicle", "day", "time"], kind="mergesort")
+    groups = events.groupby(["vehicle", "day"], sort=False)
+    available_level = groups["available"].cumsum()
+    busy_level = groups["busy"].cumsum()
+    segment_h = (groups["time"].shift(-1) - events["time"]).dt.total_seconds() / 3600
+    segment_h = segment_h.fillna(0)
+
+    events["available_h"] = segment_h.where(available_level > 0, 0)
+    events["busy_h"] = segment_h.where(busy_level > 0, 0)
+    events["busy_available_h"] = segment_h.where(
+        (available_level > 0) & (busy_level > 0), 0
+    )
+    daily = events.groupby(["vehicle", "day"])[columns[2:]].sum().reset_index()
+    daily["utilization_pct"] = (
+        daily["busy_available_h"]
+        / daily["available_h"].where(daily["available_h"] > 0)
+        * 100
+    )
+    return daily
+
+
+def weekly_utilization(daily):
+    """Aggregate daily utilization to weeks (week = Monday of the week)"""
+    weekly = daily.assign(week=daily["day"].dt.to_period("W").dt.start_time)
+    weekly = weekly.groupby(["vehicle", "week"])[
+        ["available_h", "busy_h", "busy_available_h"]
+    ].sum()
+    weekly["utilization_pct"] = (
+        weekly["busy_available_h"]
+        / weekly["available_h"].where(weekly["available_h"] > 0)
+        * 100
+    )
+    return weekly.reset_index()
+
+
+def vehicle_utilization(vorhaltung_df, details_df, vehicles=None):
+    """Daily utilization of the vehicles over the days covered by the missions"""
+    busy = mission_intervals(details_df)
+    if vehicles is not None:
+        busy = busy[busy["vehicle"].isin(vehicles)]
+        vorhaltung_df = vorhaltung_df[
+            vorhaltung_df["vehicle_identifier"].isin(vehicles)
+        ]
+    if busy.empty:
+        return daily_utilization(busy, busy)
+
+    # Whole days: availability is not cut at the first or last mission
+    available = availability_intervals(
+        vorhaltung_df,
+        busy["start"].min().normalize(),
+        busy["end"].max().normalize() + DAY,
+    )
+    return daily_utilization(available, busy)
@@ -0,0 +1,142 @@
+"""Per-vehicle KPIs of the Details missions from a single groupby on content_callSign"""
+
+import pandas as pd
+
+
+def mission_durations(df):
+    """
+    Mission duration in minutes from the combined datetime columns:
+    Status1 to StatusEnd, or StatusAlarm to StatusEnd if Status1 is missing.
+    """
+    if "StatusEnd" not in df.columns:
+        return pd.Series(float("nan"), index=df.index)
+    start_col = "Status1" if "Status1" in df.columns else "StatusAlarm"
+    if start_col not in df.columns:
+        return pd.Series(float("nan"), index=df.index)
+
+    start = pd.to_datetime(df[start_col], errors="coerce")
+    end = pd.to_datetime(df["StatusEnd"], errors="coerce")
+    return (end - start).dt.total_seconds() / 60
+
+
+def vehicle_kpis(df, vehicles=None):
+    """
+    Mission KPIs per vehicle, indexed by call sign and sorted by missions:
+    Einsätze, Anteil (%), Aktive Tage, Ø Einsätze/Tag, Gesamt Einsatzstunden
+    and Ø Einsatzdauer (Min). Only the given vehicles if a list is passed.
+    """
+    columns = [
+        "Einsätze",
+        "Anteil (%)",
+        "Aktive Tage",
+        "Ø Einsätze/Tag",
+        "Gesamt Einsatzstunden",
+        "Ø Einsatzdauer (Min)",
+    ]
+    if df.empty or "content_callSign" not in df.columns:
+        return pd.DataFrame(columns=columns)
+    if vehicles is not None:
+        df = df[df["content_callSign"].isin(vehicles)]
+
+    day_col = "content_dateStatus1" if "content_dateStatus1" in df.columns else None
+    frame = pd.DataFrame(
+        {
+            "vehicle": df["content_callSign"],
+            "day": df[day_col] if day_col else pd.NA,
+            "duration": mission_durations(df),
+        }
+    )
+    kpis = frame.groupby("vehicle").agg(
+        missions=("vehicle", "size"),
+        active_days=("day", "nunique"),
+        duration_sum=("duration", "sum"),
+        duration_mean=("duration", "mean"),
+    )
+
+    result = pd.DataFrame(index=kpis.index)
+    result["Einsätze"] = kpis["missions"]
+    result["Anteil (%)"] = kpis["missions"] / kpis["missions"].sum() * 100
+    result["Aktive Tage"] = kpis["active_days"] if day_col else pd.NA
+    result["Ø Einsätze/Tag"] = kpis["missions"] / kpis["active_days"].where(
+        kpis["active_days"] > 0
+    )
+    result["Gesamt Einsatzstunden"] = (kpis["duration_sum"] / 60).round(2)
+    result["Ø Einsatzdauer (Min)"] = kpis["duration_mean"]
+    result.index.name = "Fahrzeug"
+    return result.sort_values("Einsätze", ascending=False)
+
+
+def top_mission_types(df, n=3):
+    """The n most frequent content_missionType per vehicle (Fahrzeug, Einsatztyp, Anzahl)"""
+    if df.empty or "content_missionType" not in df.columns:
+        return pd.DataFrame(columns=["Fahrzeug", "Einsatztyp", "Anzahl"])
+    counts = (
+        df.groupby(["content_callSign", "content_missionType"])
+        .size()
+        .rename("Anzahl")
+        .reset_index()
+        .sort_values(["content_callSign", "Anzahl"], ascending=[True, False])
+    )
+    counts = counts.groupby("content_callSign").head(n)
+    return counts.rename(
+        columns={"content_callSign": "Fahrzeug", "content_missionType": "Einsatztyp"}
+    ).reset_index(drop=True)
+
+
+def turnaround_times(df):
+    """
+    Time from Status 2 of a mission to the next StatusAlarm of the same vehicle.
+
+    Missions are sorted by content_callSign and StatusAlarm; the next alarm
+    is the StatusAlarm shifted by one within each vehicle, so no mission is
+    compared with more than its successor. Negative gaps (overlapping
+    missions) are left out. Returns Fahrzeug, Status2, next alarm, hour of
+    Status2 and Wendezeit (Min).
+    """
+    columns = [
+        "Fahrzeug",
+        "Status2",
+        "Nächste Alarmierung",
+        "Stunde",
+        "Wendezeit (Min)",
+    ]
+    required = {"content_callSign", "StatusAlarm", "Status2"}
+    if df.empty or not required <= set(df.columns):
+        return pd.DataFrame(columns=columns)
+
+    timeline = pd.DataFrame(
+        {
+            "Fahrzeug": df["content_callSign"],
+            "alarm": pd.to_datetime(df["StatusAlarm"], errors="coerce"),
+            "Status2": pd.to_datetime(df["Status2"], errors="coerce"),
+        }
+    ).dropna(subset=["Fahrzeug", "alarm"])
+    timeline = timeline.sort_values(["Fahrzeug", "alarm"], kind="mergesort")
+    timeline["Nächste Alarmierung"] = timeline.groupby("Fahrzeug")["alarm"].shift(-1)
+
+    seconds = (timeline["Nächste Alarmierung"] - timeline["Status2"]).dt.total_seconds()
+    timeline["Wendezeit (Min)"] = seconds / 60
+    timeline = timeline[timeline["Wendezeit (Min)"] >= 0].copy()
+    timeline["Stunde"] = timeline["Status2"].dt.hour
+    return timeline[columns].reset_index(drop=True)
+
+
+def turnaround_stats(turnarounds, by="Fahrzeug"):
+    """Distribution of the turnaround time per vehicle or per hour of day"""
+    grouped = turnarounds.groupby(by)["Wendezeit (Min)"]
+    stats = grouped.describe(percentiles=[0.25, 0.5, 0.75, 0.9])
+    stats = stats.rename(
+        columns={
+            "count": "Anzahl",
+            "mean": "Mittelwert",
+            "std": "Std",
+            "min": "Min",
+            "25%": "P25",
+            "50%": "Median",
+            "75%": "P75",
+            "90%": "P90",
+            "max": "Max",
+        }
+    )
+    stats["Anzahl"] = stats["Anzahl"].astype(int)
+    return stats.round(1)